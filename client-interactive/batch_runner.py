@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+交互式客户端的非交互批处理模式
+从文件或标准输入读取命令（十六进制或客户端的预设命令，每行一条，# 开头为注释），
+同步发送并用协议长度字段（tools/framers.py）判断响应是否完整，不使用固定 sleep；
+每条命令输出一行 JSON（请求、响应、往返时间、请求/响应是否对应），最后输出一行汇总。
+
+用法（modbus / slmp / iec104_realtime / ethernetip 客户端）:
+  python3 modbus_interactive.py 127.0.0.1 1502 --batch commands.txt
+  printf 'startdt\\ntestfr\\n' | python3 iec104_interactive_realtime.py 127.0.0.1 2404 --batch - --timeout 0.5
+  python3 ethernetip_interactive.py 127.0.0.1 44818 --batch probes.txt --output results.jsonl
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from framers import frame_length  # noqa: E402
+from client_log import RECV, SEND  # noqa: E402
+
+
+def pop_option(argv, name, default=None):
+    """从 argv 中取出 `name value`，其余位置参数保持原有解析方式"""
+    if name not in argv:
+        return default
+    index = argv.index(name)
+    if index + 1 >= len(argv):
+        raise SystemExit(f"{name} requires a value")
+    value = argv[index + 1]
+    del argv[index:index + 2]
+    return value
+
+
+def iter_commands(stream):
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def parse_hex(text):
+    """与交互模式一致：允许空格、冒号、短横线分隔"""
+    return bytes.fromhex(text.replace(' ', '').replace(':', '').replace('-', ''))
+
+
+def correlate(protocol, request, response):
+    """
+    判断响应是否对应请求: MODBUS 比较事务 ID，ETHERNETIP 比较命令码和 sender context，
+    其他协议没有关联字段，返回 None
+    """
+    if protocol == 'MODBUS' and len(request) >= 2 and len(response) >= 2:
+        return request[:2] == response[:2]
+    if protocol == 'ETHERNETIP' and len(request) >= 24 and len(response) >= 24:
+        return request[:2] == response[:2] and request[12:20] == response[12:20]
+    return None
+
+
+class BatchRunner:
+    """
+    同步收发: send -> 读到一条完整响应（或超时）-> 下一条
+    同一次 recv 中多出来的字节留到下一条命令，标记为 unsolicited（如 IEC104 的突发上送）
+    """
+
+    def __init__(self, host, port, protocol, timeout=1.0, out=None, recorder=None, logger=None):
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.timeout = timeout
+        self.out = out or sys.stdout
+        self.recorder = recorder
+        self.logger = logger
+        self.sock = None
+        self.pending = b''
+        self.seq = 0
+        self.stats = {'commands': 0, 'responses': 0, 'timeouts': 0, 'errors': 0, 'mismatched': 0}
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def _read_frame(self, deadline):
+        """返回 (一条完整响应 或 已收到的部分字节, 是否完整, 错误)"""
+        buffer = self.pending
+        while True:
+            length = frame_length(self.protocol, buffer) if buffer else None
+            if length is not None and (length < 0 or len(buffer) >= length):
+                cut = len(buffer) if length < 0 else length
+                self.pending = buffer[cut:]
+                return buffer[:cut], True, None
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                self.pending = b''
+                return buffer, False, None
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                self.pending = b''
+                return buffer, False, str(e)
+            if not chunk:
+                self.pending = b''
+                return buffer, False, 'closed'
+            if self.recorder:
+                self.recorder.received(chunk)
+            if self.logger:
+                self.logger.trace(RECV, chunk)
+            buffer += chunk
+
+    def exchange(self, data):
+        """发送一条消息并等待响应，返回 (响应, 是否完整, 往返秒数, 错误, 发送前已缓存的主动上送数据)"""
+        unsolicited, self.pending = self.pending, b''
+        start = time.perf_counter()
+        try:
+            self.sock.sendall(data)
+        except OSError as e:
+            return b'', False, None, f"send: {e}", unsolicited
+        if self.recorder:
+            self.recorder.sent(data)
+        if self.logger:
+            self.logger.trace(SEND, data)
+        response, complete, error = self._read_frame(start + self.timeout)
+        return response, complete, time.perf_counter() - start, error, unsolicited
+
+    def emit(self, record):
+        self.out.write(json.dumps(record) + '\n')
+
+    def run(self, commands, resolve, on_response=None):
+        """
+        resolve(command) -> bytes，无法识别时抛出 ValueError
+        on_response(request, response) 供客户端更新状态（如 EtherNet/IP 的 session handle）
+        """
+        for command in commands:
+            self.seq += 1
+            self.stats['commands'] += 1
+            record = {'seq': self.seq, 'cmd': command}
+            try:
+                data = resolve(command)
+            except ValueError as e:
+                self.stats['errors'] += 1
+                record['error'] = f"invalid command: {e}"
+                self.emit(record)
+                continue
+            response, complete, rtt, error, unsolicited = self.exchange(data)
+            record.update({
+                'sent': data.hex(),
+                'recv': response.hex(),
+                'complete': complete,
+                'rtt_ms': round(rtt * 1000, 3) if rtt is not None else None,
+            })
+            if unsolicited:
+                record['unsolicited'] = unsolicited.hex()
+            matched = correlate(self.protocol, data, response) if complete else None
+            if matched is not None:
+                record['matched'] = matched
+                self.stats['mismatched'] += not matched
+            if complete:
+                self.stats['responses'] += 1
+                if on_response:
+                    on_response(data, response)
+            elif error is None:
+                self.stats['timeouts'] += 1
+            if error:
+                record['error'] = error
+                self.stats['errors'] += 1
+            self.emit(record)
+            if error == 'closed' or (error and error.startswith('send')):
+                break
+        self.emit({'summary': self.stats})
+        self.out.flush()
+        return self.stats
+
+
+def run_client_batch(client, protocol, argv_batch, resolve, timeout, output=None,
+                     setup=None, on_response=None):
+    """
+    客户端共用的批处理入口
+    setup(runner) 在连接后、执行命令前调用（如 SLMP 心跳、EtherNet/IP 注册会话）
+    返回进程退出码: 0 全部收到完整响应，1 有超时 / 错误，2 连接失败
+    """
+    stream = sys.stdin if argv_batch == '-' else open(argv_batch)
+    out = open(output, 'w') if output else sys.stdout
+    runner = BatchRunner(client.host, client.port, protocol, timeout, out,
+                         getattr(client, 'recorder', None), getattr(client, 'logger', None))
+    try:
+        try:
+            runner.connect()
+        except OSError as e:
+            runner.emit({'error': f"connect: {e}"})
+            return 2
+        if setup:
+            setup(runner)
+        stats = runner.run(iter_commands(stream), resolve, on_response)
+        return 0 if stats['errors'] == 0 and stats['timeouts'] == 0 else 1
+    finally:
+        runner.close()
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+        if getattr(client, 'recorder', None):
+            client.recorder.close()
+        if getattr(client, 'logger', None):
+            client.logger.close()
+
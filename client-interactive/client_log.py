@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+交互式客户端的日志后端
+  - 十六进制 / ASCII 显示用 bytes.hex(' ') 和 bytes.translate 一次完成，不再逐字节拼接
+  - 时间戳按秒缓存 strftime 结果，只在秒数变化时重新格式化
+  - 输出到终端时每行 flush；重定向到文件 / 管道时缓冲写出，由后台定时器在 FLUSH_INTERVAL 秒内刷新
+    （客户端阻塞在 input() / recv() 上时已写入的行也不会滞留在缓冲区）
+  - details 可以是无参函数，只在真正显示时才调用（--quiet 时不解析报文）
+  - --quiet 时不做任何格式化，报文只进入二进制 trace 文件（如果指定）
+  - --trace <文件> 记录每个收发报文: 8 字节时间 + 1 字节方向 + 4 字节长度 + 内容，可随时用本脚本还原为可读格式
+
+用法（所有交互式客户端）:
+  python3 modbus_interactive.py 127.0.0.1 1502 --trace /tmp/modbus.trace
+  python3 slmp_interactive.py 127.0.0.1 8888 --batch cmds.txt --quiet --trace /tmp/slmp.trace
+  python3 client_log.py /tmp/slmp.trace            # 还原为与客户端相同的显示
+  python3 client_log.py /tmp/slmp.trace --ascii --limit 100
+"""
+
+import argparse
+import struct
+import sys
+import threading
+import time
+
+TRACE_MAGIC = b'CLTRACE1'
+TRACE_RECORD = struct.Struct('<dBI')  # 时间戳, 方向, 长度
+SEND, RECV = 0, 1
+FLUSH_INTERVAL = 0.5
+
+# 不可打印字符映射为 '.'
+_PRINTABLE = bytes(b if 32 <= b < 127 else 0x2e for b in range(256))
+
+
+def hex_view(data):
+    """'01 02 ff' 形式的十六进制"""
+    return bytes(data).hex(' ')
+
+
+def ascii_view(data):
+    return bytes(data).translate(_PRINTABLE).decode('ascii')
+
+
+def pop_log_args(argv):
+    """从 argv 中取出 --quiet 和 --trace <path>，返回 (quiet, trace)"""
+    quiet = '--quiet' in argv
+    if quiet:
+        argv.remove('--quiet')
+    trace = None
+    if '--trace' in argv:
+        index = argv.index('--trace')
+        if index + 1 >= len(argv):
+            raise SystemExit("--trace requires a path")
+        trace = argv[index + 1]
+        del argv[index:index + 2]
+    return quiet, trace
+
+
+class ClientLog:
+    def __init__(self, quiet=False, trace=None, stream=None):
+        self.quiet = quiet
+        self.stream = stream or sys.stdout
+        try:
+            self.buffered = not self.stream.isatty()
+        except (AttributeError, ValueError):
+            self.buffered = True
+        self.trace_file = None
+        if trace:
+            self.trace_file = open(trace, 'wb')
+            self.trace_file.write(TRACE_MAGIC)
+        self._second = None
+        self._prefix = ''
+        self._timer = None
+        self._timer_lock = threading.Lock()
+
+    def timestamp(self, now=None):
+        """HH:MM:SS.mmm，strftime 每秒只调用一次"""
+        now = time.time() if now is None else now
+        second = int(now)
+        if second != self._second:
+            self._second = second
+            self._prefix = time.strftime('%H:%M:%S', time.localtime(second))
+        return f"{self._prefix}.{int((now - second) * 1000):03d}"
+
+    def log(self, prefix, message, details=None, flush=None):
+        if self.quiet:
+            return
+        line = f"[{self.timestamp()}] {prefix} {message}\n"
+        if callable(details):
+            details = details()
+        if details:
+            line += f"           └─ {details}\n"
+        self.stream.write(line)
+        if flush is None:
+            flush = not self.buffered
+        if flush:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """缓冲模式下保证 FLUSH_INTERVAL 秒内刷新一次（同一时刻最多一个定时器）"""
+        with self._timer_lock:
+            if self._timer is None:
+                self._timer = threading.Timer(FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def trace(self, direction, data):
+        if self.trace_file:
+            self.trace_file.write(TRACE_RECORD.pack(time.time(), direction, len(data)) + bytes(data))
+
+    def packet(self, direction, data, ascii=False):
+        """记录一个收发报文: 写入 trace，非 quiet 时按原有格式显示十六进制（及 ASCII）"""
+        self.trace(direction, data)
+        if self.quiet:
+            return
+        if direction == SEND:
+            self.log("─→", f"Send ({len(data)} bytes): {hex_view(data)}")
+        else:
+            self.log("←─", f"Recv ({len(data)} bytes): {hex_view(data)}")
+        if ascii:
+            text = ascii_view(data)
+            if text.strip('.'):
+                self.log("   ", f"ASCII: {text}")
+
+    def flush(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        try:
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        self.flush()
+        if self.trace_file:
+            self.trace_file.close()
+            self.trace_file = None
+
+
+def read_trace(path):
+    """逐条返回 (时间戳, 方向, 内容)"""
+    with open(path, 'rb') as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a client trace file")
+        while True:
+            header = f.read(TRACE_RECORD.size)
+            if len(header) < TRACE_RECORD.size:
+                return
+            timestamp, direction, length = TRACE_RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield timestamp, direction, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a client trace file in the interactive clients' format")
+    parser.add_argument('trace', help='file written with --trace')
+    parser.add_argument('--ascii', action='store_true', help='also show printable ASCII')
+    parser.add_argument('--limit', type=int, default=0, help='stop after N messages')
+    args = parser.parse_args()
+
+    log = ClientLog()
+    try:
+        for count, (timestamp, direction, data) in enumerate(read_trace(args.trace), 1):
+            arrow, label = ("─→", "Send") if direction == SEND else ("←─", "Recv")
+            log.stream.write(f"[{log.timestamp(timestamp)}] {arrow} {label} ({len(data)} bytes): {hex_view(data)}\n")
+            if args.ascii and ascii_view(data).strip('.'):
+                log.stream.write(f"[{log.timestamp(timestamp)}]     ASCII: {ascii_view(data)}\n")
+            if args.limit and count >= args.limit:
+                break
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,7 +9,10 @@ import sys
 import threading
 import time
 import struct
-from datetime import datetime
+
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, pop_log_args
+from batch_runner import parse_hex, pop_option, run_client_batch
 
 class EtherNetIPClient:
     # EtherNet/IP Encapsulation Commands
@@ -62,22 +65,24 @@ class EtherNetIPClient:
         0x0069: "UnsupportedProtocol"
     }
     
-    def __init__(self, host='127.0.0.1', port=44818):
+    def __init__(self, host='127.0.0.1', port=44818, record=None, quiet=False, trace=None):
         self.host = host
         self.port = port
         self.sock = None
         self.running = False
         self.recv_thread = None
+        self.recorder = SessionRecorder(record, 'ETHERNETIP', host, port) if record else None
+        self.logger = ClientLog(quiet, trace)
         self.session_handle = 0x00000000  # Will be set after registration
         self.context = b'\x00' * 8  # 8-byte context
         
     def timestamp(self):
         """获取当前时间戳"""
-        return datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        return self.logger.timestamp()
     
-    def log(self, prefix, message, flush=True):
+    def log(self, prefix, message, flush=None):
         """带时间戳的日志输出"""
-        print(f"[{self.timestamp()}] {prefix} {message}", flush=flush)
+        self.logger.log(prefix, message, flush=flush)
     
     def build_encaps_header(self, command, length, session_handle=None, status=0x00000000):
         """
@@ -171,6 +176,17 @@ class EtherNetIPClient:
         cip_data = bytes([service, epath_size]) + epath
         return self.build_send_rr_data(cip_data)
     
+    def presets(self):
+        """预设命令 -> 构建函数（在发送时构建，使用当前的 session handle）"""
+        return {
+            'register': lambda: self.build_register_session(),
+            'unregister': lambda: self.build_unregister_session(),
+            'listid': lambda: self.build_list_identity(),
+            'getvendor': lambda: self.build_get_attribute_single(0x01, 1, 1),  # Identity Object, Instance 1, Vendor ID
+            'getdevicetype': lambda: self.build_get_attribute_single(0x01, 1, 2),  # Device Type
+            'getproductname': lambda: self.build_get_attribute_single(0x01, 1, 7),  # Product Name
+        }
+    
     def receive_loop(self):
         """独立线程：持续接收服务器数据"""
         self.sock.settimeout(0.1)  # 100ms 超时，避免阻塞
@@ -208,11 +224,11 @@ class EtherNetIPClient:
                 
                 # Complete packet
                 full_packet = header_data + data_payload
-                hex_str = full_packet.hex()
-                formatted_hex = ' '.join(hex_str[i:i+2] for i in range(0, len(hex_str), 2))
-                
-                self.log("←─", f"Recv ({len(full_packet)} bytes): {formatted_hex}")
-                self.parse_packet(header, data_payload)
+                if self.recorder:
+                    self.recorder.received(full_packet)
+                self.logger.packet(RECV, full_packet)
+                if not self.logger.quiet:
+                    self.parse_packet(header, data_payload)
                 
                 # Update session handle if this is RegisterSession response
                 if header['command'] == self.CMD_REGISTER_SESSION and header['status'] == self.STATUS_SUCCESS:
@@ -304,9 +320,9 @@ class EtherNetIPClient:
         """发送原始字节数据"""
         try:
             self.sock.send(data)
-            hex_str = data.hex()
-            formatted_hex = ' '.join(hex_str[i:i+2] for i in range(0, len(hex_str), 2))
-            self.log("─→", f"Send ({len(data)} bytes): {formatted_hex}")
+            if self.recorder:
+                self.recorder.sent(data)
+            self.logger.packet(SEND, data)
             return True
         except Exception as e:
             self.log("✗", f"Send error: {e}")
@@ -322,6 +338,26 @@ class EtherNetIPClient:
             self.log("✗", "Invalid hex string")
             return False
     
+    def build_command(self, cmd):
+        """批处理模式: 预设命令名或十六进制 -> 报文"""
+        builder = self.presets().get(cmd.lower())
+        return builder() if builder else parse_hex(cmd)
+
+    def update_session(self, request, response):
+        """批处理模式: RegisterSession 成功后记录 session handle，供后续预设命令使用"""
+        header = self.parse_encaps_header(response)
+        if header and header['command'] == self.CMD_REGISTER_SESSION and header['status'] == self.STATUS_SUCCESS:
+            self.session_handle = header['session_handle']
+
+    def run_batch(self, path, timeout=1.0, output=None):
+        """非交互批处理: 先注册会话，然后逐行发送并等待完整响应，结果以 JSONL 输出"""
+        def register(runner):
+            response, complete, _, _, _ = runner.exchange(self.build_register_session())
+            if complete:
+                self.update_session(None, response)
+        return run_client_batch(self, 'ETHERNETIP', path, self.build_command, timeout, output,
+                                setup=register, on_response=self.update_session)
+    
     def close(self):
         """关闭连接"""
         # Send UnregisterSession if we have a session
@@ -342,6 +378,9 @@ class EtherNetIPClient:
         if self.recv_thread:
             self.recv_thread.join(timeout=1)
         self.log("✓", "Connection closed")
+        if self.recorder:
+            self.log("✓", f"Session recorded to {self.recorder.close()}")
+        self.logger.close()
     
     def interactive(self):
         """交互式主循环"""
@@ -372,15 +411,7 @@ class EtherNetIPClient:
         if not self.connect():
             return
         
-        # 预设命令
-        presets = {
-            'register': lambda: self.build_register_session(),
-            'unregister': lambda: self.build_unregister_session(),
-            'listid': lambda: self.build_list_identity(),
-            'getvendor': lambda: self.build_get_attribute_single(0x01, 1, 1),  # Identity Object, Instance 1, Vendor ID
-            'getdevicetype': lambda: self.build_get_attribute_single(0x01, 1, 2),  # Device Type
-            'getproductname': lambda: self.build_get_attribute_single(0x01, 1, 7),  # Product Name
-        }
+        presets = self.presets()
         
         try:
             while self.running:
@@ -415,6 +446,11 @@ class EtherNetIPClient:
 
 def main():
     # 解析命令行参数
+    record = pop_record_arg(sys.argv)
+    quiet, trace = pop_log_args(sys.argv)
+    batch = pop_option(sys.argv, '--batch')
+    timeout = float(pop_option(sys.argv, '--timeout', 1.0))
+    output = pop_option(sys.argv, '--output')
     host = '127.0.0.1'
     port = 44818
     
@@ -423,9 +459,12 @@ def main():
     if len(sys.argv) > 2:
         port = int(sys.argv[2])
     
-    client = EtherNetIPClient(host, port)
+    client = EtherNetIPClient(host, port, record, quiet, trace)
+    if batch:
+        return client.run_batch(batch, timeout, output)
     client.interactive()
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
 
@@ -8,23 +8,27 @@ import socket
 import sys
 import threading
 import struct
-from datetime import datetime
+
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, pop_log_args
 
 class EtherNetIPClientSimple:
-    def __init__(self, host='127.0.0.1', port=44818):
+    def __init__(self, host='127.0.0.1', port=44818, record=None, quiet=False, trace=None):
         self.host = host
         self.port = port
         self.sock = None
         self.running = False
         self.recv_thread = None
+        self.recorder = SessionRecorder(record, 'ETHERNETIP', host, port) if record else None
+        self.logger = ClientLog(quiet, trace)
         
     def timestamp(self):
         """获取当前时间戳"""
-        return datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        return self.logger.timestamp()
     
-    def log(self, prefix, message, flush=True):
+    def log(self, prefix, message, flush=None):
         """带时间戳的日志输出"""
-        print(f"[{self.timestamp()}] {prefix} {message}", flush=flush)
+        self.logger.log(prefix, message, flush=flush)
     
     def parse_encaps_header(self, data):
         """
@@ -84,13 +88,14 @@ class EtherNetIPClientSimple:
                 
                 # 4. 组合并显示
                 full_packet = header_data + payload_data
-                hex_str = full_packet.hex()
-                formatted_hex = ' '.join(hex_str[i:i+2] for i in range(0, len(hex_str), 2))
+                if self.recorder:
+                    self.recorder.received(full_packet)
+                self.logger.packet(RECV, full_packet)
                 
                 # 简要显示解析信息
-                info = f"Cmd=0x{header['command']:04x} Len={header['length']} Session=0x{header['session']:08x} Status=0x{header['status']:08x}"
-                self.log("←─", f"Recv ({len(full_packet)} bytes): {formatted_hex}")
-                self.log("   ", f"└── {info}")
+                if not self.logger.quiet:
+                    info = f"Cmd=0x{header['command']:04x} Len={header['length']} Session=0x{header['session']:08x} Status=0x{header['status']:08x}"
+                    self.log("   ", f"└── {info}")
                 
             except socket.timeout:
                 continue
@@ -129,11 +134,11 @@ class EtherNetIPClientSimple:
                 
             data = bytes.fromhex(hex_clean)
             self.sock.send(data)
+            if self.recorder:
+                self.recorder.sent(data)
             
             # 格式化显示发送内容
-            hex_out = data.hex()
-            formatted_out = ' '.join(hex_out[i:i+2] for i in range(0, len(hex_out), 2))
-            self.log("─→", f"Send ({len(data)} bytes): {formatted_out}")
+            self.logger.packet(SEND, data)
             return True
         except ValueError:
             self.log("✗", "Invalid hex string")
@@ -153,6 +158,9 @@ class EtherNetIPClientSimple:
         if self.recv_thread:
             self.recv_thread.join(timeout=1)
         self.log("✓", "Connection closed")
+        if self.recorder:
+            self.log("✓", f"Session recorded to {self.recorder.close()}")
+        self.logger.close()
 
     def run(self):
         """主循环"""
@@ -188,6 +196,8 @@ class EtherNetIPClientSimple:
             self.close()
 
 def main():
+    record = pop_record_arg(sys.argv)
+    quiet, trace = pop_log_args(sys.argv)
     host = '127.0.0.1'
     port = 44818
     
@@ -196,7 +206,7 @@ def main():
     if len(sys.argv) > 2:
         port = int(sys.argv[2])
     
-    client = EtherNetIPClientSimple(host, port)
+    client = EtherNetIPClientSimple(host, port, record, quiet, trace)
     client.run()
 
 if __name__ == '__main__':
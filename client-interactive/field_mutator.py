@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+结构感知的协议字段变异引擎
+字段布局与交互式客户端的报文构造函数一致:
+  MODBUS      MBAP 头 + PDU（build_modbus_request）
+  ETHERNETIP  封装头（build_encaps_header）+ SendRRData CPF 项 + CIP 服务 / EPATH（build_get_attribute_single）
+  IEC104      APCI（启动字符、长度、4 字节控制域）+ ASDU
+  SLMPB       SLMP 二进制帧头 + 命令 / 子命令 + 数据
+每个变异体只修改选中的字段（随机值、边界值、加减、位翻转；负载字段逐字节替换），
+长度字段始终按帧长重新填写，常量字段（IEC104 启动字符、Modbus 协议 ID、SLMP 副头部）保持不变，
+保证变异体能通过服务器的分帧（--mutate-lengths 可按比例故意破坏长度和常量字段）。
+同一模板的变异体以 numpy 矩阵（变异体数 x 帧长）成批生成，单进程每分钟可生成数百万个分帧正确的输入。
+
+三种用法:
+  1. 生成种子 / 同步目录（AFLNet replayable 格式，可放入 sync/<name>/queue 供 AFLNet 类模糊器导入）
+       python3 field_mutator.py generate libmodbus --count 10000 -o ../results/libmodbus-aflnet-1/sync/fieldmut/queue
+       python3 field_mutator.py generate opener --seeds ../results/opener-a3-1/replayable-queue --count 1000000 --stream /tmp/opener.bin
+  2. Python 侧模糊测试（直接发送变异体，连接被重置 / 服务器无法重连时保存触发输入）
+       python3 field_mutator.py fuzz libslmp2 --count 200000 --crash-dir /tmp/slmp-crashes
+  3. AFL++ 风格的 Python custom mutator（init / fuzz / deinit，输入为 replayable 格式）
+       FIELD_MUTATOR_PROTOCOL=ETHERNETIP PYTHONPATH=client-interactive AFL_PYTHON_MODULE=field_mutator afl-fuzz ...
+  查看字段布局:
+       python3 field_mutator.py fields opener
+"""
+
+import argparse
+import os
+import re
+import socket
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from framers import frame_length  # noqa: E402
+from replayable import LENGTH_PREFIX, encode_messages, list_testcases, parse_messages, read_messages  # noqa: E402
+from targets import TARGETS  # noqa: E402
+
+# kind: int 整数字段 / length 长度字段（值 = 帧长 - base）/ magic 常量字段（分帧依赖的固定值）/ bytes 逐字节变异的负载
+Field = namedtuple('Field', 'name offset size order kind base')
+# 只在 --mutate-lengths 故意破坏分帧时才变异的字段
+FIXED_KINDS = ('length', 'magic')
+
+ID_RE = re.compile(r'^id:(\d+)')
+PROTOCOLS = ['MODBUS', 'ETHERNETIP', 'IEC104', 'SLMPB']
+
+# 边界值（按字段位宽截取）
+INTERESTING = [0, 1, 0x7f, 0x80, 0xff, 0x100, 0x7fff, 0x8000, 0xffff, 0x10000,
+               0x7fffffff, 0x80000000, 0xffffffff]
+ARITH_MAX = 35
+ENIP_REGISTER_SESSION = 0x0065
+
+OP_RANDOM, OP_BOUNDARY, OP_ARITH, OP_BITFLIP = range(4)
+
+
+def _int(name, offset, size, order='big'):
+    return Field(name, offset, size, order, 'int', None)
+
+
+def _magic(name, offset, size, order='big'):
+    return Field(name, offset, size, order, 'magic', None)
+
+
+def _length(name, offset, size, order, base):
+    return Field(name, offset, size, order, 'length', base)
+
+
+def _payload(name, offset, frame):
+    return [Field(name, offset, len(frame) - offset, 'big', 'bytes', None)] if len(frame) > offset else []
+
+
+def modbus_fields(frame):
+    """MBAP: TID(2) + 协议 ID(2) + 长度(2) + 单元 ID(1)，PDU: 功能码(1) + 地址(2) + 数量 / 值(2) 或任意数据"""
+    if len(frame) < 8:
+        return _payload('frame', 0, frame)
+    fields = [_int('transaction_id', 0, 2), _magic('protocol_id', 2, 2),
+              _length('length', 4, 2, 'big', 6), _int('unit_id', 6, 1), _int('function_code', 7, 1)]
+    if frame[7] in (0x01, 0x02, 0x03, 0x04, 0x05, 0x06) and len(frame) >= 12:
+        fields += [_int('address', 8, 2), _int('value_or_count', 10, 2)]
+        return fields + _payload('pdu_tail', 12, frame)
+    return fields + _payload('pdu_data', 8, frame)
+
+
+def ethernetip_fields(frame):
+    """封装头 24 字节；SendRRData 时继续拆分 CPF 的两个项和 CIP 请求（服务码、路径长度、逻辑段）"""
+    if len(frame) < 24:
+        return _payload('frame', 0, frame)
+    fields = [_int('command', 0, 2, 'little'), _length('length', 2, 2, 'little', 24),
+              _int('session_handle', 4, 4, 'little'), _int('status', 8, 4, 'little'),
+              _int('sender_context', 12, 8, 'little'), _int('options', 20, 4, 'little')]
+    command = frame[0] | (frame[1] << 8)
+    if command != 0x006F or len(frame) < 40:
+        return fields + _payload('command_data', 24, frame)
+    fields += [_int('interface_handle', 24, 4, 'little'), _int('timeout', 28, 2, 'little'),
+               _int('item_count', 30, 2, 'little'), _int('address_type', 32, 2, 'little'),
+               _int('address_length', 34, 2, 'little'), _int('data_type', 36, 2, 'little'),
+               _length('data_length', 38, 2, 'little', 40)]
+    if len(frame) < 42:
+        return fields + _payload('cip_data', 40, frame)
+    fields += [_int('cip_service', 40, 1), _int('path_size', 41, 1)]
+    path_end = min(42 + 2 * frame[41], len(frame))
+    for i, offset in enumerate(range(42, path_end - 1, 2)):
+        fields += [_int(f'path_segment{i}', offset, 1), _int(f'path_value{i}', offset + 1, 1)]
+    return fields + _payload('cip_request_data', path_end, frame)
+
+
+def iec104_fields(frame):
+    """APCI: 0x68 + 长度(1) + 控制域(4)；I 帧的 ASDU: 类型标识(1) 可变结构限定词(1) 传送原因(2) 公共地址(2) 信息体地址(3) + 信息元素"""
+    if len(frame) < 6 or frame[0] != 0x68:
+        return _payload('frame', 0, frame)
+    fields = [_magic('start', 0, 1), _length('length', 1, 1, 'big', 2),
+              _int('control1', 2, 2, 'little'), _int('control2', 4, 2, 'little')]
+    if frame[2] & 0x01 or len(frame) < 15:
+        return fields + _payload('asdu', 6, frame)
+    fields += [_int('type_id', 6, 1), _int('vsq', 7, 1), _int('cot', 8, 2, 'little'),
+               _int('common_address', 10, 2, 'little'), _int('ioa', 12, 3, 'little')]
+    return fields + _payload('information_element', 15, frame)
+
+
+def slmpb_fields(frame):
+    """SLMP 二进制: 副头部(2) 网络号(1) PC 号(1) I/O 号(2) 站号(1) 长度(2) 监视定时器(2) 命令(2) 子命令(2) 数据"""
+    if len(frame) < 15:
+        return _payload('frame', 0, frame)
+    fields = [_magic('subheader', 0, 2, 'little'), _int('network', 2, 1), _int('pc', 3, 1),
+              _int('io_number', 4, 2, 'little'), _int('station', 6, 1),
+              _length('length', 7, 2, 'little', 9), _int('timer', 9, 2, 'little'),
+              _int('command', 11, 2, 'little'), _int('subcommand', 13, 2, 'little')]
+    return fields + _payload('data', 15, frame)
+
+
+LAYOUTS = {
+    'MODBUS': modbus_fields,
+    'ETHERNETIP': ethernetip_fields,
+    'IEC104': iec104_fields,
+    'SLMPB': slmpb_fields,
+}
+
+
+def layout(protocol, frame):
+    if protocol not in LAYOUTS:
+        raise ValueError(f"Unsupported protocol '{protocol}', expected one of: {', '.join(PROTOCOLS)}")
+    return LAYOUTS[protocol](frame)
+
+
+def builtin_templates(protocol):
+    """
+    由交互式客户端的构造函数 / 预设命令生成模板，返回 [(setup 消息列表, 模板帧)]
+    EtherNet/IP 的 CIP 请求前面先发 RegisterSession（与交互式客户端连接时一致）
+    """
+    if protocol == 'MODBUS':
+        from modbus_interactive import ModbusInteractiveClient
+        client = ModbusInteractiveClient()
+        return [([], client.build_modbus_request(fc, 0, 1)) for fc in (0x01, 0x02, 0x03, 0x04, 0x05, 0x06)]
+    if protocol == 'ETHERNETIP':
+        from ethernetip_interactive import EtherNetIPClient
+        client = EtherNetIPClient()
+        register = client.build_register_session()
+        return [([], register), ([], client.build_list_identity()),
+                ([register], client.build_get_attribute_single(0x01, 1, 1)),
+                ([register], client.build_get_attribute_single(0x01, 1, 7)),
+                ([register], client.build_unregister_session())]
+    if protocol == 'IEC104':
+        from iec104_interactive_realtime import PRESETS
+        # U 帧单独发送；I 帧（总召唤）前先发 STARTDT，否则服务器不处理 ASDU
+        startdt = bytes.fromhex(PRESETS['startdt'])
+        return [([startdt] if name == 'interrogation' else [], bytes.fromhex(h)) for name, h in PRESETS.items()]
+    if protocol == 'SLMPB':
+        from slmp_interactive import HEARTBEAT, PRESETS
+        frames = {bytes.fromhex(h) for h in list(PRESETS.values()) + [HEARTBEAT]}
+        return [([], f) for f in sorted(frames)]
+    raise ValueError(f"Unsupported protocol '{protocol}', expected one of: {', '.join(PROTOCOLS)}")
+
+
+def corpus_templates(protocol, directory, limit=256):
+    """从 replayable 测试用例中取模板: 每条消息一个模板，它之前的消息作为 setup（保留会话上下文）"""
+    templates = []
+    seen = set()
+    for path in list_testcases(directory):
+        messages = [bytes(m) for m in read_messages(path)]
+        for i, message in enumerate(messages):
+            if not message or message in seen:
+                continue
+            seen.add(message)
+            templates.append((messages[:i], message))
+            if len(templates) >= limit:
+                return templates
+    return templates
+
+
+class FieldMutator:
+    """
+    单个模板的批量变异
+      generate(count) -> uint8 矩阵 (count, 帧长)，每行一个变异体
+    stack: 每个变异体修改的字段数；mutate_lengths: 把长度 / 常量字段也作为变异目标的比例
+    """
+
+    def __init__(self, template, fields, rng=None, stack=1, mutate_lengths=0.0):
+        self.template = np.frombuffer(bytes(template), dtype=np.uint8)
+        self.fields = fields
+        self.targets = [f for f in fields if f.kind not in FIXED_KINDS]
+        self.fixed = [f for f in fields if f.kind in FIXED_KINDS]
+        self.rng = rng or np.random.default_rng()
+        self.stack = stack
+        self.mutate_lengths = mutate_lengths
+        if not self.targets:
+            raise ValueError("template has no mutable fields")
+
+    def _read(self, field):
+        return int.from_bytes(self.template[field.offset:field.offset + field.size].tobytes(), field.order)
+
+    def _write(self, batch, rows, field, values):
+        for i in range(field.size):
+            shift = 8 * (field.size - 1 - i) if field.order == 'big' else 8 * i
+            batch[rows, field.offset + i] = ((values >> np.uint64(shift)) & np.uint64(0xFF)).astype(np.uint8)
+
+    def _mutate_int(self, field, count):
+        """返回 count 个新值（uint64），四种算子按行随机选择"""
+        bits = 8 * field.size
+        mask = np.uint64((1 << bits) - 1) if bits < 64 else np.uint64(0xFFFFFFFFFFFFFFFF)
+        original = np.uint64(self._read(field))
+        ops = self.rng.integers(0, 4, size=count)
+        values = np.full(count, original, dtype=np.uint64)
+
+        sel = ops == OP_RANDOM
+        values[sel] = self.rng.integers(0, 1 << bits, size=int(sel.sum()), dtype=np.uint64)
+
+        sel = ops == OP_BOUNDARY
+        choices = np.array([v for v in INTERESTING if v < (1 << bits)], dtype=np.uint64)
+        values[sel] = choices[self.rng.integers(0, len(choices), size=int(sel.sum()))]
+
+        sel = ops == OP_ARITH
+        delta = self.rng.integers(1, ARITH_MAX + 1, size=int(sel.sum())).astype(np.uint64)
+        negative = self.rng.random(int(sel.sum())) < 0.5
+        values[sel] = np.where(negative, original - delta, original + delta) & mask
+
+        sel = ops == OP_BITFLIP
+        bit = self.rng.integers(0, bits, size=int(sel.sum())).astype(np.uint64)
+        values[sel] = original ^ (np.uint64(1) << bit)
+        return values
+
+    def _mutate_bytes(self, batch, rows, field):
+        """负载字段: 随机位置替换为随机字节或边界字节"""
+        count = len(rows)
+        positions = field.offset + self.rng.integers(0, field.size, size=count)
+        values = self.rng.integers(0, 256, size=count).astype(np.uint8)
+        boundary = self.rng.random(count) < 0.25
+        values[boundary] = np.array([0x00, 0x01, 0x7f, 0x80, 0xff], dtype=np.uint8)[
+            self.rng.integers(0, 5, size=int(boundary.sum()))]
+        batch[rows, positions] = values
+
+    def generate(self, count):
+        batch = np.tile(self.template, (count, 1))
+        fields = self.targets + self.fixed
+        # 被故意变异的长度字段（按行），其余行的长度字段最后按帧长重新填写；常量字段未被选中时保持模板值
+        broken = np.zeros((len(self.fixed), count), dtype=bool)
+        for _ in range(self.stack):
+            choice = self.rng.integers(0, len(self.targets), size=count)
+            if self.mutate_lengths and self.fixed:
+                # 长度 / 常量字段按 mutate_lengths 的比例被选中，其余情况分帧始终正确
+                hit = self.rng.random(count) < self.mutate_lengths
+                choice[hit] = len(self.targets) + self.rng.integers(0, len(self.fixed), size=int(hit.sum()))
+            for index, field in enumerate(fields):
+                rows = np.nonzero(choice == index)[0]
+                if not len(rows):
+                    continue
+                if field.kind == 'bytes':
+                    self._mutate_bytes(batch, rows, field)
+                else:
+                    self._write(batch, rows, field, self._mutate_int(field, len(rows)))
+                    if field.kind in FIXED_KINDS:
+                        broken[index - len(self.targets), rows] = True
+        # 模板本身的长度字段可能不一致（例如来自 corpus 的变异输入），统一改为 帧长 - base
+        for i, field in enumerate(self.fixed):
+            if field.kind != 'length':
+                continue
+            rows = np.nonzero(~broken[i])[0]
+            value = max(len(self.template) - field.base, 0) & ((1 << (8 * field.size)) - 1)
+            self._write(batch, rows, field, np.full(len(rows), value, dtype=np.uint64))
+        return batch
+
+
+class MutationEngine:
+    """多个模板轮流成批生成；frames() 逐个返回 (setup 消息列表, 变异体 bytes)"""
+
+    def __init__(self, protocol, templates, seed=None, stack=1, mutate_lengths=0.0, batch_size=65536):
+        self.protocol = protocol
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.mutators = []
+        for setup, frame in templates:
+            fields = layout(protocol, frame)
+            if any(f.kind not in FIXED_KINDS for f in fields):
+                self.mutators.append((setup, FieldMutator(frame, fields, self.rng, stack, mutate_lengths)))
+        if not self.mutators:
+            raise ValueError(f"no usable {protocol} templates")
+
+    def _batches(self, count):
+        """按模板均分 count，各模板轮流逐批返回 (setup, FieldMutator, uint8 矩阵)"""
+        remaining = [count // len(self.mutators)] * len(self.mutators)
+        for i in range(count % len(self.mutators)):
+            remaining[i] += 1
+        while any(remaining):
+            for i, (setup, mutator) in enumerate(self.mutators):
+                size = min(remaining[i], self.batch_size)
+                if size:
+                    yield setup, mutator, mutator.generate(size)
+                    remaining[i] -= size
+
+    def batches(self, count):
+        for setup, _, batch in self._batches(count):
+            yield setup, batch
+
+    def frames(self, count):
+        """逐个返回 (setup 消息列表, 模板帧, 变异体 bytes)"""
+        for setup, mutator, batch in self._batches(count):
+            template = mutator.template.tobytes()
+            for row in batch:
+                yield setup, template, row.tobytes()
+
+
+def stream_bytes(setup, batch):
+    """把一批变异体编码为连续的 replayable 字节流（每个变异体: setup 消息 + 变异体），前缀用向量化方式拼接"""
+    prefix = np.frombuffer(LENGTH_PREFIX.pack(batch.shape[1]), dtype=np.uint8)
+    rows = np.hstack([np.tile(prefix, (batch.shape[0], 1)), batch])
+    if setup:
+        head = np.frombuffer(encode_messages(setup), dtype=np.uint8)
+        rows = np.hstack([np.tile(head, (batch.shape[0], 1)), rows])
+    return rows.tobytes(), rows.shape[1]
+
+
+def _next_id(directory):
+    ids = [int(m.group(1)) for m in map(ID_RE.match, os.listdir(directory)) if m]
+    return max(ids) + 1 if ids else 0
+
+
+def resolve_protocol(name):
+    if name in TARGETS:
+        return TARGETS[name]['protocol'], TARGETS[name]['port']
+    if name.upper() in PROTOCOLS:
+        return name.upper(), None
+    raise ValueError(f"Unknown target or protocol '{name}'")
+
+
+def cmd_fields(args, protocol, templates):
+    for setup, frame in templates:
+        print(f"template ({len(frame)} bytes{', after %d setup message(s)' % len(setup) if setup else ''}): {frame.hex(' ')}")
+        for f in layout(protocol, frame):
+            print(f"  {f.name:<20} offset={f.offset:<3} size={f.size:<3} {f.kind}")
+    return 0
+
+
+def cmd_generate(args, protocol, templates):
+    engine = MutationEngine(protocol, templates, args.seed, args.stack, args.mutate_lengths, args.batch_size)
+    start = time.perf_counter()
+    written = 0
+    if args.stream:
+        with open(args.stream, 'wb') as f:
+            for setup, batch in engine.batches(args.count):
+                data, _ = stream_bytes(setup, batch)
+                f.write(data)
+                written += len(batch)
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        next_id = _next_id(args.output)
+        for setup, batch in engine.batches(args.count):
+            data, width = stream_bytes(setup, batch)
+            for i in range(len(batch)):
+                with open(os.path.join(args.output, f"id:{next_id:06d},src:fieldmut"), 'wb') as f:
+                    f.write(data[i * width:(i + 1) * width])
+                next_id += 1
+            written += len(batch)
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed * 60 if elapsed else 0
+    print(f"Generated {written} {protocol} mutants from {len(engine.mutators)} template(s) "
+          f"in {elapsed:.2f}s ({rate:,.0f}/min) -> {args.stream or args.output}")
+    return 0
+
+
+def _connect(host, port, timeout):
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def _exchange(sock, protocol, data, timeout):
+    """发送并读取一条完整响应；返回 (状态, 已收到的字节)，状态为 'ok' / 'silent' / 'reset'"""
+    sock.sendall(data)
+    sock.settimeout(timeout)
+    buffer = b''
+    while True:
+        length = frame_length(protocol, buffer) if buffer else None
+        if length is not None and (length < 0 or len(buffer) >= length):
+            return 'ok', buffer
+        try:
+            chunk = sock.recv(4096)
+        except socket.timeout:
+            return 'silent', buffer
+        if not chunk:
+            return 'reset', buffer
+        buffer += chunk
+
+
+def session_handle(protocol, response):
+    """EtherNet/IP RegisterSession 成功响应中服务器分配的会话句柄；其他响应返回 None"""
+    if protocol != 'ETHERNETIP' or len(response) < 24:
+        return None
+    if response[0] | (response[1] << 8) != ENIP_REGISTER_SESSION or any(response[8:12]):
+        return None
+    return response[4:8]
+
+
+def with_session_handle(message, template, handle):
+    """
+    模板中的会话句柄来自构造时（0）或录制时的服务器，与本连接上注册得到的句柄不同，
+    服务器会拒绝整个请求；沿用模板句柄的报文换成本连接的句柄，被变异过的句柄保持不变
+    """
+    if handle is None or len(message) < 24 or message[4:8] != template[4:8]:
+        return message
+    return message[:4] + handle + message[8:]
+
+
+def cmd_fuzz(args, protocol, templates):
+    """
+    Python 侧模糊测试: 每个 setup 组合保持一个连接，连接被关闭 / 重置时重连；
+    EtherNet/IP 的变异体使用本连接 RegisterSession 得到的会话句柄（见 with_session_handle）；
+    重连失败视为服务器崩溃，保存最近发送的输入（当前会话的所有消息）后停止
+    """
+    port = args.port or resolve_protocol(args.target)[1]
+    engine = MutationEngine(protocol, templates, args.seed, args.stack, args.mutate_lengths, args.batch_size)
+    os.makedirs(args.crash_dir, exist_ok=True)
+    stats = {'sent': 0, 'ok': 0, 'silent': 0, 'reset': 0}
+    sock, current_setup, session = None, None, []
+    start = last_report = time.perf_counter()
+
+    def save(kind, messages):
+        path = os.path.join(args.crash_dir, f"id:{_next_id(args.crash_dir):06d},src:fieldmut,{kind}")
+        with open(path, 'wb') as f:
+            f.write(encode_messages(messages))
+        return path
+
+    try:
+        for setup, template, frame in engine.frames(args.count):
+            if sock is None or setup is not current_setup:
+                if sock:
+                    sock.close()
+                try:
+                    sock = _connect(args.host, port, args.timeout * 4)
+                except OSError as e:
+                    if session:
+                        print(f"Server unreachable ({e}), input saved to {save('crash', session)}")
+                        return 1
+                    print(f"Error: cannot connect to {args.host}:{port}: {e}")
+                    return 1
+                current_setup, session, handle = setup, [], None
+                for message in setup:
+                    message = with_session_handle(message, template, handle)
+                    session.append(message)
+                    _, response = _exchange(sock, protocol, message, args.timeout)
+                    handle = session_handle(protocol, response) or handle
+            frame = with_session_handle(frame, template, handle)
+            session.append(frame)
+            try:
+                status, _ = _exchange(sock, protocol, frame, args.timeout)
+            except OSError:
+                status = 'reset'
+            stats['sent'] += 1
+            stats[status] += 1
+            if status == 'reset':
+                if args.save_resets:
+                    save('reset', session)
+                sock.close()
+                sock = None
+            elif len(session) > args.session_length:
+                # 会话过长时换一个连接，保存的崩溃输入保持较短
+                sock.close()
+                sock = None
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                last_report = now
+                print(f"[fuzz] sent={stats['sent']} ok={stats['ok']} silent={stats['silent']} "
+                      f"reset={stats['reset']} ({stats['sent'] / (now - start):,.0f}/s)", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sock:
+            sock.close()
+    elapsed = time.perf_counter() - start
+    print(f"[fuzz] done: sent={stats['sent']} ok={stats['ok']} silent={stats['silent']} "
+          f"reset={stats['reset']} in {elapsed:.1f}s")
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# AFL++ Python custom mutator 接口（AFL_PYTHON_MODULE=field_mutator）
+# 输入 / 输出均为 replayable 格式，每次随机选一条消息做一次字段变异
+# ---------------------------------------------------------------------------
+
+_state = {}
+
+
+def init(seed):
+    _state['protocol'] = os.environ.get('FIELD_MUTATOR_PROTOCOL', 'MODBUS').upper()
+    _state['rng'] = np.random.default_rng(seed)
+    _state['cache'] = {}
+
+
+def fuzz(buf, add_buf, max_size):
+    messages = [bytes(m) for m in parse_messages(bytes(buf))] or [bytes(buf)]
+    index = int(_state['rng'].integers(0, len(messages)))
+    message = messages[index]
+    mutator = _state['cache'].get(message)
+    if mutator is None:
+        fields = layout(_state['protocol'], message) if message else []
+        if not any(f.kind not in FIXED_KINDS for f in fields):
+            return bytearray(buf[:max_size])
+        if len(_state['cache']) > 4096:
+            _state['cache'].clear()
+        mutator = _state['cache'][message] = FieldMutator(message, fields, _state['rng'])
+    messages[index] = mutator.generate(1)[0].tobytes()
+    return bytearray(encode_messages(messages)[:max_size])
+
+
+def deinit():
+    _state.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structure-aware field mutation engine for the ICS protocol clients")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('target', help='target name (e.g. libmodbus, opener) or protocol (MODBUS, ETHERNETIP, IEC104, SLMPB)')
+        p.add_argument('--seeds', help='replayable testcase directory to take templates from (default: client builders)')
+        p.add_argument('--max-templates', type=int, default=256)
+        p.add_argument('--seed', type=int, help='random seed')
+        p.add_argument('--stack', type=int, default=1, help='fields mutated per mutant')
+        p.add_argument('--mutate-lengths', type=float, default=0.0,
+                       help='fraction of field picks allowed to hit length / magic fields (default: framing always valid)')
+        p.add_argument('--batch-size', type=int, default=65536)
+
+    p = sub.add_parser('fields', help='show the field layout of each template')
+    common(p)
+    p = sub.add_parser('generate', help='write mutants as replayable testcases or one stream file')
+    common(p)
+    p.add_argument('--count', type=int, default=10000)
+    out = p.add_mutually_exclusive_group(required=True)
+    out.add_argument('-o', '--output', help='directory for id:NNNNNN,src:fieldmut testcases')
+    out.add_argument('--stream', help='single file with all mutants concatenated in replayable format')
+    p = sub.add_parser('fuzz', help='send mutants to a live server')
+    common(p)
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int)
+    p.add_argument('--count', type=int, default=1000000)
+    p.add_argument('--timeout', type=float, default=0.2, help='response timeout per mutant')
+    p.add_argument('--session-length', type=int, default=64, help='mutants per connection')
+    p.add_argument('--crash-dir', default='fieldmut-crashes')
+    p.add_argument('--save-resets', action='store_true', help='also save sessions the server reset')
+    p.set_defaults(batch_size=4096)
+    args = parser.parse_args()
+
+    try:
+        protocol, _ = resolve_protocol(args.target)
+        if args.seeds:
+            templates = corpus_templates(protocol, args.seeds, args.max_templates)
+        else:
+            templates = builtin_templates(protocol)
+        if not templates:
+            print(f"Error: no templates found in {args.seeds}")
+            return 1
+        handler = {'fields': cmd_fields, 'generate': cmd_generate, 'fuzz': cmd_fuzz}[args.command]
+        return handler(args, protocol, templates)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
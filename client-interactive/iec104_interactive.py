@@ -4,9 +4,16 @@ import socket
 import sys
 import time
 
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, ascii_view, pop_log_args
+
 def main():
     host = '127.0.0.1'
     port = 2404
+    record = pop_record_arg(sys.argv)
+    recorder = SessionRecorder(record, 'IEC104', host, port) if record else None
+    quiet, trace = pop_log_args(sys.argv)
+    logger = ClientLog(quiet, trace)
     
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -38,6 +45,9 @@ def main():
                     try:
                         data = bytes.fromhex(user_input)
                         sock.send(data)
+                        if recorder:
+                            recorder.sent(data)
+                        logger.trace(SEND, data)
                         print(f"[→] Sent: {data.hex()}")
                     except ValueError:
                         print("[!] Invalid hex string")
@@ -48,10 +58,13 @@ def main():
                 try:
                     resp = sock.recv(4096)
                     if resp:
-                        print(f"[←] Response: {resp.hex()}")
-                        # 也显示可读的ASCII（如果有）
-                        ascii_repr = ''.join(chr(b) if 32 <= b < 127 else '.' for b in resp)
-                        print(f"[←] ASCII: {ascii_repr}")
+                        if recorder:
+                            recorder.received(resp)
+                        logger.trace(RECV, resp)
+                        if not quiet:
+                            print(f"[←] Response: {resp.hex()}")
+                            # 也显示可读的ASCII（如果有）
+                            print(f"[←] ASCII: {ascii_view(resp)}")
                 except socket.timeout:
                     pass  # 没有响应，正常
                 
@@ -68,6 +81,11 @@ def main():
     except Exception as e:
         print(f"[!] Connection error: {e}")
         sys.exit(1)
+    finally:
+        # 连接失败或异常退出时也保存已录制的会话
+        if recorder:
+            print(f"[*] Session recorded to {recorder.close()}")
+        logger.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -4,23 +4,37 @@ import socket
 import sys
 import threading
 import time
-from datetime import datetime
+
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, pop_log_args
+from batch_runner import parse_hex, pop_option, run_client_batch
+
+# 预设命令
+PRESETS = {
+    'startdt': '680407000000',
+    'testfr':  '680443000000',
+    'stopdt':  '680413000000',
+    # 总召唤 C_IC_NA_1（I 帧，需先 startdt）: 类型 100，传送原因 6（激活），公共地址 1，QOI 20
+    'interrogation': '680e0000000064010600010000000014',
+}
 
 class IEC104Client:
-    def __init__(self, host='127.0.0.1', port=10000):
+    def __init__(self, host='127.0.0.1', port=10000, record=None, quiet=False, trace=None):
         self.host = host
         self.port = port
         self.sock = None
         self.running = False
         self.recv_thread = None
+        self.recorder = SessionRecorder(record, 'IEC104', host, port) if record else None
+        self.logger = ClientLog(quiet, trace)
         
     def timestamp(self):
         """获取当前时间戳"""
-        return datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        return self.logger.timestamp()
     
-    def log(self, prefix, message, flush=True):
+    def log(self, prefix, message, flush=None):
         """带时间戳的日志输出"""
-        print(f"[{self.timestamp()}] {prefix} {message}", flush=flush)
+        self.logger.log(prefix, message, flush=flush)
     
     def receive_loop(self):
         """独立线程：持续接收服务器数据"""
@@ -30,16 +44,9 @@ class IEC104Client:
             try:
                 data = self.sock.recv(4096)
                 if data:
-                    hex_str = data.hex()
-                    # 格式化十六进制显示（每2字节加空格）
-                    formatted_hex = ' '.join(hex_str[i:i+2] for i in range(0, len(hex_str), 2))
-                    
-                    # ASCII 表示
-                    ascii_repr = ''.join(chr(b) if 32 <= b < 127 else '.' for b in data)
-                    
-                    self.log("←─", f"Recv ({len(data)} bytes): {formatted_hex}")
-                    if ascii_repr.strip('.'):
-                        self.log("   ", f"ASCII: {ascii_repr}")
+                    if self.recorder:
+                        self.recorder.received(data)
+                    self.logger.packet(RECV, data, ascii=True)
                 else:
                     # 连接关闭
                     self.log("⚠ ", "Server closed connection")
@@ -80,10 +87,10 @@ class IEC104Client:
         try:
             data = bytes.fromhex(hex_string)
             self.sock.send(data)
+            if self.recorder:
+                self.recorder.sent(data)
             
-            # 格式化显示
-            formatted_hex = ' '.join(hex_string[i:i+2] for i in range(0, len(hex_string), 2))
-            self.log("─→", f"Send ({len(data)} bytes): {formatted_hex}")
+            self.logger.packet(SEND, data)
             
             return True
             
@@ -94,6 +101,14 @@ class IEC104Client:
             self.log("✗", f"Send error: {e}")
             return False
     
+    def build_command(self, cmd):
+        """批处理模式: 预设命令名或十六进制 -> 报文"""
+        return parse_hex(PRESETS.get(cmd.lower(), cmd))
+
+    def run_batch(self, path, timeout=1.0, output=None):
+        """非交互批处理: 逐行发送并等待完整 APDU，结果以 JSONL 输出（S 帧等无响应的帧记为超时）"""
+        return run_client_batch(self, 'IEC104', path, self.build_command, timeout, output)
+    
     def close(self):
         """关闭连接"""
         self.running = False
@@ -105,6 +120,9 @@ class IEC104Client:
         if self.recv_thread:
             self.recv_thread.join(timeout=1)
         self.log("✓", "Connection closed")
+        if self.recorder:
+            self.log("✓", f"Session recorded to {self.recorder.close()}")
+        self.logger.close()
     
     def interactive(self):
         """交互式主循环"""
@@ -119,6 +137,7 @@ class IEC104Client:
         print("    - startdt    : 发送 STARTDT 激活帧 (68 04 07 00 00 00)")
         print("    - testfr     : 发送 TESTFR 测试帧 (68 04 43 00 00 00)")
         print("    - stopdt     : 发送 STOPDT 停止帧 (68 04 13 00 00 00)")
+        print("    - interrogation : 发送总召唤 I 帧 (68 0e 00 00 00 00 64 01 06 00 01 00 00 00 00 14)")
         print("  • quit / exit / q : 退出")
         print()
         print("-" * 70)
@@ -127,12 +146,7 @@ class IEC104Client:
         if not self.connect():
             return
         
-        # 预设命令
-        presets = {
-            'startdt': '680407000000',
-            'testfr':  '680443000000',
-            'stopdt':  '680413000000',
-        }
+        presets = PRESETS
         
         try:
             while self.running:
@@ -176,6 +190,11 @@ def main():
     sys.stderr = sys.__stderr__
     
     # 解析命令行参数
+    record = pop_record_arg(sys.argv)
+    quiet, trace = pop_log_args(sys.argv)
+    batch = pop_option(sys.argv, '--batch')
+    timeout = float(pop_option(sys.argv, '--timeout', 1.0))
+    output = pop_option(sys.argv, '--output')
     host = '127.0.0.1'
     port = 2404
     
@@ -184,9 +203,12 @@ def main():
     if len(sys.argv) > 2:
         port = int(sys.argv[2])
     
-    client = IEC104Client(host, port)
+    client = IEC104Client(host, port, record, quiet, trace)
+    if batch:
+        return client.run_batch(batch, timeout, output)
     client.interactive()
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
 
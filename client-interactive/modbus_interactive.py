@@ -8,16 +8,21 @@ import socket
 import sys
 import threading
 import time
-from datetime import datetime
+
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, pop_log_args
+from batch_runner import parse_hex, pop_option, run_client_batch
 
 class ModbusInteractiveClient:
-    def __init__(self, host='127.0.0.1', port=1502):
+    def __init__(self, host='127.0.0.1', port=1502, record=None, quiet=False, trace=None):
         self.host = host
         self.port = port
         self.sock = None
         self.running = False
         self.receive_thread = None
         self.transaction_id = 1
+        self.recorder = SessionRecorder(record, 'MODBUS', host, port) if record else None
+        self.logger = ClientLog(quiet, trace)
         
     def connect(self):
         """连接到 Modbus 服务器"""
@@ -46,6 +51,9 @@ class ModbusInteractiveClient:
             except:
                 pass
         self.log("✓", "Disconnected")
+        if self.recorder:
+            self.log("✓", f"Session recorded to {self.recorder.close()}")
+        self.logger.close()
     
     def receive_loop(self):
         """接收数据的独立线程"""
@@ -53,7 +61,10 @@ class ModbusInteractiveClient:
             try:
                 data = self.sock.recv(4096)
                 if data:
-                    self.log("←─", f"Recv: {data.hex()}", self.parse_modbus_response(data))
+                    if self.recorder:
+                        self.recorder.received(data)
+                    self.logger.trace(RECV, data)
+                    self.log("←─", f"Recv: {data.hex()}", lambda: self.parse_modbus_response(data))
                 else:
                     self.log("!", "Server closed connection")
                     self.running = False
@@ -65,14 +76,21 @@ class ModbusInteractiveClient:
                     self.log("!", f"Receive error: {e}")
                 break
     
+    def transmit(self, packet):
+        """发送数据包（录制模式下同时记录）"""
+        self.sock.sendall(packet)
+        if self.recorder:
+            self.recorder.sent(packet)
+        self.logger.trace(SEND, packet)
+    
     def send_hex(self, hex_string):
         """发送十六进制字符串"""
         try:
             # 移除空格和常见分隔符
             hex_clean = hex_string.replace(' ', '').replace(':', '').replace('-', '')
             data = bytes.fromhex(hex_clean)
-            self.sock.sendall(data)
-            self.log("─→", f"Send: {data.hex()}", self.parse_modbus_request(data))
+            self.transmit(data)
+            self.log("─→", f"Send: {data.hex()}", lambda: self.parse_modbus_request(data))
             return True
         except ValueError as e:
             self.log("✗", f"Invalid hex format: {e}")
@@ -109,21 +127,21 @@ class ModbusInteractiveClient:
     def send_read_holding_registers(self, address, count):
         """读取保持寄存器 (FC 0x03)"""
         packet = self.build_modbus_request(0x03, address, count)
-        self.sock.sendall(packet)
+        self.transmit(packet)
         self.log("─→", f"Send: {packet.hex()}", 
                 f"Read Holding Registers: addr={address}, count={count}")
     
     def send_read_coils(self, address, count):
         """读取线圈 (FC 0x01)"""
         packet = self.build_modbus_request(0x01, address, count)
-        self.sock.sendall(packet)
+        self.transmit(packet)
         self.log("─→", f"Send: {packet.hex()}", 
                 f"Read Coils: addr={address}, count={count}")
     
     def send_write_register(self, address, value):
         """写入单个寄存器 (FC 0x06)"""
         packet = self.build_modbus_request(0x06, address, value)
-        self.sock.sendall(packet)
+        self.transmit(packet)
         self.log("─→", f"Send: {packet.hex()}", 
                 f"Write Single Register: addr={address}, value={value}")
     
@@ -131,10 +149,27 @@ class ModbusInteractiveClient:
         """写入单个线圈 (FC 0x05)"""
         coil_value = 0xFF00 if value else 0x0000
         packet = self.build_modbus_request(0x05, address, coil_value)
-        self.sock.sendall(packet)
+        self.transmit(packet)
         self.log("─→", f"Send: {packet.hex()}", 
                 f"Write Single Coil: addr={address}, value={'ON' if value else 'OFF'}")
     
+    def build_command(self, cmd):
+        """批处理模式: 把一行预设命令或十六进制转换为请求报文（格式错误抛出 ValueError）"""
+        parts = cmd.split()
+        name = parts[0].lower()
+        if name in ['read', 'readc'] and len(parts) == 3:
+            return self.build_modbus_request(0x03 if name == 'read' else 0x01, int(parts[1], 0), int(parts[2], 0))
+        if name == 'write' and len(parts) == 3:
+            return self.build_modbus_request(0x06, int(parts[1], 0), int(parts[2], 0))
+        if name == 'writec' and len(parts) == 3:
+            value = 0xFF00 if parts[2].lower() in ['on', '1', 'true', 'yes'] else 0x0000
+            return self.build_modbus_request(0x05, int(parts[1], 0), value)
+        return parse_hex(cmd)
+
+    def run_batch(self, path, timeout=1.0, output=None):
+        """非交互批处理: 逐行发送并等待完整响应，结果以 JSONL 输出"""
+        return run_client_batch(self, 'MODBUS', path, self.build_command, timeout, output)
+
     def parse_modbus_request(self, data):
         """解析 Modbus 请求"""
         if len(data) < 8:
@@ -199,11 +234,7 @@ class ModbusInteractiveClient:
     
     def log(self, prefix, message, details=""):
         """打印带时间戳的日志"""
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        if details:
-            print(f"[{timestamp}] {prefix} {message}\n           └─ {details}")
-        else:
-            print(f"[{timestamp}] {prefix} {message}")
+        self.logger.log(prefix, message, details)
     
     def show_help(self):
         """显示帮助信息"""
@@ -297,6 +328,11 @@ class ModbusInteractiveClient:
 
 def main():
     # 解析命令行参数
+    record = pop_record_arg(sys.argv)
+    quiet, trace = pop_log_args(sys.argv)
+    batch = pop_option(sys.argv, '--batch')
+    timeout = float(pop_option(sys.argv, '--timeout', 1.0))
+    output = pop_option(sys.argv, '--output')
     host = '127.0.0.1'
     port = 1502
     
@@ -305,9 +341,12 @@ def main():
     if len(sys.argv) > 2:
         port = int(sys.argv[2])
     
-    client = ModbusInteractiveClient(host, port)
+    client = ModbusInteractiveClient(host, port, record, quiet, trace)
+    if batch:
+        return client.run_batch(batch, timeout, output)
     client.run()
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
 
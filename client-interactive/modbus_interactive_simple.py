@@ -7,15 +7,19 @@ Modbus TCP 实时交互式客户端（简化版）
 import socket
 import sys
 import threading
-from datetime import datetime
+
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, pop_log_args
 
 class ModbusInteractiveClient:
-    def __init__(self, host='127.0.0.1', port=1502):
+    def __init__(self, host='127.0.0.1', port=1502, record=None, quiet=False, trace=None):
         self.host = host
         self.port = port
         self.sock = None
         self.running = False
         self.receive_thread = None
+        self.recorder = SessionRecorder(record, 'MODBUS', host, port) if record else None
+        self.logger = ClientLog(quiet, trace)
         
     def connect(self):
         """连接到 Modbus 服务器"""
@@ -44,6 +48,9 @@ class ModbusInteractiveClient:
             except:
                 pass
         self.log("✓", "Disconnected")
+        if self.recorder:
+            self.log("✓", f"Session recorded to {self.recorder.close()}")
+        self.logger.close()
     
     def receive_loop(self):
         """接收数据的独立线程"""
@@ -51,9 +58,9 @@ class ModbusInteractiveClient:
             try:
                 data = self.sock.recv(4096)
                 if data:
-                    # 格式化显示（每2字节加空格）
-                    formatted_hex = ' '.join(data.hex()[i:i+2] for i in range(0, len(data.hex()), 2))
-                    self.log("←─", f"Recv ({len(data)} bytes): {formatted_hex}")
+                    if self.recorder:
+                        self.recorder.received(data)
+                    self.logger.packet(RECV, data)
                 else:
                     self.log("⚠ ", "Server closed connection")
                     self.running = False
@@ -72,10 +79,10 @@ class ModbusInteractiveClient:
             hex_clean = hex_string.replace(' ', '').replace(':', '').replace('-', '')
             data = bytes.fromhex(hex_clean)
             self.sock.sendall(data)
+            if self.recorder:
+                self.recorder.sent(data)
             
-            # 格式化显示（每2字节加空格）
-            formatted_hex = ' '.join(data.hex()[i:i+2] for i in range(0, len(data.hex()), 2))
-            self.log("─→", f"Send ({len(data)} bytes): {formatted_hex}")
+            self.logger.packet(SEND, data)
             
             return True
         except ValueError as e:
@@ -87,8 +94,7 @@ class ModbusInteractiveClient:
     
     def log(self, prefix, message):
         """打印带时间戳的日志"""
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        print(f"[{timestamp}] {prefix} {message}")
+        self.logger.log(prefix, message)
     
     def show_help(self):
         """显示帮助信息"""
@@ -149,6 +155,8 @@ class ModbusInteractiveClient:
 
 def main():
     # 解析命令行参数
+    record = pop_record_arg(sys.argv)
+    quiet, trace = pop_log_args(sys.argv)
     host = '127.0.0.1'
     port = 1502
     
@@ -157,7 +165,7 @@ def main():
     if len(sys.argv) > 2:
         port = int(sys.argv[2])
     
-    client = ModbusInteractiveClient(host, port)
+    client = ModbusInteractiveClient(host, port, record, quiet, trace)
     client.run()
 
 if __name__ == '__main__':
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+交互式客户端会话录制
+记录发送 / 接收的消息序列及时间，关闭时写出:
+  <path>        AFLNet replayable 格式（每条发送的消息: 4 字节小端长度 + 内容），可直接作为种子或用 aflnet-replay 重放
+  <path>.json   JSON 旁路文件: 协议、服务器地址、每条消息的方向 / 相对时间 / 十六进制内容，以及每个请求对应的响应
+
+<path> 为已存在的目录时自动命名为 id:NNNNNN,src:interactive-<协议>（接在目录中已有的 id 之后），
+JSON 旁路文件放在该目录的 .sessions/ 下（避免被 id:* 通配当作测试用例），
+因此可以直接录制到 seeds/、replayable-crashes/ 等目录。
+
+用法（所有交互式客户端）:
+  python3 modbus_interactive.py 127.0.0.1 1502 --record /tmp/session-1
+  python3 slmp_interactive.py 127.0.0.1 8888 --record ../results/libslmp2-manual/replayable-queue
+"""
+
+import json
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+
+ID_RE = re.compile(r'^id:(\d+)')
+
+
+def pop_record_arg(argv):
+    """从 argv 中取出 --record <path>（其余位置参数保持原有解析方式），返回 path 或 None"""
+    if '--record' not in argv:
+        return None
+    index = argv.index('--record')
+    if index + 1 >= len(argv):
+        raise SystemExit("--record requires a path")
+    path = argv[index + 1]
+    del argv[index:index + 2]
+    return path
+
+
+def _next_testcase_path(directory, protocol):
+    ids = [int(m.group(1)) for m in map(ID_RE.match, os.listdir(directory)) if m]
+    next_id = max(ids) + 1 if ids else 0
+    return os.path.join(directory, f"id:{next_id:06d},src:interactive-{protocol.lower()}")
+
+
+class SessionRecorder:
+    def __init__(self, path, protocol, host, port):
+        if os.path.isdir(path):
+            self.path = _next_testcase_path(path, protocol)
+            self.sidecar = os.path.join(path, '.sessions', os.path.basename(self.path) + '.json')
+        else:
+            self.path = path
+            self.sidecar = path + '.json'
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.started = datetime.now().isoformat(timespec='milliseconds')
+        self.t0 = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def _add(self, direction, data):
+        with self.lock:
+            self.events.append((direction, time.perf_counter() - self.t0, bytes(data)))
+
+    def sent(self, data):
+        self._add('send', data)
+
+    def received(self, data):
+        self._add('recv', data)
+
+    def close(self):
+        """写出 replayable 文件和 JSON 旁路文件，返回 replayable 路径"""
+        if self.closed:
+            return self.path
+        self.closed = True
+        with self.lock:
+            events = list(self.events)
+
+        requests = []
+        for direction, t, data in events:
+            if direction == 'send':
+                requests.append({'index': len(requests), 't': round(t, 6), 'hex': data.hex(), 'responses': []})
+            elif requests:
+                # 响应归属到它之前最近发送的请求
+                requests[-1]['responses'].append({'t': round(t, 6), 'hex': data.hex()})
+
+        for target in (self.path, self.sidecar):
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            for direction, _, data in events:
+                if direction == 'send':
+                    f.write(struct.pack('<I', len(data)) + data)
+        with open(self.sidecar, 'w') as f:
+            json.dump({
+                'protocol': self.protocol,
+                'server': f"{self.host}:{self.port}",
+                'started': self.started,
+                'duration': round(time.perf_counter() - self.t0, 6),
+                'events': [{'dir': d, 't': round(t, 6), 'hex': data.hex()} for d, t, data in events],
+                'requests': requests,
+            }, f, indent=2)
+        return self.path
@@ -4,23 +4,46 @@ import socket
 import sys
 import threading
 import time
-from datetime import datetime
+
+from session_recorder import SessionRecorder, pop_record_arg
+from client_log import ClientLog, RECV, SEND, pop_log_args
+from batch_runner import parse_hex, pop_option, run_client_batch
+
+# 预设命令（示例 SLMP 帧）
+PRESETS = {
+    # Device Read (Binary) - 读取 D0，1个字
+    'read': '500000000000ff03000c001000010401000000a8000100',
+
+    # Device Write (Binary) - 写入 D0 = 0x1234
+    'write': '500000000000ff03000e001400010401000000a80001003412',
+
+    # Loopback Test (Self-test)
+    'test': '50000000ff0009001000190600000100',
+
+    # 用户提供的测试命令
+    'usertest': '50000000ff0009001000190600000100',
+}
+
+# 服务器 2 秒无数据即断开，连接后先发一个心跳
+HEARTBEAT = '50000000ff00000900100019060000010000'
 
 class SLMPClient:
-    def __init__(self, host='127.0.0.1', port=8888):
+    def __init__(self, host='127.0.0.1', port=8888, record=None, quiet=False, trace=None):
         self.host = host
         self.port = port
         self.sock = None
         self.running = False
         self.recv_thread = None
+        self.recorder = SessionRecorder(record, 'SLMPB', host, port) if record else None
+        self.logger = ClientLog(quiet, trace)
         
     def timestamp(self):
         """获取当前时间戳"""
-        return datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        return self.logger.timestamp()
     
-    def log(self, prefix, message, flush=True):
+    def log(self, prefix, message, flush=None):
         """带时间戳的日志输出"""
-        print(f"[{self.timestamp()}] {prefix} {message}", flush=flush)
+        self.logger.log(prefix, message, flush=flush)
     
     def receive_loop(self):
         """独立线程：持续接收服务器数据"""
@@ -30,19 +53,13 @@ class SLMPClient:
             try:
                 data = self.sock.recv(4096)
                 if data:
-                    hex_str = data.hex()
-                    # 格式化十六进制显示（每2字节加空格）
-                    formatted_hex = ' '.join(hex_str[i:i+2] for i in range(0, len(hex_str), 2))
-                    
-                    # ASCII 表示
-                    ascii_repr = ''.join(chr(b) if 32 <= b < 127 else '.' for b in data)
+                    if self.recorder:
+                        self.recorder.received(data)
+                    self.logger.packet(RECV, data, ascii=True)
                     
-                    self.log("←─", f"Recv ({len(data)} bytes): {formatted_hex}")
-                    if ascii_repr.strip('.'):
-                        self.log("   ", f"ASCII: {ascii_repr}")
-                    
-                    # 尝试简单解析 SLMP 帧
-                    self.parse_slmp_frame(data)
+                    # 尝试简单解析 SLMP 帧（quiet 时跳过，解析结果只用于显示）
+                    if not self.logger.quiet:
+                        self.parse_slmp_frame(data)
                 else:
                     # 连接关闭
                     self.log("⚠ ", "Server closed connection")
@@ -106,7 +123,7 @@ class SLMPClient:
             # 自动发送一个心跳包，避免服务器接收超时（2秒超时）
             time.sleep(0.1)  # 等待接收线程启动
             self.log("ℹ ", "Sending initial heartbeat to keep connection alive...")
-            self.send("50000000ff00000900100019060000010000", silent=False)
+            self.send(HEARTBEAT, silent=False)
             
             return True
             
@@ -121,11 +138,14 @@ class SLMPClient:
             hex_clean = hex_string.replace(' ', '').replace(':', '').replace('-', '')
             data = bytes.fromhex(hex_clean)
             self.sock.send(data)
+            if self.recorder:
+                self.recorder.sent(data)
             
             # 格式化显示（除非是静默模式）
-            if not silent:
-                formatted_hex = ' '.join(hex_clean[i:i+2] for i in range(0, len(hex_clean), 2))
-                self.log("─→", f"Send ({len(data)} bytes): {formatted_hex}")
+            if silent:
+                self.logger.trace(SEND, data)
+            else:
+                self.logger.packet(SEND, data)
             
             return True
             
@@ -138,6 +158,15 @@ class SLMPClient:
                 self.log("✗", f"Send error: {e}")
             return False
     
+    def build_command(self, cmd):
+        """批处理模式: 预设命令名或十六进制 -> 报文"""
+        return parse_hex(PRESETS.get(cmd.lower(), cmd))
+
+    def run_batch(self, path, timeout=1.0, output=None):
+        """非交互批处理: 连接后先发心跳，然后逐行发送并等待完整响应，结果以 JSONL 输出"""
+        return run_client_batch(self, 'SLMPB', path, self.build_command, timeout, output,
+                                setup=lambda runner: runner.exchange(parse_hex(HEARTBEAT)))
+    
     def close(self):
         """关闭连接"""
         self.running = False
@@ -149,6 +178,9 @@ class SLMPClient:
         if self.recv_thread:
             self.recv_thread.join(timeout=1)
         self.log("✓", "Connection closed")
+        if self.recorder:
+            self.log("✓", f"Session recorded to {self.recorder.close()}")
+        self.logger.close()
     
     def interactive(self):
         """交互式主循环"""
@@ -176,20 +208,7 @@ class SLMPClient:
         if not self.connect():
             return
         
-        # 预设命令（示例 SLMP 帧）
-        presets = {
-            # Device Read (Binary) - 读取 D0，1个字
-            'read': '500000000000ff03000c001000010401000000a8000100',
-            
-            # Device Write (Binary) - 写入 D0 = 0x1234
-            'write': '500000000000ff03000e001400010401000000a80001003412',
-            
-            # Loopback Test (Self-test)
-            'test': '50000000ff0009001000190600000100',
-            
-            # 用户提供的测试命令
-            'usertest': '50000000ff0009001000190600000100',
-        }
+        presets = PRESETS
         
         try:
             while self.running:
@@ -233,6 +252,11 @@ def main():
     sys.stderr = sys.__stderr__
     
     # 解析命令行参数
+    record = pop_record_arg(sys.argv)
+    quiet, trace = pop_log_args(sys.argv)
+    batch = pop_option(sys.argv, '--batch')
+    timeout = float(pop_option(sys.argv, '--timeout', 1.0))
+    output = pop_option(sys.argv, '--output')
     host = '127.0.0.1'
     port = 8888
     
@@ -241,9 +265,12 @@ def main():
     if len(sys.argv) > 2:
         port = int(sys.argv[2])
     
-    client = SLMPClient(host, port)
+    client = SLMPClient(host, port, record, quiet, trace)
+    if batch:
+        return client.run_batch(batch, timeout, output)
     client.interactive()
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
 
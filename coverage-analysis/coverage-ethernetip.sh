@@ -16,6 +16,7 @@ RUN_NUM="${3:-1}"              # 实验次数
 
 # Configuration - 根据目标调整（使用绝对路径）
 BASE_DIR="/home/ecs-user/LLM_fuzz_experiment"
+SUPERVISOR="$BASE_DIR/tools/supervisor.py"  # 端口就绪检查（只连接）
 
 if [ "$TARGET_IMPL" = "eipscanner" ]; then
     ETHERNETIP_DIR="$BASE_DIR/eipscanner"
@@ -101,6 +102,14 @@ check_prerequisites() {
 # Rebuild with coverage flags
 rebuild_with_coverage() {
     print_status "Rebuilding $TARGET_IMPL with coverage instrumentation..."
+
+    # 覆盖率构建缓存: 源码、补丁和构建步骤都没变时直接检出已有产物（见 tools/coverage_builds.py）
+    # COVERAGE_BUILD_CACHE=0 强制重新编译
+    if [ "${COVERAGE_BUILD_CACHE:-1}" = "1" ] && \
+       python3 "$BASE_DIR/tools/coverage_builds.py" --base-dir "$BASE_DIR" checkout "$TARGET_IMPL"; then
+        print_status "$TARGET_IMPL coverage build restored from registry, skipping rebuild"
+        return 0
+    fi
     
     cd "$ETHERNETIP_DIR"
     
@@ -192,6 +201,11 @@ rebuild_with_coverage() {
         print_status "Coverage instrumentation successful: .gcno files generated at compile time"
     fi
     
+    if [ "${COVERAGE_BUILD_CACHE:-1}" = "1" ]; then
+        python3 "$BASE_DIR/tools/coverage_builds.py" --base-dir "$BASE_DIR" store "$TARGET_IMPL" || \
+            print_warning "Coverage build was not stored in the registry"
+    fi
+    
     print_status "$TARGET_IMPL rebuilt with coverage instrumentation"
 }
 
@@ -246,8 +260,9 @@ start_coverage_server() {
     ./$SERVER_BINARY $SERVER_ARGS &
     SERVER_PID=$!
     
-    # Wait longer for server to fully start and bind to port
-    sleep 3
+    # 等待端口可连接（就绪后立即返回）；不发送探测报文，避免握手计入覆盖率
+    python3 "$SUPERVISOR" wait "$TARGET_IMPL" --port "$SERVER_PORT" --timeout 30 --connect-only || \
+        print_warning "Server did not accept connections on port $SERVER_PORT"
     
     # Verify port is actually listening
     local port_verify=0
@@ -313,8 +328,9 @@ monitor_coverage_server() {
                 fi
                 SERVER_PID=$!
                 
-                # 等待服务器完全启动并绑定端口
-                sleep 3
+                # 重启后同样只等待端口可连接，不发送探测报文
+                python3 "$SUPERVISOR" wait "$TARGET_IMPL" --port "$SERVER_PORT" --timeout 30 --connect-only || \
+                    print_warning "Server did not accept connections on port $SERVER_PORT"
                 
                 # 验证端口已绑定
                 local bind_wait=0
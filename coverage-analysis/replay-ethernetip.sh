@@ -16,6 +16,8 @@ TARGET_PORT="44818"  # EtherNet/IP 使用 44818
 
 # 根据目标实现调整路径
 BASE_DIR="/home/ecs-user/LLM_fuzz_experiment"
+SUPERVISOR="$BASE_DIR/tools/supervisor.py"  # 重放失败后的端口就绪检查（只连接）
+SUPERVISOR_TARGET="$TARGET_IMPL"
 
 if [ "$TARGET_IMPL" = "eipscanner" ]; then
     INPUT_DIR="$BASE_DIR/results/eipscanner-${FUZZER}-${RUN_NUM}/replayable-queue"
@@ -50,14 +52,14 @@ for TESTCASE in "$INPUT_DIR"/id:*; do
 
     # 执行 aflnet-replay 并处理失败的情况
     while [ $RETRY_COUNT -lt $MAX_RETRIES ]; do
-      # 检查服务器端口是否可用（等待最多30秒）
+      # 只检查端口可连接（最多30秒）；不发送协议请求，避免探测报文计入覆盖率
       port_check_count=0
-      while ! nc -z 127.0.0.1 "$TARGET_PORT" 2>/dev/null && [ $port_check_count -lt 30 ]; do
-        sleep 1
+      while ! nc -z 127.0.0.1 "$TARGET_PORT" 2>/dev/null && [ $port_check_count -lt 300 ]; do
+        sleep 0.1
         port_check_count=$((port_check_count + 1))
       done
-      
-      if [ $port_check_count -ge 30 ]; then
+
+      if [ $port_check_count -ge 300 ]; then
         echo "Warning: Server port $TARGET_PORT not responding after 30 seconds"
       fi
       
@@ -68,8 +70,8 @@ for TESTCASE in "$INPUT_DIR"/id:*; do
       else
         echo "Replay failed for $TESTCASE, attempt $((RETRY_COUNT + 1)) of $MAX_RETRIES"
         RETRY_COUNT=$((RETRY_COUNT + 1))
-        # 等待更长时间让服务器恢复
-        sleep 3
+        # 重放失败后等待服务器恢复（最多30秒）；覆盖率版服务器只做连接检查，不发送探测报文
+        python3 "$SUPERVISOR" wait "$SUPERVISOR_TARGET" --port "$TARGET_PORT" --timeout 30 --connect-only
       fi
     done
 
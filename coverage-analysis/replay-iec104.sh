@@ -16,6 +16,7 @@ TARGET="IEC104"  # 协议名称（IEC104使用与MODBUS类似的重放方式）
 
 # 根据目标实现调整端口和路径
 BASE_DIR="/home/ecs-user/LLM_fuzz_experiment"
+SUPERVISOR="$BASE_DIR/tools/supervisor.py"  # 端口就绪检查（只连接）
 
 if [ "$TARGET_IMPL" = "freyrscada-iec104" ]; then
     TARGET_PORT="2404"
@@ -58,8 +59,8 @@ for TESTCASE in "$INPUT_DIR"/id:*; do
         break  # 成功时退出 while 循环
       else
 	RETRY_COUNT=$((RETRY_COUNT+1))
-        echo "Replay failed for $TESTCASE. Retrying in 10 seconds..."
-        sleep 10
+        echo "Replay failed for $TESTCASE. Waiting for server port before retrying..."
+        python3 "$SUPERVISOR" wait "$TARGET_IMPL" --port "$TARGET_PORT" --timeout 10 --connect-only
       fi
     done
 
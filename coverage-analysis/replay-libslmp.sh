@@ -9,6 +9,8 @@ RUN_NUM="${2:-1}"              # 实验次数
 
 # 设置输入文件目录和aflnet-replay路径
 BASE_DIR="/home/ecs-user/LLM_fuzz_experiment"
+SUPERVISOR="$BASE_DIR/tools/supervisor.py"  # 重放失败后的端口就绪检查（只连接）
+SUPERVISOR_TARGET="libslmp2"
 INPUT_DIR="$BASE_DIR/results/libslmp2-${FUZZER}-${RUN_NUM}/replayable-queue"
 AFLNET_REPLAY="/home/ecs-user/AFL-ICS/aflnet-replay"  # 使用绝对路径
 TARGET="SLMPB"  # 协议名称 (SLMPB: SLMP Binary)
@@ -56,14 +58,14 @@ for TESTCASE in "$INPUT_DIR"/id:*; do
 
     # 执行 aflnet-replay 并处理失败的情况
     while [ $RETRY_COUNT -lt $MAX_RETRIES ]; do
-      # 检查服务器端口是否可用（等待最多30秒）
+      # 只检查端口可连接（最多30秒）；不发送协议请求，避免探测报文计入覆盖率
       port_check_count=0
-      while ! nc -z 127.0.0.1 "$TARGET_PORT" 2>/dev/null && [ $port_check_count -lt 30 ]; do
-        sleep 1
+      while ! nc -z 127.0.0.1 "$TARGET_PORT" 2>/dev/null && [ $port_check_count -lt 300 ]; do
+        sleep 0.1
         port_check_count=$((port_check_count + 1))
       done
-      
-      if [ $port_check_count -ge 30 ]; then
+
+      if [ $port_check_count -ge 300 ]; then
         echo "Warning: Server port $TARGET_PORT not responding after 30 seconds"
       fi
       
@@ -75,8 +77,8 @@ for TESTCASE in "$INPUT_DIR"/id:*; do
       else
         echo "Replay failed for $TESTCASE, attempt $((RETRY_COUNT + 1)) of $MAX_RETRIES"
         RETRY_COUNT=$((RETRY_COUNT + 1))
-        # 等待更长时间让服务器恢复
-        sleep 3
+        # 重放失败后等待服务器恢复（最多30秒）；覆盖率版服务器只做连接检查，不发送探测报文
+        python3 "$SUPERVISOR" wait "$SUPERVISOR_TARGET" --port "$TARGET_PORT" --timeout 30 --connect-only
       fi
     done
 
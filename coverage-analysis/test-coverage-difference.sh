@@ -5,6 +5,7 @@ echo "Testing Coverage Difference Between Fuzzers"
 echo "=========================================="
 
 BASE_DIR="/home/ecs-user/LLM_fuzz_experiment"
+SUPERVISOR="$BASE_DIR/tools/supervisor.py"  # 端口就绪检查（只连接，不向服务器发送探测报文）
 cd "$BASE_DIR/libplctag/build-coverage"
 
 # Clean everything
@@ -20,7 +21,7 @@ echo ""
 echo "2. Testing with aflnet-1 (first 10 test cases)..."
 ./bin_dist/modbus_server --listen 127.0.0.1:5502 > /tmp/server1.log 2>&1 &
 SERVER_PID=$!
-sleep 2
+python3 "$SUPERVISOR" wait libplctag --port 5502 --timeout 30 --connect-only
 
 SUCCESS_COUNT=0
 for i in {0..9}; do
@@ -35,7 +36,6 @@ done
 echo "   Replayed 10 test cases, $SUCCESS_COUNT succeeded"
 kill -TERM $SERVER_PID
 wait $SERVER_PID 2>/dev/null || true
-sleep 2
 
 GCDA_COUNT1=$(find src/tests/modbus_server/CMakeFiles/modbus_server.dir -name "*.gcda" | wc -l)
 echo "   Generated $GCDA_COUNT1 .gcda files"
@@ -50,7 +50,7 @@ echo ""
 echo "3. Testing with a2-1 (first 10 test cases)..."
 ./bin_dist/modbus_server --listen 127.0.0.1:5502 > /tmp/server2.log 2>&1 &
 SERVER_PID=$!
-sleep 2
+python3 "$SUPERVISOR" wait libplctag --port 5502 --timeout 30 --connect-only
 
 SUCCESS_COUNT=0
 for i in {0..9}; do
@@ -65,7 +65,6 @@ done
 echo "   Replayed 10 test cases, $SUCCESS_COUNT succeeded"
 kill -TERM $SERVER_PID
 wait $SERVER_PID 2>/dev/null || true
-sleep 2
 
 GCDA_COUNT2=$(find src/tests/modbus_server/CMakeFiles/modbus_server.dir -name "*.gcda" | wc -l)
 echo "   Generated $GCDA_COUNT2 .gcda files"
@@ -8,6 +8,14 @@
  * 4. Returns responses
  * 
  * This allows OpENer to work with AFLNet, A2, A3, AFL-ICS, ChatAFL
+ *
+ * Building with -DOPENER_HARNESS_INPROCESS drops the TCP listener and
+ * instead exports in-process entrypoints (OpENerHarness* and the libFuzzer
+ * LLVMFuzzerTestOneInput) that push a byte buffer through the same
+ * ProcessEncapsulationMessage() path the network loop uses:
+ *
+ *   cc -shared -fPIC --coverage -DOPENER_HARNESS_INPROCESS OpENerNetworkHarness.c \
+ *      -I<OpENer includes> <OpENer static libs> -o libopener_harness.so
  */
 
 #include <stdio.h>
@@ -33,6 +41,129 @@ static int server_fd = -1;
 static int client_fd = -1;
 static volatile int should_exit = 0;
 
+// Initialize OpENer stack (shared by the network and in-process entrypoints)
+static int HarnessInitStack(void) {
+    DoublyLinkedListInitialize(&connection_list,
+                               CipConnectionObjectListArrayAllocator,
+                               CipConnectionObjectListArrayFree);
+    
+    SetDeviceSerialNumber(123456789);
+    EipUint16 unique_connection_id = (EipUint16)rand();
+    
+    if (CipStackInit(unique_connection_id) != kEipStatusOk) {
+        fprintf(stderr, "[Harness] Failed to initialize CIP stack\n");
+        return -1;
+    }
+    return 0;
+}
+
+// Feed one received buffer to OpENer's encapsulation handler. Both the
+// network loop and the in-process entrypoints go through here so a given
+// input produces the same response on either path.
+static void ProcessEncapsulationMessage(int socket_fd,
+                                        const uint8_t *buffer,
+                                        size_t length,
+                                        struct sockaddr *originator,
+                                        ENIPMessage *outgoing_message) {
+    InitializeENIPMessage(outgoing_message);
+    
+    int remaining_bytes = 0;
+    HandleReceivedExplictTcpData(
+        socket_fd,
+        (EipUint8 *)buffer,
+        length,
+        &remaining_bytes,
+        originator,
+        outgoing_message
+    );
+}
+
+#ifdef OPENER_HARNESS_INPROCESS
+
+static int harness_initialized = 0;
+static int inprocess_fds[2] = {-1, -1};
+static struct sockaddr_in inprocess_peer;
+
+// libgcov entrypoints (GCC 11 removed __gcov_flush); the library is linked
+// with --coverage, as the network harness is.
+#ifdef __GNUC__
+extern void __gcov_dump(void);
+extern void __gcov_reset(void);
+#endif
+
+int OpENerHarnessInit(void) {
+    if (harness_initialized) return 0;
+    signal(SIGPIPE, SIG_IGN);
+    if (HarnessInitStack() != 0) return -1;
+    memset(&inprocess_peer, 0, sizeof(inprocess_peer));
+    inprocess_peer.sin_family = AF_INET;
+    inprocess_peer.sin_addr.s_addr = inet_addr("127.0.0.1");
+    harness_initialized = 1;
+    return 0;
+}
+
+// Start a new "client connection". A socketpair stands in for the accepted
+// TCP socket so OpENer still sees a real descriptor for session bookkeeping.
+int OpENerHarnessConnect(void) {
+    if (inprocess_fds[0] >= 0) return 0;
+    if (socketpair(AF_UNIX, SOCK_STREAM, 0, inprocess_fds) < 0) {
+        fprintf(stderr, "[Harness] socketpair failed: %s\n", strerror(errno));
+        return -1;
+    }
+    return 0;
+}
+
+void OpENerHarnessDisconnect(void) {
+    if (inprocess_fds[0] >= 0) close(inprocess_fds[0]);
+    if (inprocess_fds[1] >= 0) close(inprocess_fds[1]);
+    inprocess_fds[0] = inprocess_fds[1] = -1;
+}
+
+// Process one message on the current connection. The response is copied to
+// out (truncated to out_size); the full response length is returned.
+int OpENerHarnessProcess(const uint8_t *data, size_t size,
+                         uint8_t *out, size_t out_size) {
+    if (!harness_initialized && OpENerHarnessInit() != 0) return -1;
+    if (inprocess_fds[0] < 0 && OpENerHarnessConnect() != 0) return -1;
+    
+    // The network loop never hands more than one recv() worth to OpENer
+    if (size > BUFFER_SIZE) size = BUFFER_SIZE;
+    
+    ENIPMessage outgoing_message;
+    ProcessEncapsulationMessage(inprocess_fds[0], data, size,
+                                (struct sockaddr *)&inprocess_peer,
+                                &outgoing_message);
+    
+    int used = outgoing_message.used_message_length;
+    if (out != NULL && used > 0) {
+        memcpy(out, outgoing_message.message_buffer,
+               (size_t)used < out_size ? (size_t)used : out_size);
+    }
+    return used;
+}
+
+// Write .gcda now. Drivers that fork per testcase leave the child with
+// _exit(), which skips the atexit handler that would otherwise write it.
+void OpENerHarnessFlushCoverage(void) {
+#ifdef __GNUC__
+    __gcov_dump();
+    __gcov_reset();
+#endif
+}
+
+int LLVMFuzzerInitialize(int *argc, char ***argv) {
+    return OpENerHarnessInit();
+}
+
+int LLVMFuzzerTestOneInput(const uint8_t *data, size_t size) {
+    OpENerHarnessConnect();
+    OpENerHarnessProcess(data, size, NULL, 0);
+    OpENerHarnessDisconnect();
+    return 0;
+}
+
+#else
+
 void signal_handler(int signum) {
     should_exit = 1;
     if (client_fd >= 0) close(client_fd);
@@ -55,15 +186,7 @@ int main(int argc, char *argv[]) {
     signal(SIGPIPE, SIG_IGN);
     
     // Initialize OpENer stack
-    DoublyLinkedListInitialize(&connection_list,
-                               CipConnectionObjectListArrayAllocator,
-                               CipConnectionObjectListArrayFree);
-    
-    SetDeviceSerialNumber(123456789);
-    EipUint16 unique_connection_id = (EipUint16)rand();
-    
-    if (CipStackInit(unique_connection_id) != kEipStatusOk) {
-        fprintf(stderr, "[Harness] Failed to initialize CIP stack\n");
+    if (HarnessInitStack() != 0) {
         return 1;
     }
     
@@ -127,17 +250,9 @@ int main(int argc, char *argv[]) {
             
             // Process packet with OpENer's handler
             ENIPMessage outgoing_message;
-            InitializeENIPMessage(&outgoing_message);
-            
-            int remaining_bytes = 0;
-            EipStatus status = HandleReceivedExplictTcpData(
-                client_fd,
-                buffer,
-                bytes_received,
-                &remaining_bytes,
-                (struct sockaddr*)&client_addr,
-                &outgoing_message
-            );
+            ProcessEncapsulationMessage(client_fd, buffer, bytes_received,
+                                        (struct sockaddr*)&client_addr,
+                                        &outgoing_message);
             
             // Send response if generated
             if (outgoing_message.used_message_length > 0) {
@@ -156,3 +271,5 @@ int main(int argc, char *argv[]) {
     signal_handler(0);
     return 0;
 }
+
+#endif  /* OPENER_HARNESS_INPROCESS */
@@ -21,7 +21,12 @@ export RUN_NUM="$RUN_NUMBER"
 export DOCKER_BUILDKIT=1
 
 echo "构建 Docker 镜像（FreyrSCADA IEC104）..."
-docker compose -f docker-compose-freyrscada-iec104.yml build
+if [ "${USE_BUILD_CACHE:-0}" = "1" ]; then
+    # 复用共享的基础 / 工具链镜像和按内容缓存的目标镜像（见 tools/build_images.py）
+    python3 tools/build_images.py --compose docker-compose-freyrscada-iec104.yml
+else
+    docker compose -f docker-compose-freyrscada-iec104.yml build
+fi
 
 echo "启动容器（FreyrSCADA IEC104 - 第 $RUN_NUMBER 次实验）..."
 docker compose -f docker-compose-freyrscada-iec104.yml up -d
@@ -25,7 +25,12 @@ export DOCKER_BUILDKIT=1
 
 # 构建并启动容器
 echo "构建Docker镜像（libplctag - 使用BuildKit和SSH agent forwarding）..."
-docker compose -f docker-compose-libplctag.yml build
+if [ "${USE_BUILD_CACHE:-0}" = "1" ]; then
+    # 复用共享的基础 / 工具链镜像和按内容缓存的目标镜像（见 tools/build_images.py）
+    python3 tools/build_images.py --compose docker-compose-libplctag.yml
+else
+    docker compose -f docker-compose-libplctag.yml build
+fi
 
 echo "启动容器并自动开始模糊测试（libplctag - 第 $RUN_NUMBER 次实验）..."
 docker compose -f docker-compose-libplctag.yml up -d
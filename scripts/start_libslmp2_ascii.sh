@@ -25,7 +25,12 @@ export DOCKER_BUILDKIT=1
 
 # 构建并启动容器
 echo "构建 Docker 镜像（libslmp2-ascii）..."
-docker compose -f docker-compose-libslmp2-ascii.yml build
+if [ "${USE_BUILD_CACHE:-0}" = "1" ]; then
+    # 复用共享的基础 / 工具链镜像和按内容缓存的目标镜像（见 tools/build_images.py）
+    python3 tools/build_images.py --compose docker-compose-libslmp2-ascii.yml
+else
+    docker compose -f docker-compose-libslmp2-ascii.yml build
+fi
 
 echo "启动容器（libslmp2-ascii - 第 $RUN_NUMBER 次实验）..."
 docker compose -f docker-compose-libslmp2-ascii.yml up -d
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+共享基础镜像 + 按内容缓存的目标镜像构建
+每个 Dockerfile.<target>.<fuzzer> 都从 ubuntu:20.04 开始安装同样的软件包、再编译一遍模糊器，35 个容器互不共享。
+本脚本把每个 Dockerfile 拆成三级镜像:
+  base       dockerfiles-base/Dockerfile.base（各 Dockerfile apt 软件包的并集），所有镜像共用
+  toolchain  base + WORKDIR / ENV + 克隆并编译模糊器的 RUN；指令相同的 Dockerfile 共用同一个工具链镜像
+  target     toolchain + 其余指令（目标库的克隆、补丁、插桩编译、启动脚本）
+原 Dockerfile 中软件包已包含在 base 里的 apt-get RUN 被去掉；克隆模糊器之前的其他步骤（如 pip3 install cmake）
+移到工具链之后执行，它们不影响模糊器的编译。原 Dockerfile 不做修改，docker compose build 仍然可用。
+
+每级镜像以内容哈希为标签（llm-fuzz/<名称>:<key>）:
+  key = 上一级 key + 规范化后的指令 + COPY / ADD 源文件内容 + 未固定 commit 的 git clone 的上游 HEAD
+已存在（或能从 --registry 拉取）的标签直接复用，否则用 BuildKit 构建并解析 --progress=plain 输出，
+记录每一步的耗时 / 是否命中层缓存，追加到 benchmarks/build-times.jsonl。
+最后把目标镜像标记为 docker compose 的默认镜像名（<project>-<service>），docker compose up 直接使用。
+
+使用方法:
+  python3 tools/build_images.py --compose docker-compose.yml
+  python3 tools/build_images.py --compose docker-compose*.yml --jobs 4 --registry registry.local:5000 --push
+  python3 tools/build_images.py --dockerfiles dockerfiles-opener/Dockerfile.opener.a3 --plan --emit /tmp/generated
+  USE_BUILD_CACHE=1 ./scripts/start_opener.sh 1
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from targets import BASE_DIR
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+BASE_DOCKERFILE = os.path.join(REPO_DIR, 'dockerfiles-base', 'Dockerfile.base')
+BASE_IMAGE = 'ubuntu:20.04'
+PREFIX = 'llm-fuzz'
+# 模糊器仓库（AFL-ICS、aflnet-ICS-、ChatAFL、A2、A3）
+FUZZER_CLONE_RE = re.compile(r'git clone \S*github\.com[:/]susu3/')
+CLONE_RE = re.compile(r'git clone (?:-\S+ )*(\S+)')
+STEP_RE = re.compile(r'^#(\d+) \[([^\]]+)\] (.*)$')
+DONE_RE = re.compile(r'^#(\d+) DONE ([\d.]+)s')
+CACHED_RE = re.compile(r'^#(\d+) CACHED')
+APT_SEGMENT_RE = re.compile(r'^(apt-get (update|install|clean)|rm -rf /var/lib/apt/lists)')
+
+
+def parse_dockerfile(text):
+    """按 Docker 的续行规则切分指令，返回原文列表（不含指令之间的注释和空行）"""
+    instructions, current = [], []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not current and (not stripped or stripped.startswith('#')):
+            continue
+        current.append(line)
+        if not line.rstrip().endswith('\\'):
+            instructions.append('\n'.join(current))
+            current = []
+    if current:
+        instructions.append('\n'.join(current))
+    return instructions
+
+
+def normalize(instruction):
+    """去掉续行中的注释行（Docker 同样会忽略），合并空白，作为缓存键的一部分"""
+    lines = [line for i, line in enumerate(instruction.splitlines()) if i == 0 or not line.strip().startswith('#')]
+    return ' '.join(' '.join(lines).replace('\\', ' ').split())
+
+
+def keyword(instruction):
+    return instruction.split(None, 1)[0].upper()
+
+
+def apt_packages(instruction):
+    """纯 apt 的 RUN 返回安装的软件包集合，其他指令返回 None"""
+    if keyword(instruction) != 'RUN':
+        return None
+    packages = set()
+    for segment in normalize(instruction)[3:].split('&&'):
+        segment = segment.strip()
+        if not APT_SEGMENT_RE.match(segment):
+            return None
+        if segment.startswith('apt-get install'):
+            packages.update(p for p in segment.split()[2:] if not p.startswith('-'))
+    return packages
+
+
+def base_packages():
+    packages = set()
+    with open(BASE_DOCKERFILE) as f:
+        for instruction in parse_dockerfile(f.read()):
+            packages |= apt_packages(instruction) or set()
+    return packages
+
+
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+        h.update(b'\0')
+    return h.hexdigest()[:12]
+
+
+def path_digest(context, source):
+    """COPY / ADD 源（文件或目录，相对构建上下文）的内容哈希"""
+    files = []
+    for path in sorted(glob.glob(os.path.join(context, source))):
+        if os.path.isfile(path):
+            files.append(path)
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+    h = hashlib.sha256()
+    for path in files:
+        h.update(os.path.relpath(path, context).encode())
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+_REMOTE_HEADS = {}
+
+
+def remote_head(url, offline):
+    """git ls-remote 取上游 HEAD；离线或失败时为 'unknown'（缓存不会随上游变化失效）"""
+    if offline:
+        return 'unknown'
+    if url not in _REMOTE_HEADS:
+        try:
+            out = subprocess.run(['git', 'ls-remote', url, 'HEAD'], capture_output=True, text=True, timeout=20,
+                                 env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+            _REMOTE_HEADS[url] = out.stdout.split()[0] if out.returncode == 0 and out.stdout else 'unknown'
+        except (OSError, subprocess.TimeoutExpired):
+            _REMOTE_HEADS[url] = 'unknown'
+    return _REMOTE_HEADS[url]
+
+
+def build_args(instructions):
+    """ARG 名称 -> 本次构建的取值（环境变量优先，否则为 Dockerfile 中的默认值）"""
+    values = {}
+    for instruction in instructions:
+        if keyword(instruction) == 'ARG':
+            name, _, default = normalize(instruction).split(None, 1)[1].partition('=')
+            values[name] = os.environ.get(name, default)
+    return values
+
+
+def content_key(parent, instructions, context, offline):
+    parts = [parent]
+    pinned = any('git checkout' in normalize(i) for i in instructions)
+    for instruction in instructions:
+        text = normalize(instruction)
+        parts.append(text)
+        # ARG 的实际取值（如 LLM_API_BASE）会改变构建结果
+        if keyword(instruction) == 'ARG':
+            parts.extend(f"{k}={v}" for k, v in build_args([instruction]).items())
+        if keyword(instruction) in ('COPY', 'ADD'):
+            args = [a for a in text.split()[1:] if not a.startswith('--')]
+            parts.extend(path_digest(context, source) for source in args[:-1])
+        if not pinned:
+            parts.extend(remote_head(url, offline) for url in CLONE_RE.findall(text))
+    return digest(*parts)
+
+
+class ImagePlan:
+    """一个 Dockerfile 的 base / toolchain / target 拆分结果"""
+
+    def __init__(self, dockerfile, context, service=None, compose_image=None, offline=False):
+        self.dockerfile = dockerfile
+        self.context = context
+        self.service = service
+        self.compose_image = compose_image
+        name = os.path.basename(dockerfile)
+        self.target, _, self.fuzzer = name[len('Dockerfile.'):].rpartition('.')
+        with open(dockerfile) as f:
+            instructions = parse_dockerfile(f.read())
+        self.base_key = digest(open(BASE_DOCKERFILE).read())
+        self.toolchain = []
+        self.rest = []
+        self.split = self._split(instructions, base_packages())
+        if self.split:
+            self.toolchain_key = content_key(self.base_key, self.toolchain, context, offline)
+            self.key = content_key(self.toolchain_key, self.rest, context, offline)
+        else:
+            # 无法拆分（非 ubuntu:20.04 / 多阶段 / 找不到模糊器克隆）: 整个 Dockerfile 作为一级缓存
+            self.toolchain_key = None
+            self.rest = instructions
+            self.key = content_key('', instructions, context, offline)
+
+    def _split(self, instructions, packages):
+        if not instructions or normalize(instructions[0]) != f'FROM {BASE_IMAGE}':
+            return False
+        if sum(1 for i in instructions if keyword(i) == 'FROM') != 1:
+            return False
+        clone = next((n for n, i in enumerate(instructions)
+                      if keyword(i) == 'RUN' and FUZZER_CLONE_RE.search(normalize(i))), None)
+        if clone is None:
+            return False
+        deferred = []
+        for instruction in instructions[1:clone]:
+            installed = apt_packages(instruction)
+            if installed is not None and installed <= packages:
+                continue
+            if normalize(instruction) == 'ENV DEBIAN_FRONTEND=noninteractive':
+                continue
+            if keyword(instruction) in ('WORKDIR', 'ENV', 'ARG'):
+                self.toolchain.append(instruction)
+            else:
+                deferred.append(instruction)
+        self.toolchain.append(instructions[clone])
+        self.rest = deferred + instructions[clone + 1:]
+        return True
+
+    @property
+    def base_tag(self):
+        return f"{PREFIX}/base:{self.base_key}"
+
+    @property
+    def toolchain_tag(self):
+        return f"{PREFIX}/toolchain-{self.fuzzer}:{self.toolchain_key}"
+
+    @property
+    def tag(self):
+        return f"{PREFIX}/{self.target}-{self.fuzzer}:{self.key}"
+
+    def toolchain_dockerfile(self):
+        return '\n\n'.join([f"FROM {self.base_tag}"] + self.toolchain) + '\n'
+
+    def target_dockerfile(self):
+        parent = f"FROM {self.toolchain_tag}" if self.split else None
+        return '\n\n'.join(([parent] if parent else []) + self.rest) + '\n'
+
+
+def compose_services(path):
+    """从 compose 文件中读取 service -> (dockerfile, context)（只需要 build 段，不依赖 PyYAML）"""
+    services, current, section = {}, None, None
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            indent = len(line) - len(line.lstrip())
+            text = line.strip()
+            if indent == 0:
+                section = text.rstrip(':')
+                current = None
+            elif section == 'services' and indent == 2 and text.endswith(':'):
+                current = text[:-1]
+                services[current] = {'dockerfile': None, 'context': '.'}
+            elif section == 'services' and current and text.split(':', 1)[0] in ('dockerfile', 'context'):
+                key, _, value = text.partition(':')
+                services[current][key] = value.strip().strip('"\'')
+    base = os.path.dirname(os.path.abspath(path))
+    return {name: (os.path.join(base, s['context'], s['dockerfile']), os.path.join(base, s['context']))
+            for name, s in services.items() if s['dockerfile']}
+
+
+def compose_project(path):
+    name = os.environ.get('COMPOSE_PROJECT_NAME') or os.path.basename(os.path.dirname(os.path.abspath(path)))
+    return re.sub(r'[^a-z0-9_-]', '', name.lower())
+
+
+class Builder:
+    def __init__(self, registry=None, push=False, refresh=False, log_path=None):
+        self.registry = registry
+        self.push = push
+        self.refresh = refresh
+        self.log_path = log_path
+        self.records = []
+
+    def _docker(self, *args, **kwargs):
+        return subprocess.run(['docker', *args], capture_output=True, text=True, **kwargs)
+
+    def exists(self, tag):
+        if self._docker('image', 'inspect', tag).returncode == 0:
+            return True
+        if self.registry and self._docker('pull', f"{self.registry}/{tag}").returncode == 0:
+            self._docker('tag', f"{self.registry}/{tag}", tag)
+            return True
+        return False
+
+    def ensure(self, tag, dockerfile_text, context, label):
+        """标签已存在则复用，否则构建；返回记录字典"""
+        record = {'image': label, 'tag': tag, 'host': socket.gethostname(), 'time': time.time(),
+                  'cache_hit': False, 'seconds': 0.0, 'steps': []}
+        if not self.refresh and self.exists(tag):
+            record['cache_hit'] = True
+            print(f"  = {label}: cached {tag}")
+            self.records.append(record)
+            return record
+        print(f"  + {label}: building {tag}")
+        cmd = ['docker', 'build', '--progress=plain', '-t', tag, '-f', '-']
+        if '--mount=type=ssh' in dockerfile_text:
+            cmd += ['--ssh', 'default']
+        # 只给出名称时 docker 从环境变量取值，未设置则使用 Dockerfile 默认值
+        for name in build_args(parse_dockerfile(dockerfile_text)):
+            cmd += ['--build-arg', name]
+        cmd.append(context)
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, input=dockerfile_text, capture_output=True, text=True,
+                              env=dict(os.environ, DOCKER_BUILDKIT='1'))
+        record['seconds'] = round(time.perf_counter() - start, 2)
+        record['steps'] = parse_progress(proc.stderr + proc.stdout)
+        if proc.returncode != 0:
+            record['error'] = (proc.stderr or proc.stdout).strip().splitlines()[-20:]
+            print(f"✗ {label}: build failed after {record['seconds']}s")
+            for line in record['error']:
+                print(f"    {line}")
+        elif self.registry and self.push:
+            self._docker('tag', tag, f"{self.registry}/{tag}")
+            self._docker('push', f"{self.registry}/{tag}")
+        self.records.append(record)
+        return record
+
+    def save(self):
+        if not self.log_path or not self.records:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, 'a') as f:
+            for record in self.records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def parse_progress(output):
+    """BuildKit --progress=plain 输出 -> [{'step', 'seconds', 'cached'}]"""
+    steps = {}
+    for line in output.splitlines():
+        match = STEP_RE.match(line)
+        if match and match.group(1) not in steps:
+            steps[match.group(1)] = {'step': f"[{match.group(2)}] {match.group(3)[:100]}",
+                                     'seconds': 0.0, 'cached': False}
+            continue
+        match = DONE_RE.match(line)
+        if match and match.group(1) in steps:
+            steps[match.group(1)]['seconds'] = float(match.group(2))
+            continue
+        match = CACHED_RE.match(line)
+        if match and match.group(1) in steps:
+            steps[match.group(1)]['cached'] = True
+    return list(steps.values())
+
+
+def print_times(records, top):
+    built = [r for r in records if not r['cache_hit'] and r['steps']]
+    if not built:
+        return
+    print("========================================")
+    print("Build time per stage:")
+    for record in built:
+        print(f"  {record['image']:<32} {record['seconds']:>8.1f}s  {record['tag']}")
+        for step in sorted(record['steps'], key=lambda s: -s['seconds'])[:top]:
+            if step['seconds'] or step['cached']:
+                state = 'cached' if step['cached'] else f"{step['seconds']:.1f}s"
+                print(f"      {state:>8}  {step['step']}")
+    print("========================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build campaign images from shared base / toolchain images with a content-keyed cache")
+    parser.add_argument('--compose', nargs='+', default=[], help='compose files whose services should be built')
+    parser.add_argument('--dockerfiles', nargs='+', default=[], help='individual Dockerfiles (context = repo root)')
+    parser.add_argument('--jobs', type=int, default=2, help='parallel image builds per level')
+    parser.add_argument('--registry', help='pull cached images from / push built images to this registry')
+    parser.add_argument('--push', action='store_true')
+    parser.add_argument('--refresh', action='store_true', help='rebuild even when the tag exists')
+    parser.add_argument('--offline', action='store_true', help='do not query upstream HEADs for unpinned clones')
+    parser.add_argument('--plan', action='store_true', help='print the split and keys without building')
+    parser.add_argument('--emit', help='write the generated Dockerfiles to this directory')
+    parser.add_argument('--top', type=int, default=5, help='slowest steps shown per image')
+    parser.add_argument('--log', default=os.path.join(BASE_DIR, 'benchmarks', 'build-times.jsonl'))
+    args = parser.parse_args()
+
+    plans = []
+    for compose in args.compose:
+        project = compose_project(compose)
+        for service, (dockerfile, context) in compose_services(compose).items():
+            plans.append(ImagePlan(dockerfile, context, service, f"{project}-{service}", args.offline))
+    for dockerfile in args.dockerfiles:
+        plans.append(ImagePlan(os.path.abspath(dockerfile), REPO_DIR, offline=args.offline))
+    if not plans:
+        print("Error: nothing to build (use --compose or --dockerfiles)")
+        return 1
+    if not os.path.exists(BASE_DOCKERFILE):
+        print(f"Error: {BASE_DOCKERFILE} not found")
+        return 1
+
+    toolchains = {p.toolchain_tag: p for p in plans if p.split}
+    print(f"{len(plans)} images, {len(toolchains)} shared toolchains, base {plans[0].base_tag}")
+    if args.emit:
+        os.makedirs(args.emit, exist_ok=True)
+        for tag, plan in toolchains.items():
+            with open(os.path.join(args.emit, f"Dockerfile.toolchain-{plan.fuzzer}.{plan.toolchain_key}"), 'w') as f:
+                f.write(plan.toolchain_dockerfile())
+        for plan in plans:
+            with open(os.path.join(args.emit, f"Dockerfile.{plan.target}.{plan.fuzzer}.{plan.key}"), 'w') as f:
+                f.write(plan.target_dockerfile())
+    if args.plan:
+        for plan in plans:
+            parent = plan.toolchain_tag if plan.split else '(not split: built as a single stage)'
+            print(f"  {os.path.relpath(plan.dockerfile, REPO_DIR):<60} {plan.tag}  <- {parent}")
+        return 0
+
+    builder = Builder(args.registry, args.push, args.refresh, args.log)
+    start = time.perf_counter()
+    failed = 0
+    try:
+        with open(BASE_DOCKERFILE) as f:
+            if builder.ensure(plans[0].base_tag, f.read(), REPO_DIR, 'base').get('error'):
+                return 1
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(lambda p: builder.ensure(p.toolchain_tag, p.toolchain_dockerfile(), p.context,
+                                                             f"toolchain-{p.fuzzer}"), toolchains.values()))
+            broken = {r['tag'] for r in results if r.get('error')}
+            buildable = [p for p in plans if not (p.split and p.toolchain_tag in broken)]
+            failed += len(plans) - len(buildable)
+            results = list(pool.map(lambda p: builder.ensure(p.tag, p.target_dockerfile(), p.context,
+                                                             f"{p.target}-{p.fuzzer}"), buildable))
+        for plan, record in zip(buildable, results):
+            if record.get('error'):
+                failed += 1
+            elif plan.compose_image:
+                subprocess.run(['docker', 'tag', plan.tag, plan.compose_image], check=False)
+    finally:
+        builder.save()
+    print_times(builder.records, args.top)
+    hits = sum(1 for r in builder.records if r['cache_hit'])
+    print(f"{len(builder.records)} images ({hits} cached, {failed} failed) in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+模糊器对比实验的统计报告
+收集每个 target / fuzzer / run 的:
+  - 行 / 分支覆盖率: coverage-reports/coverage-{line,branch}-<target>-<fuzzer>-<run>.txt 的 gcovr TOTAL 行
+  - crash 桶数: crashes/ 中内容不同的输入数（有 results_index 索引时直接从索引读取）
+  - 执行速度 / 路径数: fuzzer_stats 的 execs_per_sec、corpus_count（paths_total）
+对每个 target、每个指标计算各 fuzzer 的中位数与 IQR，并对每一对 fuzzer 计算 Mann-Whitney U 检验（双侧）
+和 Vargha-Delaney Â12 效应量。每个 target / 指标的全部 fuzzer 对用一次 numpy 广播比较完成。
+小样本且无并列值时 p 值使用精确分布，否则使用带并列校正的正态近似。
+
+输出 <out>/report.md（表格）、<out>/summary.csv、<out>/pairs.csv；--plots 时用 matplotlib 画箱线图。
+
+使用方法:
+  python3 tools/campaign_report.py
+  python3 tools/campaign_report.py --targets libmodbus opener --metrics line_cov crashes --plots
+  python3 tools/campaign_report.py --out /tmp/report --alpha 0.01
+"""
+
+import argparse
+import csv
+import math
+import os
+import re
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from queue_sync import content_hash
+from results_index import ResultsIndex, parse_run_dir
+from targets import BASE_DIR, FUZZERS
+
+METRICS = {
+    'line_cov': 'Line coverage (%)',
+    'lines': 'Lines covered',
+    'branch_cov': 'Branch coverage (%)',
+    'branches': 'Branches taken',
+    'crashes': 'Crash buckets',
+    'paths': 'Paths (corpus count)',
+    'execs_per_sec': 'Execs / s',
+}
+TOTAL_RE = re.compile(r'^TOTAL\s+(\d+)\s+(\d+)\s+(\d+)%', re.M)
+# 精确 p 值只在 n * m 不超过此值时计算
+EXACT_LIMIT = 400
+
+
+def read_gcovr_total(path):
+    """gcovr --txt 报告的 TOTAL 行 -> (覆盖数, 百分比)；文件缺失返回 (nan, nan)"""
+    try:
+        with open(path) as f:
+            match = TOTAL_RE.search(f.read())
+    except OSError:
+        return np.nan, np.nan
+    if not match:
+        return np.nan, np.nan
+    total, covered = int(match.group(1)), int(match.group(2))
+    return covered, 100.0 * covered / total if total else 0.0
+
+
+def read_fuzzer_stats(run_dir):
+    stats = {}
+    try:
+        with open(os.path.join(run_dir, 'fuzzer_stats')) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                stats[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return stats
+
+
+def _float(stats, *keys):
+    for key in keys:
+        try:
+            return float(stats[key])
+        except (KeyError, ValueError):
+            continue
+    return np.nan
+
+
+def crash_buckets(run_dir):
+    directory = os.path.join(run_dir, 'crashes')
+    if not os.path.isdir(directory):
+        return 0
+    digests = set()
+    for name in os.listdir(directory):
+        if name.startswith('id:'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digests.add(content_hash(f.read()))
+    return len(digests)
+
+
+def collect(base_dir, targets=None, index_path=None):
+    """返回 {target: {fuzzer: {metric: [每个 run 的值]}}}"""
+    results = os.path.join(base_dir, 'results')
+    coverage = os.path.join(base_dir, 'coverage-reports')
+    index = None
+    index_path = index_path or os.path.join(results, '.results-index.npz')
+    if os.path.exists(index_path):
+        index = ResultsIndex(index_path)
+
+    data = {}
+    for name in sorted(os.listdir(results)) if os.path.isdir(results) else []:
+        parsed = parse_run_dir(name)
+        if not parsed or (targets and parsed[0] not in targets):
+            continue
+        target, fuzzer, run = parsed
+        run_dir = os.path.join(results, name)
+        stats = read_fuzzer_stats(run_dir)
+        lines, line_cov = read_gcovr_total(os.path.join(coverage, f"coverage-line-{target}-{fuzzer}-{run}.txt"))
+        branches, branch_cov = read_gcovr_total(os.path.join(coverage, f"coverage-branch-{target}-{fuzzer}-{run}.txt"))
+        if index is not None and any(r[:3] == parsed for r in index.runs):
+            rows = index.select(target, fuzzer, run, 'crashes')
+            crashes = len(np.unique(index.hash[rows], axis=0)) if rows.any() else 0
+        else:
+            crashes = crash_buckets(run_dir)
+        values = {
+            'line_cov': line_cov, 'lines': lines, 'branch_cov': branch_cov, 'branches': branches,
+            'crashes': crashes,
+            'paths': _float(stats, 'corpus_count', 'paths_total'),
+            'execs_per_sec': _float(stats, 'execs_per_sec'),
+        }
+        per_fuzzer = data.setdefault(target, {}).setdefault(fuzzer, {m: [] for m in METRICS})
+        for metric, value in values.items():
+            per_fuzzer[metric].append(value)
+    return data
+
+
+def sample_matrix(samples):
+    """不等长样本 -> 以 NaN 填充的 (F, R) 矩阵"""
+    width = max((len(s) for s in samples), default=0)
+    matrix = np.full((len(samples), max(width, 1)), np.nan)
+    for i, s in enumerate(samples):
+        matrix[i, :len(s)] = s
+    return matrix
+
+
+def pairwise_u(matrix):
+    """
+    对所有行对一次计算 Mann-Whitney U: U[i, j] = #(x_i > x_j) + 0.5 * #(x_i == x_j)
+    返回 (U, n)，n 为每行的有效样本数
+    """
+    valid = ~np.isnan(matrix)
+    x = matrix[:, None, :, None]
+    y = matrix[None, :, None, :]
+    both = valid[:, None, :, None] & valid[None, :, None, :]
+    with np.errstate(invalid='ignore'):
+        u = ((x > y) & both).sum(axis=(2, 3)) + 0.5 * ((x == y) & both).sum(axis=(2, 3))
+    return u, valid.sum(axis=1)
+
+
+def _exact_cdf(n, m):
+    """无并列时 U 的精确分布（计数递推），返回 P(U <= u) 数组"""
+    # counts[a][b] 为样本量 (a, b) 时各 U 值的排列数
+    counts = [[None] * (m + 1) for _ in range(n + 1)]
+    for a in range(n + 1):
+        for b in range(m + 1):
+            if a == 0 or b == 0:
+                counts[a][b] = np.ones(1)
+                continue
+            result = np.zeros(a * b + 1)
+            left = counts[a - 1][b]
+            result[b:b + len(left)] += left
+            right = counts[a][b - 1]
+            result[:len(right)] += right
+            counts[a][b] = result
+    dist = counts[n][m]
+    return np.cumsum(dist) / dist.sum()
+
+
+def p_value(u, n, m, matrix_i, matrix_j):
+    """双侧 Mann-Whitney p 值"""
+    if n == 0 or m == 0:
+        return np.nan
+    x, y = matrix_i[~np.isnan(matrix_i)], matrix_j[~np.isnan(matrix_j)]
+    pooled = np.concatenate([x, y])
+    _, tie_counts = np.unique(pooled, return_counts=True)
+    ties = (tie_counts > 1).any()
+    if not ties and n * m <= EXACT_LIMIT:
+        cdf = _exact_cdf(n, m)
+        low = cdf[int(np.floor(u))]
+        high = 1.0 - (cdf[int(np.ceil(u)) - 1] if u >= 1 else 0.0)
+        return min(1.0, 2 * min(low, high))
+    total = n + m
+    variance = n * m / 12.0 * ((total + 1) - (tie_counts ** 3 - tie_counts).sum() / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n * m / 2.0) - 0.5) / np.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def analyze(data, metrics):
+    """返回 (summary 行, pairs 行)"""
+    summary, pairs = [], []
+    for target in sorted(data):
+        fuzzers = [f for f in FUZZERS if f in data[target]] + sorted(set(data[target]) - set(FUZZERS))
+        for metric in metrics:
+            matrix = sample_matrix([data[target][f][metric] for f in fuzzers])
+            if np.isnan(matrix).all():
+                continue
+            # 某个 fuzzer 该指标全为 NaN 时 nanpercentile 会警告，结果本身就是 NaN
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                q1, median, q3 = np.nanpercentile(matrix, [25, 50, 75], axis=1)
+                mean = np.nanmean(matrix, axis=1)
+            u, n = pairwise_u(matrix)
+            for i, fuzzer in enumerate(fuzzers):
+                summary.append({'target': target, 'metric': metric, 'fuzzer': fuzzer, 'runs': int(n[i]),
+                                'median': median[i], 'q1': q1[i], 'q3': q3[i], 'iqr': q3[i] - q1[i], 'mean': mean[i]})
+            for i in range(len(fuzzers)):
+                for j in range(i + 1, len(fuzzers)):
+                    if not n[i] or not n[j]:
+                        continue
+                    pairs.append({'target': target, 'metric': metric, 'a': fuzzers[i], 'b': fuzzers[j],
+                                  'u': u[i, j], 'a12': u[i, j] / (n[i] * n[j]),
+                                  'p': p_value(u[i, j], int(n[i]), int(n[j]), matrix[i], matrix[j])})
+    return summary, pairs
+
+
+def effect_label(a12):
+    """Vargha-Delaney 的效应量分级"""
+    distance = abs(a12 - 0.5)
+    if distance < 0.06:
+        return 'negligible'
+    if distance < 0.14:
+        return 'small'
+    if distance < 0.21:
+        return 'medium'
+    return 'large'
+
+
+def _fmt(value):
+    if value != value:
+        return '-'
+    return f"{value:.2f}" if abs(value) < 1000 else f"{value:.0f}"
+
+
+def write_markdown(path, summary, pairs, alpha):
+    with open(path, 'w') as f:
+        f.write(f"# Campaign comparison\n\nGenerated {time.strftime('%Y-%m-%d %H:%M:%S')}. "
+                f"Mann-Whitney U (two-sided), Vargha-Delaney Â12; significant at p < {alpha}.\n")
+        for target in sorted({row['target'] for row in summary}):
+            f.write(f"\n## {target}\n")
+            for metric in METRICS:
+                rows = [r for r in summary if r['target'] == target and r['metric'] == metric]
+                if not rows:
+                    continue
+                f.write(f"\n### {METRICS[metric]}\n\n| fuzzer | runs | median | IQR | mean |\n|---|---:|---:|---:|---:|\n")
+                for r in rows:
+                    f.write(f"| {r['fuzzer']} | {r['runs']} | {_fmt(r['median'])} | {_fmt(r['iqr'])} | {_fmt(r['mean'])} |\n")
+                pair_rows = [p for p in pairs if p['target'] == target and p['metric'] == metric]
+                if pair_rows:
+                    f.write("\n| A vs B | U | Â12 | effect | p |\n|---|---:|---:|---|---:|\n")
+                    for p in pair_rows:
+                        mark = ' *' if p['p'] < alpha else ''
+                        f.write(f"| {p['a']} vs {p['b']} | {p['u']:.1f} | {p['a12']:.3f} | {effect_label(p['a12'])} "
+                                f"| {p['p']:.4f}{mark} |\n")
+
+
+def write_csv(path, rows):
+    if not rows:
+        open(path, 'w').close()
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_plots(directory, data, metrics):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("Error: --plots requires matplotlib (pip install matplotlib)")
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for target in sorted(data):
+        fuzzers = [f for f in FUZZERS if f in data[target]] + sorted(set(data[target]) - set(FUZZERS))
+        for metric in metrics:
+            samples = [np.array(data[target][f][metric], dtype=float) for f in fuzzers]
+            samples = [s[~np.isnan(s)] for s in samples]
+            if not any(len(s) for s in samples):
+                continue
+            fig, ax = plt.subplots(figsize=(1.2 * len(fuzzers) + 2, 4))
+            ax.boxplot(samples, labels=fuzzers)
+            ax.set_title(f"{target}: {METRICS[metric]}")
+            fig.tight_layout()
+            fig.savefig(os.path.join(directory, f"{target}-{metric}.png"), dpi=100)
+            plt.close(fig)
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Median / IQR, Mann-Whitney U and Vargha-Delaney A12 across fuzzers")
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    parser.add_argument('--targets', nargs='+')
+    parser.add_argument('--metrics', nargs='+', choices=list(METRICS), default=list(METRICS))
+    parser.add_argument('--index', help='results_index.py index file (default: <base>/results/.results-index.npz)')
+    parser.add_argument('--out', help='output directory (default: <base>/benchmarks/report)')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--plots', action='store_true', help='render box plots (needs matplotlib)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = collect(args.base_dir, args.targets, args.index)
+    if not data:
+        print(f"Error: no result directories under {os.path.join(args.base_dir, 'results')}")
+        return 1
+    summary, pairs = analyze(data, args.metrics)
+
+    out = args.out or os.path.join(args.base_dir, 'benchmarks', 'report')
+    os.makedirs(out, exist_ok=True)
+    write_markdown(os.path.join(out, 'report.md'), summary, pairs, args.alpha)
+    write_csv(os.path.join(out, 'summary.csv'), summary)
+    write_csv(os.path.join(out, 'pairs.csv'), pairs)
+    plots = write_plots(os.path.join(out, 'plots'), data, args.metrics) if args.plots else 0
+
+    runs = sum(len(values['execs_per_sec']) for fuzzers in data.values() for values in fuzzers.values())
+    print(f"{len(data)} targets, {runs} runs, {len(pairs)} fuzzer pairs"
+          f"{f', {plots} plots' if plots else ''} in {time.perf_counter() - start:.2f}s -> {out}")
+    significant = [p for p in pairs if p['p'] < args.alpha]
+    for p in significant:
+        better = p['a'] if p['a12'] > 0.5 else p['b']
+        print(f"  {p['target']:<20} {p['metric']:<14} {p['a']} vs {p['b']}: "
+              f"A12={p['a12']:.2f} p={p['p']:.4f} ({effect_label(p['a12'])}, {better} higher)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
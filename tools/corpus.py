@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+replayable 测试用例的按需映射访问
+每个测试用例文件用只读 mmap 映射，消息是映射上的 memoryview 切片（不复制），
+重放引擎、framers 和 socket.sendall 都直接使用 memoryview。
+遍历时同一时刻只映射一个文件，映射页属于页缓存而不是进程私有内存，
+峰值内存与语料库大小无关，多个任务处理同一语料库时页缓存可以共享。
+
+打包格式（.cpk）: 把整个 results 目录（或单个 run / queue 目录）打成一个文件，
+内容相同的文件只存一份，docker cp / rsync / 归档只处理一个大文件，重放时顺序读取。
+  头部   CORPACK1
+  数据   去重后的文件内容依次拼接（按打包时的文件名顺序）
+  索引   zlib 压缩的 JSON: blobs [[偏移, 长度, blake2b-128]], entries [[相对路径, blob, mode, mtime]]
+  尾部   索引偏移 (u64) + 索引长度 (u64) + CORPACK1
+
+使用方法:
+  from corpus import iter_testcases, open_testcase
+
+  for path, messages in iter_testcases(list_testcases(queue_dir)):
+      replay_testcase(host, port, protocol, messages, timeout)
+
+  with open_testcase(path) as messages:
+      ...
+
+  python3 tools/corpus.py pack results/opener-a3-1 -o opener-a3-1.cpk
+  python3 tools/corpus.py pack results -o campaign.cpk
+  python3 tools/corpus.py list campaign.cpk
+  python3 tools/corpus.py unpack campaign.cpk -o /tmp/results --prefix opener-a3-1/
+  python3 tools/replay.py opener a3 1 --input campaign.cpk     # 直接从打包文件重放
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+
+from queue_sync import content_hash
+from replayable import parse_messages
+
+ARCHIVE_MAGIC = b'CORPACK1'
+ARCHIVE_FOOTER = struct.Struct('<QQ8s')
+
+
+class MappedTestcase:
+    """一个以 mmap 映射的 replayable 文件；messages 为 memoryview 切片列表"""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._view = None
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap 不能映射空文件
+            if size:
+                self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                if hasattr(self._map, 'madvise'):
+                    self._map.madvise(mmap.MADV_SEQUENTIAL)
+                self._view = memoryview(self._map)
+        self.messages = parse_messages(self._view) if self._view is not None else []
+
+    def close(self):
+        self.messages = []
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # 调用方仍持有消息切片: 映射在最后一个切片释放时由 GC 解除
+                pass
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def open_testcase(path):
+    """映射一个测试用例，返回其消息（memoryview 列表），退出时解除映射"""
+    testcase = MappedTestcase(path)
+    try:
+        yield testcase.messages
+    finally:
+        testcase.close()
+
+
+def iter_testcases(paths):
+    """
+    依次映射每个测试用例，产出 (path, messages)；取下一个时解除上一个的映射。
+    需要在迭代之后继续使用的内容应由调用方复制（bytes(msg)）。
+    """
+    for path in paths:
+        with MappedTestcase(path) as testcase:
+            yield path, testcase.messages
+
+
+def is_archive(path):
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+def pack(source, output):
+    """把 source 下的所有普通文件打包到 output，返回 (文件数, 不同内容数, 原始字节数, 写入字节数)"""
+    source = os.path.abspath(source)
+    output = os.path.abspath(output)
+    blobs, entries, seen = [], [], {}
+    total = 0
+    tmp = output + '.tmp'
+    with open(tmp, 'wb') as out:
+        out.write(ARCHIVE_MAGIC)
+        offset = len(ARCHIVE_MAGIC)
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if path in (output, tmp) or not os.path.isfile(path) or os.path.islink(path):
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                    stat = os.fstat(f.fileno())
+                digest = content_hash(data)
+                blob = seen.get(digest)
+                if blob is None:
+                    blob = seen[digest] = len(blobs)
+                    blobs.append([offset, len(data), digest.hex()])
+                    out.write(data)
+                    offset += len(data)
+                total += len(data)
+                entries.append([os.path.relpath(path, source), blob, stat.st_mode & 0o7777, stat.st_mtime])
+        index = zlib.compress(json.dumps({'blobs': blobs, 'entries': entries}).encode())
+        out.write(index)
+        out.write(ARCHIVE_FOOTER.pack(offset, len(index), ARCHIVE_MAGIC))
+        written = out.tell()
+    os.replace(tmp, output)
+    return len(entries), len(blobs), total, written
+
+
+class CorpusArchive:
+    """只读映射一个 .cpk 文件；read() 与 iter_testcases() 返回映射上的 memoryview"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(ARCHIVE_MAGIC) + ARCHIVE_FOOTER.size:
+                raise ValueError(f"{path} is not a corpus archive")
+            self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        index_offset, index_size, magic = ARCHIVE_FOOTER.unpack_from(self._map, size - ARCHIVE_FOOTER.size)
+        if self._map[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC or magic != ARCHIVE_MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a corpus archive")
+        index = json.loads(zlib.decompress(self._map[index_offset:index_offset + index_size]))
+        if hasattr(self._map, 'madvise'):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map)
+        self.blobs = index['blobs']
+        self.entries = {name: (blob, mode, mtime) for name, blob, mode, mtime in index['entries']}
+
+    def names(self, prefix=''):
+        return sorted(name for name in self.entries if name.startswith(prefix))
+
+    def read(self, name):
+        offset, size, _ = self.blobs[self.entries[name][0]]
+        return self._view[offset:offset + size]
+
+    def list_testcases(self, directory=''):
+        """与 replayable.list_testcases 相同: directory 下（不含子目录）的 id:* 条目，按名称排序"""
+        prefix = directory.rstrip('/') + '/' if directory else ''
+        return [name for name in self.names(prefix)
+                if name[len(prefix):].startswith('id:') and '/' not in name[len(prefix):]]
+
+    def find_queue_dir(self, run=''):
+        """与 replayable.find_queue_dir 相同的回退顺序；打包的是 queue 目录本身时返回根"""
+        for candidate in (f"{run}/replayable-queue" if run else 'replayable-queue',
+                          f"{run}/queue" if run else 'queue'):
+            if self.list_testcases(candidate):
+                return candidate
+        return run
+
+    def iter_testcases(self, names):
+        for name in names:
+            yield name, parse_messages(self.read(name))
+
+    def unpack(self, dest, prefix='', verify=True):
+        """解包到 dest；条目名为绝对路径或含 .. 而落到 dest 之外时，整体拒绝，不写任何文件"""
+        root = os.path.realpath(dest)
+        names = self.names(prefix)
+        for name in names:
+            target = os.path.realpath(os.path.join(root, name))
+            if os.path.isabs(name) or os.path.commonpath([root, target]) != root or target == root:
+                raise ValueError(f"{name}: entry path escapes {dest}")
+        count = 0
+        for name in names:
+            blob, mode, mtime = self.entries[name]
+            data = self.read(name)
+            if verify and content_hash(data).hex() != self.blobs[blob][2]:
+                raise ValueError(f"{name}: content hash mismatch")
+            path = os.path.join(dest, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            os.chmod(path, mode)
+            os.utime(path, (mtime, mtime))
+            count += 1
+        return count
+
+    def close(self):
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack, list and unpack deduplicated corpus archives (.cpk)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('pack', help='pack a results / run / queue directory')
+    p.add_argument('source')
+    p.add_argument('-o', '--output', required=True)
+    u = sub.add_parser('unpack', help='restore files from an archive')
+    u.add_argument('archive')
+    u.add_argument('-o', '--output', required=True, help='destination directory')
+    u.add_argument('--prefix', default='', help='only entries under this relative path')
+    u.add_argument('--no-verify', action='store_true', help='skip content hash checks')
+    ls = sub.add_parser('list', help='summarize an archive')
+    ls.add_argument('archive')
+    ls.add_argument('--names', action='store_true', help='print every entry')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        if args.command == 'pack':
+            if not os.path.isdir(args.source):
+                print(f"Error: {args.source} is not a directory")
+                return 1
+            files, blobs, total, written = pack(args.source, args.output)
+            print(f"Packed {files} files ({blobs} unique, {total} bytes) into {args.output} "
+                  f"({written} bytes) in {time.perf_counter() - start:.2f}s")
+            return 0
+        with CorpusArchive(args.archive) as archive:
+            if args.command == 'unpack':
+                count = archive.unpack(args.output, args.prefix, not args.no_verify)
+                print(f"Unpacked {count} files to {args.output} in {time.perf_counter() - start:.2f}s")
+                return 0
+            runs = {}
+            for name in archive.entries:
+                top = name.split('/', 1)[0] if '/' in name else '.'
+                runs[top] = runs.get(top, 0) + 1
+            print(f"{args.archive}: {len(archive.entries)} files, {len(archive.blobs)} unique contents, "
+                  f"{sum(b[1] for b in archive.blobs)} data bytes")
+            for top, count in sorted(runs.items()):
+                print(f"  {top:<40} {count:>8} files")
+            if args.names:
+                for name in archive.names():
+                    print(name)
+    except (OSError, ValueError, zlib.error) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+行 / 分支 / 函数级覆盖率位图
+把 gcovr JSON（gcovr --json）或 gcov JSON（gcov --json-format 生成的 .gcov.json.gz）转换为定长位图:
+每个目标构建一张编号表（<target>/<构建键>.table.json），把 (文件, 行)、(文件, 行, 分支序号)、(文件, 函数)
+映射为固定的位下标；编号只追加不改动，旧位图在表增长后补零即可与新位图对齐。
+位图按行打包（np.packbits）保存在一个 .npz 中，集合运算都是 numpy 数组运算:
+  并 / 交       np.bitwise_or / bitwise_and .reduce
+  计数          np.bitwise_count（旧版 numpy 用 256 项查表）
+  独有覆盖      逐行累积 once / twice 两个位向量，exactly_one = once & ~twice
+  覆盖曲线      np.bitwise_or.accumulate 后逐行计数
+  集合覆盖      贪心: 每轮选 popcount(row & ~covered) 最大的一行（堆上惰性求值）
+构建键取源码目录中 coverage_builds.py 写入的检出标记，没有时为 default。
+
+使用方法:
+  gcovr --root libmodbus --object-directory libmodbus --json run.json --branches
+  python3 tools/coverage_bitmap.py export libmodbus coverage-json/*.json
+  python3 tools/coverage_bitmap.py stats coverage-bitmaps/libmodbus/default.npz --kind branches
+  python3 tools/coverage_bitmap.py unique coverage-bitmaps/libmodbus/default.npz --kind branches
+  python3 tools/coverage_bitmap.py cover coverage-bitmaps/libmodbus/default.npz --kind lines --match aflnet
+  python3 tools/coverage_bitmap.py curve coverage-bitmaps/libmodbus/default.npz --kind lines
+"""
+
+import argparse
+import gzip
+import heapq
+import json
+import os
+import sys
+
+import numpy as np
+
+from coverage_builds import BUILDS, MARKER, source_dir
+from targets import BASE_DIR
+
+KINDS = ('lines', 'branches', 'functions')
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(packed, axis=-1):
+    """打包位图按 axis 求置位数"""
+    counts = np.bitwise_count(packed) if hasattr(np, 'bitwise_count') else POPCOUNT[packed]
+    return counts.sum(axis=axis, dtype=np.int64)
+
+
+def build_key(target, base_dir=None):
+    marker = os.path.join(source_dir(target, base_dir), MARKER)
+    if os.path.isfile(marker):
+        with open(marker) as f:
+            return json.load(f).get('key', 'default')
+    return 'default'
+
+
+def read_json(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        return json.load(f)
+
+
+def parse_coverage(data, root=''):
+    """
+    gcovr / gcov JSON -> {kind: {键: 是否命中}}；同一键出现多次时取或。
+    root 非空时文件路径转为相对 root，保证不同主机、不同构建目录导出的键一致。
+    """
+    hits = {kind: {} for kind in KINDS}
+
+    def mark(kind, key, hit):
+        hits[kind][key] = hits[kind].get(key, False) or hit
+
+    for entry in data.get('files', []):
+        name = entry['file']
+        if root and os.path.isabs(name):
+            name = os.path.relpath(name, root)
+        for line in entry.get('lines', []):
+            if line.get('gcovr/noncode'):
+                continue
+            number = line['line_number']
+            mark('lines', (name, number), line.get('count', 0) > 0)
+            for i, branch in enumerate(line.get('branches', [])):
+                mark('branches', (name, number, i), branch.get('count', 0) > 0)
+            # 旧版 gcovr 没有 functions 列表，只在行上给出 function_name
+            if 'function_name' in line and not entry.get('functions'):
+                mark('functions', (name, line['function_name']), line.get('count', 0) > 0)
+        for function in entry.get('functions', []):
+            count = function.get('execution_count', function.get('count', 0))
+            mark('functions', (name, function['name']), count > 0)
+    return hits
+
+
+class NumberingTable:
+    """(文件, 行 ...) -> 位下标；新键按排序追加在末尾，已有下标不变"""
+
+    def __init__(self, path, target, build):
+        self.path = path
+        self.target = target
+        self.build = build
+        self.keys = {kind: [] for kind in KINDS}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data['target'] != target or data['build'] != build:
+                raise ValueError(f"{path} numbers {data['target']} build {data['build']}, not {target} {build}")
+            self.keys = {kind: [tuple(k) for k in data[kind]] for kind in KINDS}
+        self.index = {kind: {key: i for i, key in enumerate(self.keys[kind])} for kind in KINDS}
+
+    def width(self, kind):
+        return len(self.keys[kind])
+
+    def assign(self, kind, keys):
+        """返回 keys 对应的下标数组，没有编号的键先追加"""
+        index = self.index[kind]
+        for key in sorted(k for k in set(keys) if k not in index):
+            index[key] = len(self.keys[kind])
+            self.keys[kind].append(key)
+        return np.fromiter((index[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict({'target': self.target, 'build': self.build},
+                           **{kind: self.keys[kind] for kind in KINDS}), f)
+        os.replace(tmp, self.path)
+
+
+class BitmapSet:
+    """一组位图: names[i] 的 kind 位图是 packed[kind][i]（每行 ceil(width / 8) 字节）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.target = ''
+        self.build = ''
+        self.names = []
+        self.widths = {kind: 0 for kind in KINDS}
+        self.packed = {kind: np.zeros((0, 0), dtype=np.uint8) for kind in KINDS}
+        if os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.names)
+
+    def load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            self.target = str(data['target'])
+            self.build = str(data['build'])
+            self.names = data['names'].tolist()
+            for kind in KINDS:
+                self.packed[kind] = data[kind]
+                self.widths[kind] = int(data[f'{kind}_width'])
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp.npz'
+        np.savez_compressed(tmp, target=np.array(self.target), build=np.array(self.build),
+                            names=np.array(self.names, dtype='U'),
+                            **{kind: self.packed[kind] for kind in KINDS},
+                            **{f'{kind}_width': np.array(self.widths[kind]) for kind in KINDS})
+        os.replace(tmp, self.path)
+
+    def _resize(self, kind, width):
+        """编号表增长后在右侧补零字节"""
+        nbytes = (width + 7) // 8
+        current = self.packed[kind]
+        if current.shape[1] < nbytes:
+            pad = np.zeros((current.shape[0], nbytes - current.shape[1]), dtype=np.uint8)
+            self.packed[kind] = np.hstack([current, pad])
+        self.widths[kind] = max(self.widths[kind], width)
+
+    def add(self, entries, widths):
+        """entries: [(名字, {kind: 置位下标数组})]；同名位图被替换，新位图一次性追加"""
+        for kind in KINDS:
+            self._resize(kind, widths[kind])
+        rows = {name: i for i, name in enumerate(self.names)}
+        for name, _ in entries:
+            if name not in rows:
+                rows[name] = len(self.names)
+                self.names.append(name)
+        for kind in KINDS:
+            current = self.packed[kind]
+            block = np.zeros((len(self.names) - current.shape[0], current.shape[1]), dtype=np.uint8)
+            self.packed[kind] = np.vstack([current, block]) if len(block) else current
+            bits = np.zeros(current.shape[1] * 8, dtype=bool)
+            for name, kind_bits in entries:
+                bits[:] = False
+                bits[kind_bits[kind]] = True
+                self.packed[kind][rows[name]] = np.packbits(bits)
+
+    def select(self, match=None):
+        """名字包含 match 的行下标"""
+        return np.array([i for i, n in enumerate(self.names) if not match or match in n], dtype=np.int64)
+
+    def matrix(self, kind, rows=None):
+        packed = self.packed[kind]
+        return packed if rows is None else packed[rows]
+
+    def counts(self, kind, rows=None):
+        return popcount(self.matrix(kind, rows), axis=1)
+
+    def union(self, kind, rows=None):
+        m = self.matrix(kind, rows)
+        return np.bitwise_or.reduce(m, axis=0) if len(m) else np.zeros(m.shape[1], dtype=np.uint8)
+
+    def intersection(self, kind, rows=None):
+        m = self.matrix(kind, rows)
+        return np.bitwise_and.reduce(m, axis=0) if len(m) else np.zeros(m.shape[1], dtype=np.uint8)
+
+    def unique(self, kind, rows=None):
+        """每行只有它自己覆盖的位数"""
+        m = self.matrix(kind, rows)
+        once = np.zeros(m.shape[1], dtype=np.uint8)
+        twice = np.zeros(m.shape[1], dtype=np.uint8)
+        for row in m:
+            twice |= once & row
+            once |= row
+        return popcount(m & (once & ~twice), axis=1)
+
+    def curve(self, kind, rows=None):
+        """按行顺序累积的覆盖位数"""
+        m = self.matrix(kind, rows)
+        return popcount(np.bitwise_or.accumulate(m, axis=0), axis=1) if len(m) else np.zeros(0, dtype=np.int64)
+
+    def greedy_cover(self, kind, rows=None):
+        """
+        贪心集合覆盖: 返回 [(行下标, 新增位数)]，直到并集被完全覆盖。
+        新增位数只会变小，用堆做惰性求值，每轮通常只需重算堆顶几行。
+        """
+        rows = np.arange(len(self.names)) if rows is None else rows
+        m = self.matrix(kind, rows)
+        covered = np.zeros(m.shape[1], dtype=np.uint8)
+        heap = [(-int(g), i) for i, g in enumerate(popcount(m, axis=1)) if g]
+        heapq.heapify(heap)
+        picked = []
+        while heap:
+            _, i = heapq.heappop(heap)
+            gain = int(popcount(m[i] & ~covered))
+            if heap and gain < -heap[0][0]:
+                if gain:
+                    heapq.heappush(heap, (-gain, i))
+                continue
+            if not gain:
+                break
+            picked.append((int(rows[i]), gain))
+            covered |= m[i]
+        return picked
+
+
+def default_paths(target, build, base_dir):
+    directory = os.path.join(base_dir, 'coverage-bitmaps', target)
+    return os.path.join(directory, f"{build}.table.json"), os.path.join(directory, f"{build}.npz")
+
+
+def export(target, inputs, output=None, table_path=None, names=None, build=None, base_dir=None, root=None):
+    """把 JSON 覆盖率文件加入位图集合，返回 (BitmapSet, NumberingTable)"""
+    base = base_dir or BASE_DIR
+    build = build or build_key(target, base)
+    default_table, default_output = default_paths(target, build, base)
+    table = NumberingTable(table_path or default_table, target, build)
+    bitmaps = BitmapSet(output or default_output)
+    if len(bitmaps) and (bitmaps.target, bitmaps.build) != (target, build):
+        raise ValueError(f"{bitmaps.path} holds {bitmaps.target} build {bitmaps.build}, not {target} {build}")
+    bitmaps.target, bitmaps.build = target, build
+    root = root if root is not None else source_dir(target, base)
+    entries = []
+    for i, path in enumerate(inputs):
+        hits = parse_coverage(read_json(path), root)
+        kind_bits = {}
+        for kind in KINDS:
+            keys = list(hits[kind])
+            index = table.assign(kind, keys)
+            hit = np.fromiter((hits[kind][k] for k in keys), dtype=bool, count=len(keys))
+            kind_bits[kind] = index[hit]
+        entries.append((names[i] if names else os.path.basename(path).split('.')[0], kind_bits))
+    bitmaps.add(entries, {kind: table.width(kind) for kind in KINDS})
+    table.save()
+    bitmaps.save()
+    return bitmaps, table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and analyze fixed-index coverage bitmaps")
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    e = sub.add_parser('export', help='add gcovr / gcov JSON files to a bitmap set')
+    e.add_argument('target', choices=sorted(BUILDS))
+    e.add_argument('inputs', nargs='+', help='gcovr --json or gcov --json-format (.gz) files')
+    e.add_argument('-o', '--output', help='bitmap set (default: coverage-bitmaps/<target>/<build>.npz)')
+    e.add_argument('--table', help='numbering table (default: next to the default output)')
+    e.add_argument('--names', nargs='+', help='bitmap names (default: input file names)')
+    e.add_argument('--build', help='build key (default: the checked-out coverage build, or "default")')
+    e.add_argument('--root', help='make absolute source paths relative to this directory')
+    for name, text in (('stats', 'per-bitmap counts, union and intersection'),
+                       ('unique', 'bits covered by exactly one bitmap'),
+                       ('cover', 'greedy minimal set of bitmaps covering the union'),
+                       ('curve', 'cumulative coverage in bitmap order')):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('bitmaps')
+        p.add_argument('--kind', choices=KINDS, default='branches')
+        p.add_argument('--match', help='only bitmaps whose name contains this string')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'export':
+            if args.names and len(args.names) != len(args.inputs):
+                print("Error: --names must give one name per input")
+                return 1
+            bitmaps, table = export(args.target, args.inputs, args.output, args.table, args.names,
+                                    args.build, args.base_dir, args.root)
+            widths = ', '.join(f"{table.width(k)} {k}" for k in KINDS)
+            print(f"{len(bitmaps)} bitmaps ({widths}) -> {bitmaps.path}")
+            return 0
+        if not os.path.exists(args.bitmaps):
+            print(f"Error: {args.bitmaps} not found")
+            return 1
+        bitmaps = BitmapSet(args.bitmaps)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    rows = bitmaps.select(args.match)
+    kind, width = args.kind, bitmaps.widths[args.kind]
+    names = [bitmaps.names[i] for i in rows]
+    if args.command == 'stats':
+        for name, count in zip(names, bitmaps.counts(kind, rows)):
+            print(f"{name:<40} {count:>8} / {width}")
+        print(f"{'union':<40} {popcount(bitmaps.union(kind, rows)):>8} / {width}")
+        print(f"{'intersection':<40} {popcount(bitmaps.intersection(kind, rows)):>8} / {width}")
+    elif args.command == 'unique':
+        for name, count in sorted(zip(names, bitmaps.unique(kind, rows)), key=lambda x: -x[1]):
+            print(f"{name:<40} {count:>8}")
+    elif args.command == 'cover':
+        total = 0
+        for row, gain in bitmaps.greedy_cover(kind, rows):
+            total += gain
+            print(f"{bitmaps.names[row]:<40} +{gain:<8} {total:>8}")
+        print(f"{len(rows)} bitmaps, union {total} / {width} {kind}")
+    else:
+        for name, count in zip(names, bitmaps.curve(kind, rows)):
+            print(f"{name:<40} {count:>8} / {width}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
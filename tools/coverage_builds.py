@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+覆盖率构建产物仓库
+coverage-analysis/coverage-*.sh 每次运行都会用 gcov 插桩重新编译目标（数分钟），
+源码、补丁 / harness 和构建步骤都没变时结果完全相同。本工具把一次构建的产物
+（覆盖率版服务器、.o / .gcno、构建中被打补丁的源码）按内容键存档，之后的覆盖率 / 重放任务直接检出。
+
+内容键 = blake2b(源码状态, 构建输入文件, 脚本中 rebuild_with_coverage 函数, gcc 版本)
+  源码状态: 目标源码是独立 git 仓库时为 HEAD + git diff，否则为源码树中所有非构建产物文件的内容
+构建会在原地打补丁，所以构建前、构建后的源码状态各对应一个键，两个键指向同一份产物。
+
+仓库布局（默认 <BASE_DIR>/coverage-builds，可用 COVERAGE_BUILD_REGISTRY 或 --registry 指向共享目录）:
+  <target>/<key>.tar.gz   产物（相对源码目录的路径，保留 mtime / 权限）
+  <target>/<key>.json     清单: 产物文件名、源码目录、文件数、.gcno 数、构建耗时、别名
+产物里的 .gcno 和二进制记录了编译时的绝对路径，检出时源码目录必须与构建时一致
+（dist_replay.py 的 gcda 作业使用 GCOV_PREFIX，不受此限制）。
+
+使用方法（coverage-*.sh 的 rebuild_with_coverage 中已调用）:
+  python3 tools/coverage_builds.py checkout libmodbus      # 命中: 检出并清理旧 .gcda，返回 0；未命中: 记录构建起点，返回 1
+  python3 tools/coverage_builds.py store libmodbus         # 构建完成后保存产物
+  python3 tools/coverage_builds.py key opener
+  python3 tools/coverage_builds.py list
+  python3 tools/coverage_builds.py prune --keep 3
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import time
+from contextlib import contextmanager
+
+from targets import BASE_DIR, get_target
+
+# source: 源码目录（相对 BASE_DIR），构建在其中原地进行
+# script: 构建步骤所在的覆盖率脚本；inputs: 构建时复制 / 应用的仓库文件
+BUILDS = {
+    'libmodbus': {
+        'source': 'libmodbus',
+        'script': 'coverage-analysis/coverage-modbus.sh',
+        'inputs': [],
+    },
+    'libplctag': {
+        'source': 'libplctag',
+        'script': 'coverage-analysis/coverage-modbus.sh',
+        'inputs': ['dockerfiles-libplctag/libplctag-coverage-fix.patch'],
+    },
+    'iec104': {
+        'source': 'IEC104',
+        'script': 'coverage-analysis/coverage-iec104.sh',
+        'inputs': ['dockerfiles-iec104/iec104-fuzzing.patch'],
+    },
+    'freyrscada-iec104': {
+        'source': 'freyrscada-iec104',
+        'script': 'coverage-analysis/coverage-iec104.sh',
+        'inputs': ['dockerfiles-freyrscada-iec104/freyrscada-iec104-fuzzing.patch'],
+    },
+    'opener': {
+        'source': 'OpENer',
+        'script': 'coverage-analysis/coverage-ethernetip.sh',
+        'inputs': ['dockerfiles-opener/opener-fuzzing-fix.patch', 'dockerfiles-opener/opener-coverage-fix.patch'],
+    },
+    'eipscanner': {
+        'source': 'eipscanner',
+        'script': 'coverage-analysis/coverage-ethernetip.sh',
+        'inputs': ['dockerfiles-eipscanner/EIPServerHarness.cpp', 'dockerfiles-eipscanner/eipscanner-cmake.patch'],
+    },
+    'libslmp2': {
+        'source': 'libslmp2',
+        'script': 'coverage-analysis/coverage-libslmp.sh',
+        'inputs': ['dockerfiles-libslmp2/svrskel_afl.c', 'dockerfiles-libslmp2/svrskel_afl_coverage.c'],
+    },
+}
+
+# 非 git 源码树计算键时跳过的构建产物
+BUILD_DIRS = {'.git', '.deps', '.libs', 'CMakeFiles'}
+BUILD_DIR_PREFIX = 'build'
+BUILD_SUFFIXES = ('.o', '.lo', '.a', '.la', '.so', '.gcno', '.gcda', '.gcov')
+BUILD_FILES = {'config.log', 'config.status', 'libtool', 'stamp-h1', 'CMakeCache.txt', '.coverage-build.json'}
+BUILD_MAGIC = (b'\x7fELF', b'!<arch>')
+MARKER = '.coverage-build.json'
+PENDING = '.pending-{target}.json'
+
+
+def registry_dir(base_dir=None, registry=None):
+    return registry or os.environ.get('COVERAGE_BUILD_REGISTRY') or \
+        os.path.join(base_dir or BASE_DIR, 'coverage-builds')
+
+
+def get_build(target):
+    get_target(target)
+    if target not in BUILDS:
+        raise KeyError(f"No coverage build recipe for '{target}', expected one of: {', '.join(sorted(BUILDS))}")
+    return BUILDS[target]
+
+
+def source_dir(target, base_dir=None):
+    return os.path.join(base_dir or BASE_DIR, get_build(target)['source'])
+
+
+def _is_build_output(name):
+    return name in BUILD_FILES or name.endswith(BUILD_SUFFIXES)
+
+
+def _git_state(path):
+    """源码目录本身是 git 仓库时返回 HEAD + 工作区差异，否则返回 None"""
+    try:
+        top = subprocess.run(['git', '-C', path, 'rev-parse', '--show-toplevel'],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        if os.path.realpath(top) != os.path.realpath(path):
+            return None
+        head = subprocess.run(['git', '-C', path, 'rev-parse', 'HEAD'],
+                              capture_output=True, check=True).stdout
+        diff = subprocess.run(['git', '-C', path, 'diff', 'HEAD', '--binary'],
+                              capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head + diff
+
+
+def _tree_state(path, h):
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in BUILD_DIRS and not d.startswith(BUILD_DIR_PREFIX))
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            if _is_build_output(name) or os.path.islink(full) or not os.path.isfile(full):
+                continue
+            with open(full, 'rb') as f:
+                head = f.read(8)
+                # 编译出的可执行文件 / 目标文件 / 静态库（构建产物，名字没有固定后缀）
+                if head.startswith(BUILD_MAGIC):
+                    continue
+                h.update(os.path.relpath(full, path).encode() + b'\0' + head)
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+
+
+def _recipe(script_path):
+    """脚本中 rebuild_with_coverage 函数的文本；找不到时用整个脚本"""
+    with open(script_path, 'rb') as f:
+        text = f.read()
+    match = re.search(rb'^rebuild_with_coverage\(\) \{\n.*?^\}$', text, re.M | re.S)
+    return match.group(0) if match else text
+
+
+def _compiler():
+    try:
+        return subprocess.run(['gcc', '--version'], capture_output=True, check=True).stdout.split(b'\n')[0]
+    except (OSError, subprocess.CalledProcessError):
+        return b'unknown'
+
+
+def content_key(target, base_dir=None):
+    base = base_dir or BASE_DIR
+    build = get_build(target)
+    src = source_dir(target, base)
+    if not os.path.isdir(src):
+        raise FileNotFoundError(f"Source directory not found: {src}")
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{target}\0{build['source']}\0".encode())
+    state = _git_state(src)
+    if state is not None:
+        h.update(b'git\0' + state)
+    else:
+        _tree_state(src, h)
+    for rel in build['inputs']:
+        path = os.path.join(base, rel)
+        h.update(rel.encode() + b'\0')
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    h.update(_recipe(os.path.join(base, build['script'])))
+    h.update(_compiler())
+    return h.hexdigest()
+
+
+@contextmanager
+def _locked(directory):
+    """同一仓库上的并发检出 / 保存串行化（多个 worker 可能同时检出同一目标）"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_manifest(target, key, registry):
+    path = os.path.join(registry, target, f"{key}.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifests(registry, target=None):
+    """返回仓库中的清单（每个别名一份，同一产物可能出现多次），按创建时间从新到旧"""
+    found = []
+    targets = [target] if target else sorted(os.listdir(registry)) if os.path.isdir(registry) else []
+    for name in targets:
+        directory = os.path.join(registry, name)
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.listdir(directory):
+            if entry.endswith('.json') and not entry.startswith('.'):
+                with open(os.path.join(directory, entry)) as f:
+                    manifest = json.load(f)
+                found.append(manifest)
+    return sorted(found, key=lambda m: m['created'], reverse=True)
+
+
+def clean_gcda(path):
+    count = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith('.gcda'):
+                os.remove(os.path.join(root, name))
+                count += 1
+    return count
+
+
+def _intact(tar, src):
+    for member in tar.getmembers():
+        path = os.path.join(src, member.name)
+        if member.isfile() and (not os.path.isfile(path) or os.path.getsize(path) != member.size):
+            return False
+    return True
+
+
+def _extract(tar, dest):
+    """安全解包：有 tarfile 解包过滤器时用 'data'，否则逐个检查成员，拒绝落到 dest 之外的路径和链接"""
+    if hasattr(tarfile, 'data_filter'):
+        tar.extractall(dest, filter='data')
+        return
+    root = os.path.realpath(dest)
+
+    def inside(path):
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    for member in tar.getmembers():
+        path = os.path.join(root, member.name)
+        if os.path.isabs(member.name) or not inside(path):
+            raise ValueError(f"{member.name}: archive member escapes {dest}")
+        if member.issym() and (os.path.isabs(member.linkname)
+                               or not inside(os.path.join(os.path.dirname(path), member.linkname))):
+            raise ValueError(f"{member.name}: symlink target {member.linkname} escapes {dest}")
+        if member.islnk() and not inside(os.path.join(root, member.linkname)):
+            raise ValueError(f"{member.name}: hard link target {member.linkname} escapes {dest}")
+        if member.isdev():
+            raise ValueError(f"{member.name}: device files are not allowed in build artifacts")
+    tar.extractall(dest)
+
+
+def checkout(target, base_dir=None, registry=None, key=None, clean=True, relocate=False):
+    """
+    把匹配的构建产物解包到源码目录，返回清单；没有匹配的产物时返回 None。
+    key 为 None 时按当前源码计算；源码目录不存在时（只运行服务器的主机）取该目标最新的产物。
+    """
+    base = base_dir or BASE_DIR
+    registry = registry_dir(base, registry)
+    src = source_dir(target, base)
+    if key is None and os.path.isdir(src):
+        key = content_key(target, base)
+    directory = os.path.join(registry, target)
+    with _locked(directory):
+        if key is not None:
+            manifest = load_manifest(target, key, registry)
+        else:
+            latest = manifests(registry, target)
+            manifest = latest[0] if latest else None
+        if manifest is None:
+            return None
+        if os.path.realpath(manifest['source_dir']) != os.path.realpath(src) and not relocate:
+            raise ValueError(f"{target} build {manifest['key']} was made in {manifest['source_dir']}, "
+                             f"not {src}; .gcno / .gcda paths would not match")
+        marker = os.path.join(src, MARKER)
+        current = None
+        if os.path.isfile(marker):
+            with open(marker) as f:
+                current = json.load(f).get('artifact')
+        with tarfile.open(os.path.join(directory, manifest['artifact'])) as tar:
+            # 已检出且文件完整时不再解包（同一主机上的其他 worker 可能正在运行这些二进制）
+            if current != manifest['artifact'] or not _intact(tar, src):
+                os.makedirs(src, exist_ok=True)
+                _extract(tar, src)
+                _write_json(marker, {'artifact': manifest['artifact'], 'key': manifest['key'],
+                                     'checked_out': time.time()})
+    if clean:
+        clean_gcda(src)
+    return manifest
+
+
+def begin(target, base_dir=None, registry=None):
+    """记录构建开始时的键和时间，store() 据此收集本次构建写入的文件"""
+    base = base_dir or BASE_DIR
+    registry = registry_dir(base, registry)
+    directory = os.path.join(registry, target)
+    os.makedirs(directory, exist_ok=True)
+    key = content_key(target, base)
+    _write_json(os.path.join(directory, PENDING.format(target=target)), {'key': key, 'start': time.time()})
+    return key
+
+
+def store(target, base_dir=None, registry=None):
+    """
+    保存 begin() 之后源码目录中新建 / 修改的文件（.gcda 除外），
+    以构建前和构建后的内容键登记同一份产物。返回清单。
+    """
+    base = base_dir or BASE_DIR
+    registry = registry_dir(base, registry)
+    directory = os.path.join(registry, target)
+    pending_path = os.path.join(directory, PENDING.format(target=target))
+    if not os.path.isfile(pending_path):
+        raise FileNotFoundError(f"No build in progress for {target}; run 'checkout {target}' before building")
+    with open(pending_path) as f:
+        pending = json.load(f)
+    src = source_dir(target, base)
+    # 文件系统时间戳精度有限，留出 1 秒余量
+    since = pending['start'] - 1.0
+    files = []
+    for root, dirs, names in os.walk(src):
+        dirs[:] = [d for d in dirs if d != '.git']
+        for name in names:
+            full = os.path.join(root, name)
+            if name.endswith('.gcda') or name == MARKER or not os.path.isfile(full):
+                continue
+            if os.lstat(full).st_mtime >= since:
+                files.append(os.path.relpath(full, src))
+    if not any(f.endswith('.gcno') for f in files):
+        raise ValueError(f"No .gcno files were produced under {src}; not storing a coverage build")
+
+    key = content_key(target, base)
+    artifact = f"{pending['key']}.tar.gz"
+    with _locked(directory):
+        tmp = os.path.join(directory, artifact + '.tmp')
+        with tarfile.open(tmp, 'w:gz') as tar:
+            for rel in sorted(files):
+                tar.add(os.path.join(src, rel), arcname=rel, recursive=False)
+        os.replace(tmp, os.path.join(directory, artifact))
+        manifest = {
+            'target': target,
+            'artifact': artifact,
+            'source_dir': os.path.abspath(src),
+            'files': len(files),
+            'gcno': sum(1 for f in files if f.endswith('.gcno')),
+            'size': os.path.getsize(os.path.join(directory, artifact)),
+            'build_seconds': round(time.time() - pending['start'], 1),
+            'created': time.time(),
+            'aliases': sorted({pending['key'], key}),
+        }
+        for alias in manifest['aliases']:
+            _write_json(os.path.join(directory, f"{alias}.json"), dict(manifest, key=alias))
+        _write_json(os.path.join(src, MARKER), {'artifact': artifact, 'key': key, 'checked_out': time.time()})
+        os.remove(pending_path)
+    return dict(manifest, key=key)
+
+
+def prune(registry, keep, target=None):
+    """每个目标只保留最新的 keep 份产物，返回删除的产物数"""
+    removed = 0
+    by_artifact = {}
+    for manifest in manifests(registry, target):
+        by_artifact.setdefault((manifest['target'], manifest['artifact']), []).append(manifest)
+    per_target = {}
+    for (name, artifact), group in sorted(by_artifact.items(), key=lambda item: -item[1][0]['created']):
+        per_target[name] = per_target.get(name, 0) + 1
+        if per_target[name] <= keep:
+            continue
+        directory = os.path.join(registry, name)
+        with _locked(directory):
+            for manifest in group:
+                os.remove(os.path.join(directory, f"{manifest['key']}.json"))
+            os.remove(os.path.join(directory, artifact))
+        removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-keyed registry of gcov-instrumented target builds")
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    parser.add_argument('--registry', help='registry directory (default: $COVERAGE_BUILD_REGISTRY or <base-dir>/coverage-builds)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    c = sub.add_parser('checkout', help='restore a matching build (exit 1 and start a pending build on miss)')
+    c.add_argument('target', choices=sorted(BUILDS))
+    c.add_argument('--keep-gcda', action='store_true', help='do not delete existing .gcda files')
+    s = sub.add_parser('store', help='archive the files written since checkout')
+    s.add_argument('target', choices=sorted(BUILDS))
+    k = sub.add_parser('key', help='print the content key of the current sources')
+    k.add_argument('target', choices=sorted(BUILDS))
+    ls = sub.add_parser('list', help='list stored builds')
+    ls.add_argument('target', nargs='?', choices=sorted(BUILDS))
+    p = sub.add_parser('prune', help='delete old builds')
+    p.add_argument('--keep', type=int, default=3, help='builds to keep per target')
+    p.add_argument('target', nargs='?', choices=sorted(BUILDS))
+    args = parser.parse_args()
+
+    registry = registry_dir(args.base_dir, args.registry)
+    try:
+        if args.command == 'checkout':
+            start = time.perf_counter()
+            manifest = checkout(args.target, args.base_dir, registry, clean=not args.keep_gcda)
+            if manifest is None:
+                key = begin(args.target, args.base_dir, registry)
+                print(f"No coverage build for {args.target} ({key}); build and run 'store {args.target}'")
+                return 1
+            print(f"Checked out {args.target} build {manifest['key']} ({manifest['files']} files, "
+                  f"{manifest['gcno']} .gcno, built in {manifest['build_seconds']}s) "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return 0
+        if args.command == 'store':
+            manifest = store(args.target, args.base_dir, registry)
+            print(f"Stored {args.target} build {manifest['artifact']} ({manifest['files']} files, "
+                  f"{manifest['gcno']} .gcno, {manifest['size']} bytes)")
+            return 0
+        if args.command == 'key':
+            print(content_key(args.target, args.base_dir))
+            return 0
+        if args.command == 'prune':
+            print(f"Removed {prune(registry, args.keep, args.target)} builds")
+            return 0
+        seen = set()
+        print(f"{'Target':<20} {'Artifact':<40} {'Files':>7} {'.gcno':>6} {'Size':>10} {'Build(s)':>9}  Created")
+        for manifest in manifests(registry, args.target):
+            if manifest['artifact'] in seen:
+                continue
+            seen.add(manifest['artifact'])
+            created = time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest['created']))
+            print(f"{manifest['target']:<20} {manifest['artifact']:<40} {manifest['files']:>7} "
+                  f"{manifest['gcno']:>6} {manifest['size']:>10} {manifest['build_seconds']:>9}  {created}")
+    except (OSError, KeyError, ValueError, tarfile.TarError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+sanitizer 构建矩阵上的崩溃确认
+replayable-crashes 来自不带 sanitizer 的模糊测试构建，重放时经常无法复现。本工具把每个崩溃
+在 plain（现有覆盖率版服务器）、ASan、UBSan、MSan 构建上各重放 K 次，每次都启动新的服务器进程，
+记录服务器是否崩溃、哪个 sanitizer 报告了什么错误，以及每个构建上的复现率:
+  confirmed        某个构建上的复现率 >= --confirm-rate
+  flaky            复现过，但所有构建上的复现率都低于 --confirm-rate
+  not-reproduced   K 次重放都没有复现
+报告写入 <run>/crash-confirm.json，confirmed 的测试用例复制到 <run>/confirmed-crashes/。
+plain 构建以 GCOV_PREFIX 指向临时目录运行，崩溃重放产生的 .gcda 不会混入之后 coverage-*.sh 的统计。
+
+sanitizer 构建: build 子命令把源码目录（含覆盖率构建打过的补丁）复制到 sanitizer-builds/<sanitizer>/，
+用与 coverage-analysis 脚本相同的构建方式、换成 sanitizer 编译选项重新编译，服务器的相对位置和命令与
+targets.py 相同。MSan 只有 clang 支持，没有 clang 时跳过。
+服务器命令带 {port} 的目标各构建用不同端口并行重放；端口固定的目标（opener）依次重放。
+
+使用方法:
+  python3 tools/crash_confirm.py build libmodbus
+  python3 tools/crash_confirm.py build opener --sanitizers asan ubsan
+  python3 tools/crash_confirm.py confirm libmodbus aflnet 1 -k 5
+  python3 tools/crash_confirm.py confirm libplctag a3 2 --builds plain asan --input /tmp/crashes
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from corpus import iter_testcases
+from coverage_builds import BUILDS, source_dir
+from queue_sync import content_hash
+from replay import replay_testcase
+from replayable import list_testcases
+from supervisor import ServerSupervisor
+from targets import BASE_DIR, FUZZERS, get_target, results_dir
+
+# 编译选项和运行时选项；abort_on_error 让报告后以 SIGABRT 退出，便于与正常退出区分
+SANITIZERS = {
+    'asan': {
+        'flags': '-fsanitize=address -fno-omit-frame-pointer -g -O1',
+        'env': {'ASAN_OPTIONS': 'abort_on_error=1:detect_leaks=0:allocator_may_return_null=1:symbolize=1'},
+        'clang_only': False,
+    },
+    'ubsan': {
+        'flags': '-fsanitize=undefined -fno-sanitize-recover=undefined -fno-omit-frame-pointer -g -O1',
+        'env': {'UBSAN_OPTIONS': 'abort_on_error=1:halt_on_error=1:print_stacktrace=1'},
+        'clang_only': False,
+    },
+    'msan': {
+        'flags': '-fsanitize=memory -fsanitize-memory-track-origins -fno-omit-frame-pointer -g -O1',
+        'env': {'MSAN_OPTIONS': 'abort_on_error=1:halt_on_error=1'},
+        'clang_only': True,
+    },
+}
+BUILD_NAMES = ['plain'] + list(SANITIZERS)
+
+# 在复制出的源码根目录执行；{cc} {cxx} {flags} 替换为编译器和 sanitizer 选项
+# 与 coverage-analysis/coverage-*.sh 的 rebuild_with_coverage 相同的构建方式
+RECIPES = {
+    'libmodbus': 'make clean || true; '
+                 './configure --enable-static CC={cc} CFLAGS="{flags}" LDFLAGS="{flags}" && make -j$(nproc) && '
+                 'cd tests && {cc} {flags} random-test-server.c -I../src ../src/.libs/libmodbus.a -o server-coverage',
+    'libplctag': 'rm -rf build-coverage && cmake -S . -B build-coverage -DCMAKE_C_COMPILER={cc} '
+                 '-DCMAKE_CXX_COMPILER={cxx} -DCMAKE_C_FLAGS="{flags}" -DCMAKE_CXX_FLAGS="{flags}" '
+                 '-DCMAKE_EXE_LINKER_FLAGS="{flags}" -DCMAKE_BUILD_TYPE=Debug -DBUILD_TESTS=1 && '
+                 'make -C build-coverage -j$(nproc)',
+    'iec104': 'cd test && make clean || true; '
+              'make all CC={cc} CFLAGS="-I$(pwd)/../src -I. -Wno-return-type {flags}" LDFLAGS="{flags} -lpthread"',
+    'freyrscada-iec104': 'cd IEC104-Linux-SDK/LinuxSDK/x86_64/project && '
+                         '(make -f iec104servertest.mak clean || true) && '
+                         'make -f iec104servertest.mak CC={cc} CXX={cxx} LD={cxx} '
+                         'CFLAGS_RELEASE="-Wall {flags}" LDFLAGS_RELEASE="{flags}"',
+    'opener': 'rm -rf build-server && cmake -S source -B build-server -DCMAKE_C_COMPILER={cc} '
+              '-DCMAKE_C_FLAGS="{flags}" -DCMAKE_EXE_LINKER_FLAGS="{flags}" -DCMAKE_BUILD_TYPE=Debug '
+              '-DOpENer_PLATFORM:STRING=POSIX && make -C build-server -j$(nproc)',
+    'eipscanner': 'rm -rf build && cmake -S . -B build -DCMAKE_CXX_COMPILER={cxx} -DEXAMPLE_ENABLED=ON '
+                  '-DCMAKE_C_FLAGS="{flags}" -DCMAKE_CXX_FLAGS="{flags}" -DCMAKE_EXE_LINKER_FLAGS="{flags}" '
+                  '-DCMAKE_BUILD_TYPE=Debug && make -C build -j$(nproc) eip_server_harness',
+    'libslmp2': 'rm -rf build-coverage && cmake -S . -B build-coverage -DCMAKE_C_COMPILER={cc} '
+                '-DCMAKE_CXX_COMPILER={cxx} -DCMAKE_C_FLAGS="{flags}" -DCMAKE_CXX_FLAGS="{flags}" '
+                '-DCMAKE_EXE_LINKER_FLAGS="{flags}" -DCMAKE_BUILD_TYPE=Debug && '
+                'make -C build-coverage -j$(nproc) svrskel_afl_coverage',
+}
+
+REPORT_RE = re.compile(r'(?:ERROR|WARNING): (AddressSanitizer|MemorySanitizer|LeakSanitizer): ([\w-]+)')
+UBSAN_RE = re.compile(r'runtime error: ([^\n]{1,80})')
+ADDRESS_RE = re.compile(r'0x[0-9a-f]+')
+COPY_IGNORE = shutil.ignore_patterns('.git', '*.gcda', '*.gcno', '*.o', '*.lo', '.coverage-build.json')
+
+
+def compilers(sanitizer):
+    """返回 (cc, cxx)；MSan 需要 clang，没有时返回 None"""
+    if shutil.which('clang') and shutil.which('clang++'):
+        return 'clang', 'clang++'
+    if SANITIZERS[sanitizer]['clang_only']:
+        return None
+    return 'gcc', 'g++'
+
+
+def build_root(sanitizer, base_dir=None):
+    return os.path.join(base_dir or BASE_DIR, 'sanitizer-builds', sanitizer)
+
+
+def build(target, sanitizer, base_dir=None, log=None):
+    """复制源码并编译一个 sanitizer 构建，返回 (是否成功, 耗时)"""
+    base = base_dir or BASE_DIR
+    pair = compilers(sanitizer)
+    if pair is None:
+        raise RuntimeError(f"{sanitizer} needs clang, which is not installed")
+    src = source_dir(target, base)
+    if not os.path.isdir(src):
+        raise FileNotFoundError(f"Source directory not found: {src}")
+    dest = os.path.join(build_root(sanitizer, base), BUILDS[target]['source'])
+    shutil.rmtree(dest, ignore_errors=True)
+    shutil.copytree(src, dest, symlinks=True, ignore=COPY_IGNORE)
+    cc, cxx = pair
+    command = RECIPES[target].format(cc=cc, cxx=cxx, flags=SANITIZERS[sanitizer]['flags'])
+    start = time.perf_counter()
+    with open(log or os.devnull, 'w') as out:
+        proc = subprocess.run(['bash', '-c', command], cwd=dest, stdout=out, stderr=subprocess.STDOUT)
+    return proc.returncode == 0, time.perf_counter() - start
+
+
+def parse_report(text):
+    """从服务器输出中提取 sanitizer 报告，返回 'AddressSanitizer: heap-buffer-overflow' 形式或 None"""
+    match = REPORT_RE.search(text)
+    if match:
+        return f"{match.group(1)}: {match.group(2)}"
+    match = UBSAN_RE.search(text)
+    if match:
+        # 去掉地址，让同一处未定义行为在多次重放之间归为同一种报告
+        return f"UndefinedBehaviorSanitizer: {ADDRESS_RE.sub('0x...', match.group(1)).strip()}"
+    return None
+
+
+class BuildRunner:
+    """在一个构建上逐次重放崩溃: 每次启动新的服务器进程，重放后检查进程状态和 sanitizer 输出"""
+
+    def __init__(self, target, name, port, base_dir, log_path, timeout=1.0, settle=0.5, ready_timeout=30.0):
+        spec = get_target(target)
+        self.protocol = spec['protocol']
+        self.name = name
+        self.port = port
+        self.timeout = timeout
+        self.settle = settle
+        self.log_path = log_path
+        cmd = spec['server_cmd'].format(port=port)
+        self.gcov_dir = None
+        if name == 'plain':
+            # 覆盖率版服务器在源码树中运行，.gcda 重定向到临时目录，避免崩溃重放混入之后的覆盖率统计
+            self.gcov_dir = tempfile.mkdtemp(prefix='crash-confirm-gcov-')
+            cwd, env = None, {'GCOV_PREFIX': self.gcov_dir, 'GCOV_PREFIX_STRIP': '0'}
+        else:
+            cwd = os.path.join(build_root(name, base_dir), spec['server_cwd'])
+            env = SANITIZERS[name]['env']
+        open(log_path, 'wb').close()
+        self.supervisor = ServerSupervisor(target, port, cmd=cmd, cwd=cwd, base_dir=base_dir,
+                                           ready_timeout=ready_timeout, log_path=log_path, env=env,
+                                           connect_only=name == 'plain')
+
+    def attempt(self, messages):
+        """返回 {'reproduced', 'report', 'signal', 'exit', 'error'}"""
+        offset = os.path.getsize(self.log_path)
+        outcome = {'reproduced': False, 'report': None, 'signal': None, 'exit': None, 'error': None}
+        try:
+            self.supervisor.start()
+        except RuntimeError as e:
+            outcome['error'] = str(e)
+            return outcome
+        proc = self.supervisor.proc
+        try:
+            replay_testcase('127.0.0.1', self.port, self.protocol, messages, self.timeout)
+            # sanitizer 报告和进程退出可能稍晚于最后一条响应
+            try:
+                proc.wait(timeout=self.settle)
+            except subprocess.TimeoutExpired:
+                pass
+            code = proc.poll()
+        finally:
+            self.supervisor.stop()
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            output = f.read().decode(errors='replace')
+        outcome['report'] = parse_report(output)
+        if code is not None:
+            outcome['exit'] = code
+            outcome['signal'] = -code if code < 0 else None
+        # 正常退出不算崩溃（部分服务器在客户端断开后自行退出）
+        outcome['reproduced'] = bool(outcome['report']) or outcome['signal'] is not None
+        return outcome
+
+    def run(self, crashes, k):
+        """crashes: [(名字, 消息列表)]；返回 {名字: 该构建上的结果}"""
+        results = {}
+        try:
+            for name, messages in crashes:
+                attempts = [self.attempt(messages) for _ in range(k)]
+                reports = {}
+                for a in attempts:
+                    if a['report']:
+                        reports[a['report']] = reports.get(a['report'], 0) + 1
+                hits = sum(1 for a in attempts if a['reproduced'])
+                results[name] = {
+                    'attempts': k,
+                    'reproduced': hits,
+                    'rate': hits / k,
+                    'reports': reports,
+                    'signals': sorted({a['signal'] for a in attempts if a['signal']}),
+                    'errors': sorted({a['error'] for a in attempts if a['error']}),
+                }
+        finally:
+            self.supervisor.close()
+            if self.gcov_dir:
+                shutil.rmtree(self.gcov_dir, ignore_errors=True)
+        return results
+
+
+def verdict(per_build, confirm_rate):
+    best = max((r['rate'] for r in per_build.values()), default=0.0)
+    if best >= confirm_rate:
+        return 'confirmed'
+    return 'flaky' if best > 0 else 'not-reproduced'
+
+
+def load_crashes(paths):
+    """按内容去重后的 [(名字, 消息列表, 同内容的其他文件)]；消息复制为 bytes 以便多个构建并行使用"""
+    crashes, seen = [], {}
+    for path, messages in iter_testcases(paths):
+        with open(path, 'rb') as f:
+            digest = content_hash(f.read())
+        if digest in seen:
+            crashes[seen[digest]][2].append(path)
+            continue
+        seen[digest] = len(crashes)
+        crashes.append((path, [bytes(m) for m in messages], []))
+    return crashes
+
+
+def cmd_build(args):
+    failed = 0
+    for sanitizer in args.sanitizers:
+        log = os.path.join(build_root(sanitizer, args.base_dir), f"build-{args.target}.log")
+        os.makedirs(os.path.dirname(log), exist_ok=True)
+        try:
+            ok, elapsed = build(args.target, sanitizer, args.base_dir, log)
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {args.target} {sanitizer}: {e}")
+            failed += 1
+            continue
+        mark = '✓' if ok else '✗'
+        print(f"{mark} {args.target} {sanitizer} build in {elapsed:.1f}s (log: {log})")
+        failed += 0 if ok else 1
+    return 1 if failed else 0
+
+
+def cmd_confirm(args):
+    spec = get_target(args.target)
+    run_dir = results_dir(args.target, args.fuzzer, args.run, args.base_dir)
+    input_dir = args.input or os.path.join(run_dir, 'replayable-crashes')
+    if not os.path.isdir(input_dir):
+        print(f"Error: Input directory {input_dir} does not exist!")
+        return 1
+    builds = []
+    for name in args.builds:
+        if name != 'plain' and not os.path.isdir(os.path.join(build_root(name, args.base_dir), spec['server_cwd'])):
+            print(f"  skipping {name}: no build (run 'crash_confirm.py build {args.target}')")
+            continue
+        builds.append(name)
+    if not builds:
+        print("Error: no builds to replay against")
+        return 1
+    crashes = load_crashes(list_testcases(input_dir))
+    print(f"{len(crashes)} unique crashes in {input_dir}, {args.k} replays each on: {', '.join(builds)}")
+
+    # 命令带 {port} 的目标每个构建一个端口并行；端口固定时依次运行
+    parallel = '{port}' in spec['server_cmd']
+    log_dir = os.path.join(run_dir, 'crash-confirm-logs')
+    os.makedirs(log_dir, exist_ok=True)
+    runners = [BuildRunner(args.target, name, spec['port'] + (i * args.port_stride if parallel else 0),
+                           args.base_dir, os.path.join(log_dir, f"{name}.log"), args.timeout, args.settle)
+               for i, name in enumerate(builds)]
+    pairs = [(path, messages) for path, messages, _ in crashes]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(runners) if parallel else 1) as pool:
+        outcomes = dict(zip(builds, pool.map(lambda r: r.run(pairs, args.k), runners)))
+
+    report = {'target': args.target, 'fuzzer': args.fuzzer, 'run': args.run, 'k': args.k,
+              'confirm_rate': args.confirm_rate, 'builds': builds, 'crashes': []}
+    counts = {'confirmed': 0, 'flaky': 0, 'not-reproduced': 0}
+    confirmed_dir = os.path.join(run_dir, 'confirmed-crashes')
+    for path, _, duplicates in crashes:
+        per_build = {name: outcomes[name][path] for name in builds}
+        result = verdict(per_build, args.confirm_rate)
+        counts[result] += 1
+        sanitizers = sorted({r for b in per_build.values() for r in b['reports']})
+        report['crashes'].append({'testcase': path, 'duplicates': duplicates, 'verdict': result,
+                                  'sanitizers': sanitizers, 'builds': per_build})
+        rates = '  '.join(f"{name}={per_build[name]['reproduced']}/{args.k}" for name in builds)
+        print(f"  {result:<15} {os.path.basename(path)[:48]:<48} {rates}  {'; '.join(sanitizers)}")
+        if result == 'confirmed':
+            os.makedirs(confirmed_dir, exist_ok=True)
+            shutil.copy2(path, confirmed_dir)
+
+    report_path = args.report or os.path.join(run_dir, 'crash-confirm.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("========================================")
+    print(f"Confirmed:      {counts['confirmed']}" + (f" (copied to {confirmed_dir})" if counts['confirmed'] else ''))
+    print(f"Flaky:          {counts['flaky']}")
+    print(f"Not reproduced: {counts['not-reproduced']}")
+    print(f"Elapsed:        {time.perf_counter() - start:.1f}s")
+    print(f"Report:         {report_path}")
+    print("========================================")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confirm crashes by replaying them on sanitizer builds")
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build', help='build sanitizer variants of a target')
+    b.add_argument('target', choices=sorted(RECIPES))
+    b.add_argument('--sanitizers', nargs='+', choices=list(SANITIZERS), default=list(SANITIZERS))
+    c = sub.add_parser('confirm', help='replay every crash K times on each build')
+    c.add_argument('target', choices=sorted(RECIPES))
+    c.add_argument('fuzzer', choices=FUZZERS)
+    c.add_argument('run')
+    c.add_argument('--input', help='crash directory (default: results/<target>-<fuzzer>-<run>/replayable-crashes)')
+    c.add_argument('--builds', nargs='+', choices=BUILD_NAMES, default=BUILD_NAMES)
+    c.add_argument('-k', type=int, default=5, help='replays per crash and build')
+    c.add_argument('--confirm-rate', type=float, default=0.8,
+                   help='reproduction rate on some build needed to confirm a crash')
+    c.add_argument('--timeout', type=float, default=1.0, help='per-message response timeout (s)')
+    c.add_argument('--settle', type=float, default=0.5, help='seconds to wait for the server to die after replay')
+    c.add_argument('--port-stride', type=int, default=10, help='port offset between parallel builds')
+    c.add_argument('--report', help='JSON report path (default: <run>/crash-confirm.json)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        return cmd_build(args)
+    return cmd_confirm(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
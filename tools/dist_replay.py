@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+多主机分布式重放 / 覆盖率收集
+coordinator 把 (target, fuzzer, run, shard) 作业放入 broker 的工作队列，各主机上的 worker 领取作业:
+  启动覆盖率版服务器（supervisor.py），重放该 shard 的测试用例，返回紧凑的结果给 coordinator 合并。
+
+作业模式:
+  gcda    服务器以 GCOV_PREFIX 指向私有目录运行，停止后把 .gcda 打包（tar.gz）返回；
+          coordinator 保存每个 shard 的归档，安装了 gcov-tool 时把同一 run 的所有 shard 合并
+  bitmap  worker 对每个测试用例运行 afl-showmap（--showmap 模板，{out} / @@ 与 queue_sync.py 相同），
+          返回 zlib 压缩的 64 KiB 分桶位图，coordinator 按位或合并为 <run>.map
+  replay  只重放并返回各状态的消息数（不需要覆盖率构建，用于测试分发本身）
+每个 gcda shard 结束后用 gcda_health.py 检查 .gcda（缺失、时间戳与 .gcno 不符、全零、服务器未响应 SIGTERM），
+不健康的 shard 作为失败结果返回并单独重试（--retries）。
+gcda 作业开始前 worker 从 coverage_builds.py 的仓库（COVERAGE_BUILD_REGISTRY，可放在共享存储上）检出覆盖率构建。
+
+broker 是 multiprocessing.managers 提供的 TCP 服务（authkey 认证），作业有租约，
+worker 崩溃或失联时租约到期后作业重新入队。所有路径都相对各自主机的 --base-dir（LLM_FUZZ_BASE_DIR），
+worker 本地没有结果目录时可用 --ship 由 coordinator 把 shard 的测试用例随作业发送。
+同一主机上运行多个 worker 时，服务器命令带 {port} 的目标用 --port-offset 错开端口；
+端口固定的目标（OpENer 固定监听 44818）由每个端口一个的文件锁（flock）在本机串行执行。
+broker 默认只监听 127.0.0.1；监听其他地址时必须显式指定 --authkey / DIST_REPLAY_AUTHKEY
+（multiprocessing 的 manager 会反序列化客户端数据）。单机模式为本地 broker 随机生成 authkey。
+
+使用方法:
+  # 单机: 内置 broker + 4 个本地 worker
+  python3 tools/dist_replay.py run --targets libmodbus iec104 --shards 8 --local-workers 4
+  # 多主机: 独立 broker，coordinator 提交并等待，各主机启动 worker
+  python3 tools/dist_replay.py --authkey secret broker --listen 0.0.0.0:50000
+  python3 tools/dist_replay.py --authkey secret run --broker 10.0.0.1:50000 --shards 16 --out coverage-shards
+  python3 tools/dist_replay.py --authkey secret --base-dir /data/LLM_fuzz_experiment worker --broker 10.0.0.1:50000
+"""
+
+import argparse
+import fcntl
+import io
+import ipaddress
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+
+from corpus import iter_testcases
+from coverage_builds import BUILDS, checkout, source_dir
+from gcda_health import check as check_gcda, summary as gcda_summary
+from queue_sync import MAP_SIZE, CoverageOracle
+from replay import replay_testcase
+from replayable import find_queue_dir, list_testcases
+from supervisor import ServerSupervisor
+from targets import BASE_DIR, FUZZERS, TARGETS, get_target, results_dir
+
+MODES = ('gcda', 'bitmap', 'replay')
+DEFAULT_PORT = 50000
+DEFAULT_AUTHKEY = 'llm-fuzz'   # 只允许用于回环地址上的 broker
+POLL_INTERVAL = 1.0
+
+
+class Broker:
+    """内存中的工作队列: 待领取作业、带租约的进行中作业、已完成结果"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.leased = {}      # job id -> (作业, worker, 租约到期时间)
+        self.finished = deque()
+        self.closed = False
+
+    def submit(self, jobs):
+        with self.lock:
+            self.pending.extend(jobs)
+        return len(jobs)
+
+    def claim(self, worker):
+        """领取一个作业；没有作业返回 None，coordinator 已结束返回 'stop'"""
+        with self.lock:
+            now = time.time()
+            for job_id, (job, owner, expires) in list(self.leased.items()):
+                if expires < now:
+                    del self.leased[job_id]
+                    self.pending.appendleft(job)
+            if self.closed:
+                return 'stop'
+            if not self.pending:
+                return None
+            job = self.pending.popleft()
+            self.leased[job['id']] = (job, worker, now + job['lease'])
+            return job
+
+    def complete(self, job_id, result):
+        with self.lock:
+            # 租约过期后重新入队的副本不再需要；重复的结果由 coordinator 丢弃
+            self.leased.pop(job_id, None)
+            self.pending = deque(p for p in self.pending if p['id'] != job_id)
+            self.finished.append(result)
+
+    def collect(self):
+        with self.lock:
+            results = list(self.finished)
+            self.finished.clear()
+            return results
+
+    def status(self):
+        with self.lock:
+            return {'pending': len(self.pending), 'leased': len(self.leased), 'finished': len(self.finished)}
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+
+
+_BROKER = None
+
+
+def _get_broker():
+    global _BROKER
+    if _BROKER is None:
+        _BROKER = Broker()
+    return _BROKER
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+BrokerManager.register('broker', callable=_get_broker)
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port or DEFAULT_PORT)
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def connect_broker(address, authkey):
+    manager = BrokerManager(address=address, authkey=authkey.encode())
+    manager.connect()
+    return manager.broker()
+
+
+# ---------------------------------------------------------------------------
+# worker
+# ---------------------------------------------------------------------------
+
+def shard_testcases(job, base_dir, scratch):
+    """本地结果目录中该 shard 的测试用例路径；--ship 的作业先把内容写入 scratch"""
+    if job.get('files') is not None:
+        paths = []
+        for name, data in job['files']:
+            path = os.path.join(scratch, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        return paths
+    queue = find_queue_dir(results_dir(job['target'], job['fuzzer'], job['run'], base_dir))
+    if not os.path.isdir(queue):
+        raise RuntimeError(f"{queue} does not exist on {socket.gethostname()}")
+    return list_testcases(queue)[job['shard']::job['shards']]
+
+
+def _port(target, offset):
+    spec = get_target(target)
+    return spec['port'] + offset if '{port}' in spec['server_cmd'] else spec['port']
+
+
+@contextmanager
+def _port_lock(port):
+    """同一主机上使用同一端口的服务器串行运行（端口固定的目标无法用 --port-offset 错开）"""
+    with open(os.path.join(tempfile.gettempdir(), f'dist-replay-port-{port}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def run_job(job, base_dir, port_offset=0, timeout=1.0):
+    """执行一个作业，返回结果字典（失败时包含 error）"""
+    start = time.perf_counter()
+    result = {'id': job['id'], 'job': {k: job[k] for k in ('target', 'fuzzer', 'run', 'shard', 'shards', 'mode')},
+              'worker': f"{socket.gethostname()}:{os.getpid()}", 'testcases': 0, 'error': None}
+    scratch = tempfile.mkdtemp(prefix='dist-replay-')
+    try:
+        testcases = shard_testcases(job, base_dir, scratch)
+        result['testcases'] = len(testcases)
+        if job['mode'] == 'bitmap':
+            oracle = CoverageOracle(job['showmap'])
+            for path in testcases:
+                for edge, bucket in oracle.edges(path):
+                    oracle.virgin[edge] |= bucket
+            result['bitmap'] = zlib.compress(bytes(oracle.virgin))
+        else:
+            spec = get_target(job['target'])
+            port = _port(job['target'], port_offset)
+            gcov_dir = os.path.join(scratch, 'gcov')
+            # replay 模式同样写入私有目录，覆盖率版服务器的 .gcda 不落到源码树；就绪判定只连接不握手
+            env = {'GCOV_PREFIX': gcov_dir, 'GCOV_PREFIX_STRIP': '0'}
+            supervisor = ServerSupervisor(job['target'], port, base_dir=base_dir, env=env, connect_only=True)
+            statuses = {}
+            since = time.time()
+            with _port_lock(port):
+                supervisor.start()
+                try:
+                    for _, messages in iter_testcases(testcases):
+                        supervisor.ensure_running()
+                        replayed = replay_testcase('127.0.0.1', port, spec['protocol'], messages, timeout)
+                        for m in replayed['messages']:
+                            statuses[m['status']] = statuses.get(m['status'], 0) + 1
+                finally:
+                    _, killed = supervisor.stop()
+                    supervisor.close()
+            result['statuses'] = statuses
+            result['restarts'] = supervisor.restarts
+            if job['mode'] == 'gcda':
+                # 每个 shard 结束后检查 .gcda，没有写出 / 时间戳不符 / 全零时作为错误返回，由 coordinator 只重试这个 shard
+                gcno_root = source_dir(job['target'], base_dir) if job['target'] in BUILDS else None
+                report = check_gcda(gcov_dir, gcno_root, gcov_dir, since)
+                if killed:
+                    report['problems'].append('server ignored SIGTERM, its last .gcda flush was lost')
+                result['health'] = gcda_summary(report)
+                buf = io.BytesIO()
+                with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+                    if os.path.isdir(gcov_dir):
+                        tar.add(gcov_dir, arcname='.')
+                result['gcda'] = buf.getvalue()
+                if report['problems']:
+                    result['error'] = f"gcda health: {'; '.join(report['problems'])}"
+    except Exception as e:  # 任何失败都作为结果返回，由 coordinator 决定是否重试
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def prepare_build(target, base_dir):
+    """gcda 作业前从 coverage_builds 仓库检出覆盖率构建；仓库中没有时沿用本机现有构建"""
+    if target not in BUILDS:
+        return
+    try:
+        # 服务器以 GCOV_PREFIX 运行，构建目录与本机源码目录不同也可以使用
+        manifest = checkout(target, base_dir, clean=False, relocate=True)
+    except (OSError, ValueError) as e:
+        print(f"Error: coverage build checkout for {target} failed: {e}")
+        return
+    if manifest:
+        print(f"Using {target} coverage build {manifest['artifact']}")
+
+
+def worker_loop(broker, base_dir, port_offset=0, timeout=1.0, exit_when_idle=False):
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    prepared = set()
+    while True:
+        job = broker.claim(name)
+        if job == 'stop':
+            break
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        if job['mode'] == 'gcda' and job['target'] not in prepared:
+            prepare_build(job['target'], base_dir)
+            prepared.add(job['target'])
+        broker.complete(job['id'], run_job(job, base_dir, port_offset, timeout))
+        done += 1
+    return done
+
+
+# ---------------------------------------------------------------------------
+# coordinator
+# ---------------------------------------------------------------------------
+
+def build_jobs(args):
+    jobs = []
+    for target in args.targets:
+        for fuzzer in args.fuzzers:
+            for run in args.runs:
+                queue = find_queue_dir(results_dir(target, fuzzer, run, args.base_dir))
+                names = list_testcases(queue) if args.ship and os.path.isdir(queue) else None
+                if args.ship and not names:
+                    continue
+                for shard in range(args.shards):
+                    job = {'id': uuid.uuid4().hex, 'target': target, 'fuzzer': fuzzer, 'run': run,
+                           'shard': shard, 'shards': args.shards, 'mode': args.mode, 'lease': args.lease,
+                           'showmap': args.showmap, 'attempt': 1, 'files': None}
+                    if names is not None:
+                        job['files'] = []
+                        for path in names[shard::args.shards]:
+                            with open(path, 'rb') as f:
+                                job['files'].append((os.path.basename(path), f.read()))
+                    jobs.append(job)
+    return jobs
+
+
+def merge_gcda(run_dir):
+    """用 gcov-tool 把 run_dir/shard-*.tar.gz 逐个合并到 run_dir/gcda"""
+    shards = sorted(n for n in os.listdir(run_dir) if n.startswith('shard-') and n.endswith('.tar.gz'))
+    merged = os.path.join(run_dir, 'gcda')
+    shutil.rmtree(merged, ignore_errors=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, name in enumerate(shards):
+            extract = os.path.join(tmp, str(i))
+            os.makedirs(extract)
+            with tarfile.open(os.path.join(run_dir, name)) as tar:
+                tar.extractall(extract, filter='data')
+            if not any(files for _, _, files in os.walk(extract)):
+                continue
+            if not os.path.exists(merged):
+                shutil.copytree(extract, merged)
+                continue
+            subprocess.run(['gcov-tool', 'merge', '-o', merged, merged, extract], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return merged
+
+
+def store_result(out, result, bitmaps):
+    job = result['job']
+    run_name = f"{job['target']}-{job['fuzzer']}-{job['run']}"
+    if 'gcda' in result:
+        run_dir = os.path.join(out, run_name)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, f"shard-{job['shard']:03d}.tar.gz"), 'wb') as f:
+            f.write(result['gcda'])
+    if 'bitmap' in result:
+        shard = zlib.decompress(result['bitmap'])
+        merged = bitmaps.setdefault(run_name, bytearray(MAP_SIZE))
+        for edge, bucket in enumerate(shard):
+            if bucket:
+                merged[edge] |= bucket
+
+
+def coordinate(broker, jobs, args, local_workers=()):
+    """提交作业并等待全部完成（失败的作业最多重试 --retries 次），返回失败数"""
+    out = args.out or os.path.join(args.base_dir, 'benchmarks', 'dist-replay')
+    os.makedirs(out, exist_ok=True)
+    by_id = {job['id']: job for job in jobs}
+    broker.submit(jobs)
+    remaining = set(by_id)
+    bitmaps, runs = {}, set()
+    failed = 0
+    start = time.time()
+    while remaining:
+        results = broker.collect()
+        if not results:
+            if local_workers and all(proc.poll() is not None for proc in local_workers):
+                print(f"Error: all local workers exited with {len(remaining)} jobs unfinished")
+                failed += len(remaining)
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        for result in results:
+            if result['id'] not in remaining:
+                continue
+            job = by_id[result['id']]
+            run_name = f"{job['target']}-{job['fuzzer']}-{job['run']}"
+            label = f"{run_name} shard {job['shard'] + 1}/{job['shards']}"
+            if result['error']:
+                if job['attempt'] <= args.retries:
+                    job['attempt'] += 1
+                    print(f"  retry {label} ({result['worker']}: {result['error']})")
+                    broker.submit([job])
+                    continue
+                failed += 1
+                print(f"✗ {label} on {result['worker']}: {result['error']}")
+                if 'gcda' in result:
+                    # 重试用尽仍不健康: 保留最后一次的 .gcda，部分覆盖率好过没有
+                    store_result(out, result, bitmaps)
+                    print(f"  kept unhealthy .gcda for {label} ({result['health']})")
+            else:
+                store_result(out, result, bitmaps)
+                statuses = ' '.join(f"{k}={v}" for k, v in sorted(result.get('statuses', {}).items()))
+                print(f"✓ [{len(by_id) - len(remaining) + 1}/{len(by_id)}] {label} on {result['worker']}: "
+                      f"{result['testcases']} testcases in {result['elapsed']:.1f}s {statuses}")
+                if 'health' in result:
+                    print(f"  gcda: {result['health']}")
+            remaining.discard(result['id'])
+            runs.add(run_name)
+
+    for run_name, bitmap in bitmaps.items():
+        with open(os.path.join(out, f"{run_name}.map"), 'wb') as f:
+            f.write(bitmap)
+        print(f"  {run_name}: {sum(1 for b in bitmap if b)} edges -> {run_name}.map")
+    if args.mode == 'gcda':
+        if shutil.which('gcov-tool') is None:
+            print("  gcov-tool not found: per-shard .gcda archives kept unmerged")
+        else:
+            for run_name in sorted(runs):
+                run_dir = os.path.join(out, run_name)
+                if os.path.isdir(run_dir):
+                    try:
+                        print(f"  {run_name}: merged -> {merge_gcda(run_dir)}")
+                    except (OSError, subprocess.CalledProcessError, tarfile.TarError) as e:
+                        print(f"  {run_name}: merge failed: {e}")
+    print(f"{len(by_id)} jobs, {failed} failed, {time.time() - start:.1f}s -> {out}")
+    return failed
+
+
+def cmd_run(args):
+    args.targets = args.targets or sorted(TARGETS)
+    args.fuzzers = args.fuzzers or FUZZERS
+    if args.mode == 'bitmap' and not args.showmap:
+        print("Error: --mode bitmap requires --showmap")
+        return 1
+    jobs = build_jobs(args)
+    if not jobs:
+        print("Error: no jobs (check --targets / --fuzzers / --runs)")
+        return 1
+    print(f"{len(jobs)} jobs ({args.mode}, {args.shards} shards per run)")
+
+    manager, workers = None, []
+    if args.broker:
+        broker = connect_broker(parse_address(args.broker), args.authkey or DEFAULT_AUTHKEY)
+    else:
+        # 单机替身: 在子进程中启动 broker，再启动本地 worker；未指定 --authkey 时随机生成，经环境变量传给 worker
+        authkey = args.authkey or secrets.token_hex(16)
+        manager = BrokerManager(address=('127.0.0.1', 0), authkey=authkey.encode())
+        manager.start()
+        broker = manager.broker()
+        host, port = manager.address
+        for i in range(args.local_workers):
+            workers.append(subprocess.Popen([
+                sys.executable, os.path.abspath(__file__), '--base-dir', args.base_dir,
+                'worker', '--broker', f"{host}:{port}", '--timeout', str(args.timeout),
+                '--port-offset', str(i * args.port_stride)], env=dict(os.environ, DIST_REPLAY_AUTHKEY=authkey)))
+    try:
+        failed = coordinate(broker, jobs, args, workers)
+    except KeyboardInterrupt:
+        failed = 1
+    finally:
+        if manager:
+            broker.close()
+            for proc in workers:
+                proc.wait()
+            manager.shutdown()
+    return 1 if failed else 0
+
+
+def cmd_worker(args):
+    broker = connect_broker(parse_address(args.broker), args.authkey or DEFAULT_AUTHKEY)
+    try:
+        done = worker_loop(broker, args.base_dir, args.port_offset, args.timeout, args.exit_when_idle)
+    except (EOFError, ConnectionError):
+        print("Broker connection closed")
+        return 0
+    print(f"Worker {socket.gethostname()}:{os.getpid()} finished {done} jobs")
+    return 0
+
+
+def cmd_broker(args):
+    address = parse_address(args.listen)
+    if not args.authkey and not is_loopback(address[0]):
+        print(f"Error: listening on {address[0]} requires --authkey (or DIST_REPLAY_AUTHKEY)")
+        return 1
+    manager = BrokerManager(address=address, authkey=(args.authkey or DEFAULT_AUTHKEY).encode())
+    server = manager.get_server()
+    print(f"Broker listening on {args.listen}")
+    server.serve_forever()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribute replay / coverage jobs over several hosts")
+    parser.add_argument('--authkey', default=os.environ.get('DIST_REPLAY_AUTHKEY'),
+                        help='shared broker secret (required when the broker listens on a non-loopback address)')
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='coordinator: submit jobs and merge results')
+    run.add_argument('--targets', nargs='+', choices=sorted(TARGETS))
+    run.add_argument('--fuzzers', nargs='+')
+    run.add_argument('--runs', nargs='+', default=['1'])
+    run.add_argument('--shards', type=int, default=4)
+    run.add_argument('--mode', choices=MODES, default='gcda')
+    run.add_argument('--showmap', help='afl-showmap command template for --mode bitmap')
+    run.add_argument('--broker', help='host:port of a running broker (default: start a local one)')
+    run.add_argument('--local-workers', type=int, default=os.cpu_count() or 1,
+                     help='fixed-port targets (e.g. opener) still run one server at a time per host')
+    run.add_argument('--port-stride', type=int, default=10, help='port offset between local workers')
+    run.add_argument('--ship', action='store_true', help='send testcase contents with each job')
+    run.add_argument('--lease', type=float, default=3600.0, help='seconds before an unfinished job is requeued')
+    run.add_argument('--retries', type=int, default=1)
+    run.add_argument('--timeout', type=float, default=1.0, help='per-message response timeout (s)')
+    run.add_argument('--out', help='output directory (default: <base-dir>/benchmarks/dist-replay)')
+
+    worker = sub.add_parser('worker', help='pull and execute jobs')
+    worker.add_argument('--broker', required=True)
+    worker.add_argument('--port-offset', type=int, default=0, help='added to the port of {port} targets')
+    worker.add_argument('--timeout', type=float, default=1.0)
+    worker.add_argument('--exit-when-idle', action='store_true')
+
+    broker = sub.add_parser('broker', help='standalone broker for multi-host runs')
+    broker.add_argument('--listen', default=f"127.0.0.1:{DEFAULT_PORT}")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        return cmd_run(args)
+    if args.command == 'worker':
+        return cmd_worker(args)
+    return cmd_broker(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
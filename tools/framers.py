@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+按协议长度字段切分消息的分帧器
+协议名与 aflnet-replay / afl-fuzz -P 参数一致:
+  MODBUS      MBAP 头，字节 4-5 为大端长度，总长 = 6 + 长度
+  ETHERNETIP  24 字节封装头，字节 2-3 为小端数据长度，总长 = 24 + 长度
+  IEC104      0x68 起始字节，字节 1 为 APDU 长度，总长 = 2 + 长度
+  SLMPB       二进制 3E 帧，字节 7-8 为小端数据长度，总长 = 9 + 长度
+  SLMPA       ASCII 帧（二进制帧的十六进制文本），字符 14-17 为长度，总长 = 2 * (9 + 长度)
+"""
+
+
+def _modbus(buf):
+    if len(buf) < 6:
+        return None
+    return 6 + ((buf[4] << 8) | buf[5])
+
+
+def _ethernetip(buf):
+    if len(buf) < 4:
+        return None
+    return 24 + (buf[2] | (buf[3] << 8))
+
+
+def _iec104(buf):
+    if len(buf) < 2:
+        return None
+    if buf[0] != 0x68:
+        return -1
+    return 2 + buf[1]
+
+
+def _slmp_binary(buf):
+    if len(buf) < 9:
+        return None
+    return 9 + (buf[7] | (buf[8] << 8))
+
+
+def _slmp_ascii(buf):
+    if len(buf) < 18:
+        return None
+    try:
+        lo = int(bytes(buf[14:16]), 16)
+        hi = int(bytes(buf[16:18]), 16)
+    except ValueError:
+        return -1
+    return 2 * (9 + (lo | (hi << 8)))
+
+
+FRAMERS = {
+    'MODBUS': _modbus,
+    'ETHERNETIP': _ethernetip,
+    'IEC104': _iec104,
+    'SLMPB': _slmp_binary,
+    'SLMPA': _slmp_ascii,
+}
+
+
+def frame_length(protocol, buf):
+    """
+    返回 buf 开头这条消息的完整长度；
+    头部还不够长时返回 None，头部不合法时返回 -1
+    """
+    return FRAMERS[protocol](buf)
+
+
+def is_complete(protocol, buf):
+    """buf 是否已包含至少一条完整消息"""
+    length = frame_length(protocol, buf)
+    return length is not None and (length < 0 or len(buf) >= length)
+
+
+def split_messages(protocol, data):
+    """
+    把字节流切分为消息列表，返回 (消息列表, 剩余未成帧的字节)
+    遇到不合法的头部时，把剩余数据作为一条消息返回，避免丢数据
+    """
+    framer = FRAMERS[protocol]
+    view = memoryview(data)
+    messages = []
+    offset = 0
+    total = len(data)
+    while offset < total:
+        length = framer(view[offset:])
+        if length is None:
+            break
+        if length <= 0:
+            messages.append(view[offset:])
+            offset = total
+            break
+        if offset + length > total:
+            break
+        messages.append(view[offset:offset + length])
+        offset += length
+    return messages, view[offset:]
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+.gcda 健康检查
+服务器被 SIGKILL 或崩溃时不会写出 .gcda，换了构建后旧 .gcda 仍留在目录里，gcovr 照样出报告，
+覆盖率却是空的或错的（diagnose-gcda.sh / test-libplctag-coverage-fix.sh 就是为排查这些问题写的）。
+本工具直接读取 gcov 文件头和计数器记录:
+  missing   没有任何 .gcda（服务器没有正常退出 / 没有 flush）
+  corrupt   魔数错误或记录被截断
+  stamp     .gcda 与对应 .gcno 的时间戳不一致（.gcda 来自另一次构建）
+  stale     .gcda 修改时间早于本次重放开始（本次没有写出）
+  zero      计数器全为 0 的对象文件；所有 .gcda 都为 0 时判为不健康
+  orphan    找不到对应 .gcno，无法核对时间戳（只提示）
+dist_replay.py 的 gcda 作业在每个 shard 结束后检查，不健康的 shard 单独重试。
+
+使用方法:
+  python3 tools/gcda_health.py --target libplctag                    # 检查源码目录中的 .gcda
+  python3 tools/gcda_health.py /tmp/gcov --prefix /tmp/gcov --gcno libplctag/build-coverage
+  python3 tools/gcda_health.py --target opener --since 1760000000 --json
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+
+from coverage_builds import BUILDS, source_dir
+
+GCDA_MAGIC = 0x67636461
+GCNO_MAGIC = 0x67636e6f
+TAG_FUNCTION = 0x01000000
+TAG_ARC_COUNTERS = 0x01a10000
+TAG_OBJECT_SUMMARY = 0xa1000000
+WORD = struct.Struct('<I')
+HEADER = struct.Struct('<III')
+
+
+def gcc_version(version):
+    """版本字 'B22*' 形式（A=0x, B=1x）: 返回 (major, minor)"""
+    text = WORD.pack(version)[::-1]
+    return (text[0] - ord('A')) * 10 + text[1] - ord('0'), text[2] - ord('0')
+
+
+def read_header(path):
+    """返回 (magic, version, stamp)"""
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: truncated header")
+    return HEADER.unpack(data)
+
+
+def gcda_counters(path):
+    """
+    解析 .gcda 记录，返回 {'runs', 'functions', 'counters', 'nonzero'}。
+    GCC 12 起头部多一个校验字、记录长度以字节计，且全零计数器以负长度省略数据。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: truncated header")
+    magic, version, _ = HEADER.unpack_from(data)
+    if magic != GCDA_MAGIC:
+        raise ValueError(f"{path}: bad magic {magic:#x}")
+    major, _ = gcc_version(version)
+    offset = HEADER.size + (4 if major >= 12 else 0)
+    stats = {'runs': 0, 'functions': 0, 'counters': 0, 'nonzero': 0}
+    while offset + 8 <= len(data):
+        tag, length = struct.unpack_from('<Ii', data, offset)
+        offset += 8
+        if tag == 0:
+            break
+        if major < 12:
+            length *= 4
+        if tag == TAG_ARC_COUNTERS:
+            if length < 0:
+                stats['counters'] += -length // 8
+                continue
+            if offset + length > len(data):
+                raise ValueError(f"{path}: truncated counter record")
+            values = struct.unpack_from(f'<{length // 8}q', data, offset)
+            stats['counters'] += len(values)
+            stats['nonzero'] += sum(1 for v in values if v)
+        elif tag == TAG_FUNCTION:
+            stats['functions'] += 1
+        elif tag == TAG_OBJECT_SUMMARY and length >= 4:
+            stats['runs'] = WORD.unpack_from(data, offset)[0]
+        if length < 0 or offset + length > len(data):
+            raise ValueError(f"{path}: truncated record")
+        offset += length
+    return stats
+
+
+def _find_files(root, suffix):
+    found = []
+    for dirpath, _, names in os.walk(root):
+        found.extend(os.path.join(dirpath, n) for n in names if n.endswith(suffix))
+    return sorted(found)
+
+
+def _gcno_index(gcno_root):
+    """按绝对路径和文件名索引 .gcno（检出到其他目录的构建只能按文件名对应）"""
+    by_path, by_name = {}, {}
+    for path in _find_files(gcno_root, '.gcno') if gcno_root and os.path.isdir(gcno_root) else []:
+        by_path[os.path.abspath(path)] = path
+        by_name.setdefault(os.path.basename(path), []).append(path)
+    return by_path, by_name
+
+
+def check(gcda_root, gcno_root=None, prefix='', since=None):
+    """
+    检查 gcda_root 下的 .gcda。prefix 是 GCOV_PREFIX（去掉后得到编译时的对象路径），
+    gcno_root 是构建目录（核对时间戳），since 是重放开始时间。返回报告字典，healthy 为总体结论。
+    """
+    report = {'gcda': 0, 'gcno': 0, 'counters': 0, 'nonzero': 0, 'runs': 0,
+              'zero': [], 'stale': [], 'stamp': [], 'orphan': [], 'corrupt': [], 'problems': []}
+    by_path, by_name = _gcno_index(gcno_root)
+    report['gcno'] = len(by_path)
+    files = _find_files(gcda_root, '.gcda') if os.path.isdir(gcda_root) else []
+    report['gcda'] = len(files)
+    for path in files:
+        rel = os.path.relpath(path, gcda_root)
+        try:
+            stats = gcda_counters(path)
+            _, _, stamp = read_header(path)
+        except (OSError, ValueError, struct.error) as e:
+            report['corrupt'].append(f"{rel}: {e}")
+            continue
+        report['counters'] += stats['counters']
+        report['nonzero'] += stats['nonzero']
+        report['runs'] = max(report['runs'], stats['runs'])
+        if not stats['nonzero']:
+            report['zero'].append(rel)
+        if since is not None and os.path.getmtime(path) < since:
+            report['stale'].append(rel)
+
+        obj = path[len(prefix):] if prefix and path.startswith(prefix) else path
+        gcno = by_path.get(os.path.abspath(obj[:-5] + '.gcno'))
+        if gcno is None:
+            candidates = by_name.get(os.path.basename(obj)[:-5] + '.gcno', [])
+            gcno = candidates[0] if len(candidates) == 1 else None
+        if gcno is None:
+            if by_path:
+                report['orphan'].append(rel)
+            continue
+        try:
+            magic, _, gcno_stamp = read_header(gcno)
+        except (OSError, ValueError) as e:
+            report['corrupt'].append(f"{gcno}: {e}")
+            continue
+        if magic != GCNO_MAGIC:
+            report['corrupt'].append(f"{gcno}: bad magic {magic:#x}")
+        elif gcno_stamp != stamp:
+            report['stamp'].append(rel)
+
+    problems = report['problems']
+    if not files:
+        problems.append('no .gcda files were written')
+    if report['corrupt']:
+        problems.append(f"{len(report['corrupt'])} corrupt files")
+    if report['stamp']:
+        problems.append(f"{len(report['stamp'])} .gcda stamps do not match their .gcno")
+    if files and len(report['stale']) == len(files):
+        problems.append('every .gcda predates the replay')
+    if files and not report['nonzero']:
+        problems.append('every counter is zero')
+    report['healthy'] = not problems
+    return report
+
+
+def summary(report):
+    return (f"{report['gcda']} gcda, {report['nonzero']}/{report['counters']} counters hit, "
+            f"{len(report['zero'])} zero, {len(report['stale'])} stale, {len(report['stamp'])} stamp mismatch, "
+            f"{len(report['orphan'])} orphan, {len(report['corrupt'])} corrupt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check .gcda files for missing, stale, zero-count or mismatched data")
+    parser.add_argument('gcda_dir', nargs='?', help='directory holding .gcda files (default: the target source dir)')
+    parser.add_argument('--target', choices=sorted(BUILDS), help='use the target source dir for .gcda / .gcno')
+    parser.add_argument('--base-dir', help='base directory for --target')
+    parser.add_argument('--gcno', help='build directory holding .gcno files')
+    parser.add_argument('--prefix', default='', help='GCOV_PREFIX the .gcda files were written under')
+    parser.add_argument('--since', type=float, help='replay start time (epoch seconds); older .gcda are stale')
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args()
+
+    if not args.gcda_dir and not args.target:
+        print("Error: give a .gcda directory or --target")
+        return 1
+    src = source_dir(args.target, args.base_dir) if args.target else None
+    gcda_dir = args.gcda_dir or src
+    if not os.path.isdir(gcda_dir):
+        print(f"Error: {gcda_dir} is not a directory")
+        return 1
+    report = check(gcda_dir, args.gcno or src or gcda_dir, args.prefix, args.since)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(summary(report))
+        for key in ('corrupt', 'stamp', 'stale', 'zero', 'orphan'):
+            for name in report[key][:20]:
+                print(f"  {key:<8} {name}")
+        for problem in report['problems']:
+            print(f"✗ {problem}")
+        if report['healthy']:
+            print("✓ coverage data looks healthy")
+    return 0 if report['healthy'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
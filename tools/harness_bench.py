@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Harness 启动延迟基准测试
+对每个目标反复启动模糊测试 harness（targets.py 的 harness_cmd，即容器中 afl-fuzz 启动的程序，
+如 OpENer lo、svrskel_afl、打过补丁的 iec104_monitor），测量:
+  time_to_listen          启动进程 -> 端口可连接
+  time_to_first_response  启动进程 -> 探测报文收到完整响应
+  teardown                SIGTERM -> 进程退出（超时后 SIGKILL）
+结果追加写入 JSONL 历史文件，并与同一主机上一次的结果比较，标记回归。
+
+使用方法:
+  python3 tools/harness_bench.py libslmp2 opener --launches 20
+  python3 tools/harness_bench.py all --history benchmarks/harness-startup.jsonl
+  python3 tools/harness_bench.py all --base-dir /opt/fuzzing            # 在模糊测试容器内
+  python3 tools/harness_bench.py libmodbus --server                       # 改测覆盖率版服务器
+  python3 tools/harness_bench.py opener --cmd "./OpENer lo" --cwd /opt/fuzzing/OpENer/build-server/src/ports/POSIX
+"""
+
+import argparse
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from replay import summarize
+from supervisor import read_response, terminate
+from targets import BASE_DIR, TARGETS, get_target, harness_command, probe_message, server_command
+
+POLL_INTERVAL = 0.001
+REGRESSION_THRESHOLD = 0.20  # p50 变慢超过 20% 视为回归
+REGRESSION_MIN_MS = 5.0      # 且绝对差值超过 5ms，避免亚毫秒级抖动误报
+
+
+def wait_for_listen(host, port, proc, timeout):
+    """轮询直到端口可连接，返回连接上的 socket；进程提前退出或超时返回 None"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            return None
+        try:
+            return socket.create_connection((host, port), timeout=0.1)
+        except OSError:
+            time.sleep(POLL_INTERVAL)
+    return None
+
+
+def launch_once(cmd, cwd, host, port, protocol, probe, timeout):
+    sample = {'listen': None, 'first_response': None, 'teardown': None, 'killed': False, 'error': None}
+    start = time.perf_counter()
+    proc = subprocess.Popen(shlex.split(cmd), cwd=cwd, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    try:
+        sock = wait_for_listen(host, port, proc, timeout)
+        if sock is None:
+            sample['error'] = 'exited' if proc.poll() is not None else 'listen timeout'
+            return sample
+        sample['listen'] = time.perf_counter() - start
+        try:
+            sock.sendall(probe)
+            if read_response(sock, protocol, timeout) is not None:
+                sample['first_response'] = time.perf_counter() - start
+            else:
+                sample['error'] = 'no response'
+        finally:
+            sock.close()
+    finally:
+        sample['teardown'], sample['killed'] = terminate(proc, timeout)
+    return sample
+
+
+def benchmark(target, launches, host, port, cmd, cwd, timeout):
+    spec = get_target(target)
+    probe = probe_message(target)
+    samples = [launch_once(cmd, cwd, host, port, spec['protocol'], probe, timeout)
+               for _ in range(launches)]
+    return {
+        'target': target,
+        'harness': spec['harness'],
+        'command': cmd,
+        'launches': launches,
+        'failures': sum(1 for s in samples if s['error']),
+        'killed': sum(1 for s in samples if s['killed']),
+        'time_to_listen': summarize([s['listen'] for s in samples]),
+        'time_to_first_response': summarize([s['first_response'] for s in samples]),
+        'teardown': summarize([s['teardown'] for s in samples]),
+        'errors': sorted({s['error'] for s in samples if s['error']}),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def previous_result(history, target, host, command):
+    if not os.path.exists(history):
+        return None
+    last = None
+    with open(history) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if (record.get('target'), record.get('host'), record.get('command')) == (target, host, command):
+                last = record
+    return last
+
+
+def regressions(current, previous):
+    """比较各指标 p50，返回变慢超过阈值的指标"""
+    found = []
+    if previous is None:
+        return found
+    for metric in ('time_to_listen', 'time_to_first_response', 'teardown'):
+        old = previous.get(metric, {}).get('p50_ms')
+        new = current.get(metric, {}).get('p50_ms')
+        if old and new and new > old * (1 + REGRESSION_THRESHOLD) and new - old > REGRESSION_MIN_MS:
+            found.append(f"{metric} p50 {old}ms -> {new}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark harness startup / first response / teardown latency")
+    parser.add_argument('targets', nargs='+', help="target names or 'all'")
+    parser.add_argument('--launches', type=int, default=10)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--cmd', help='override server command (single target only)')
+    parser.add_argument('--cwd', help='override server working directory')
+    parser.add_argument('--server', action='store_true',
+                        help='benchmark the coverage server (server_cmd) instead of the fuzzing harness')
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--history', help='JSONL history file (default: <base-dir>/benchmarks/harness-startup.jsonl)')
+    args = parser.parse_args()
+
+    targets = sorted(TARGETS) if args.targets == ['all'] else args.targets
+    if args.cmd and len(targets) != 1:
+        parser.error('--cmd can only be used with a single target')
+    history = args.history or os.path.join(args.base_dir, 'benchmarks', 'harness-startup.jsonl')
+    os.makedirs(os.path.dirname(os.path.abspath(history)), exist_ok=True)
+    host_name = socket.gethostname()
+    commit = git_commit()
+
+    exit_code = 0
+    for target in targets:
+        port = args.port or get_target(target)['port']
+        cwd, cmd = (server_command if args.server else harness_command)(target, port, args.base_dir)
+        cmd = args.cmd or cmd
+        cwd = args.cwd or cwd
+        if not os.path.isdir(cwd):
+            print(f"[skip] {target}: working directory {cwd} not found")
+            continue
+
+        result = benchmark(target, args.launches, args.host, port, cmd, cwd, args.timeout)
+        result.update({'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'host': host_name, 'commit': commit})
+        found = regressions(result, previous_result(history, target, host_name, cmd))
+        result['regressions'] = found
+        with open(history, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+        print("========================================")
+        print(f"{target} ({result['harness']}): {args.launches} launches, "
+              f"{result['failures']} failed, {result['killed']} needed SIGKILL")
+        for metric in ('time_to_listen', 'time_to_first_response', 'teardown'):
+            stats = result[metric]
+            if stats['count']:
+                print(f"  {metric:<24} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms max={stats['max_ms']}ms")
+        for err in result['errors']:
+            print(f"  error: {err}")
+        for item in found:
+            print(f"  ✗ REGRESSION: {item}")
+            exit_code = 2
+    print("========================================")
+    print(f"History: {history}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+ENIP harness 进程内驱动 (ctypes)
+加载以 -DOPENER_HARNESS_INPROCESS / -DEIP_HARNESS_INPROCESS 编译的共享库，
+绕过 TCP 监听，把整个 queue 目录的测试用例直接送入封装层处理函数，
+用于覆盖率收集和崩溃分诊。
+
+使用方法:
+  python3 tools/inprocess_driver.py opener libopener_harness.so results/opener-aflnet-1
+  python3 tools/inprocess_driver.py eipscanner libeip_server_inprocess.so \\
+      results/eipscanner-a3-1/replayable-crashes --fork --responses out.jsonl
+"""
+
+import argparse
+import ctypes
+import json
+import os
+import sys
+import time
+
+from corpus import iter_testcases
+from replayable import find_queue_dir, list_testcases
+
+RESPONSE_BUFFER_SIZE = 65536
+
+# 每个 harness 导出的符号，以及与网络路径保持一致所需的连接语义
+HARNESS_SPECS = {
+    # OpENerNetworkHarness.c: 每个连接内逐条 recv 并处理
+    'opener': {
+        'init': 'OpENerHarnessInit',
+        'process': 'OpENerHarnessProcess',
+        'connect': 'OpENerHarnessConnect',
+        'disconnect': 'OpENerHarnessDisconnect',
+        'flush': 'OpENerHarnessFlushCoverage',
+        'messages_per_connection': None,
+    },
+    # EIPServerHarness.cpp: 每个连接只处理第一次 recv，随后关闭连接
+    'eipscanner': {
+        'init': 'EIPHarnessInit',
+        'process': 'EIPHarnessProcess',
+        'connect': None,
+        'disconnect': None,
+        'flush': 'EIPHarnessFlushCoverage',
+        'messages_per_connection': 1,
+    },
+}
+
+
+class InProcessHarness:
+    def __init__(self, target, library_path):
+        if target not in HARNESS_SPECS:
+            raise ValueError(f"Unsupported target: {target}")
+        self.spec = HARNESS_SPECS[target]
+        self.lib = ctypes.CDLL(os.path.abspath(library_path))
+        self.out = ctypes.create_string_buffer(RESPONSE_BUFFER_SIZE)
+
+        self._process = getattr(self.lib, self.spec['process'])
+        self._process.argtypes = [ctypes.c_char_p, ctypes.c_size_t,
+                                  ctypes.c_char_p, ctypes.c_size_t]
+        self._process.restype = ctypes.c_int
+
+        self._connect = self._optional(self.spec['connect'])
+        self._disconnect = self._optional(self.spec['disconnect'])
+        self._flush = self._optional(self.spec['flush'])
+
+        if getattr(self.lib, self.spec['init'])() != 0:
+            raise RuntimeError(f"{self.spec['init']} failed")
+
+    def _optional(self, name):
+        if name is None:
+            return None
+        func = getattr(self.lib, name)
+        func.restype = None
+        return func
+
+    def process(self, message):
+        """处理单条消息，返回响应字节"""
+        size = self._process(bytes(message), len(message), self.out, RESPONSE_BUFFER_SIZE)
+        if size < 0:
+            raise RuntimeError(f"{self.spec['process']} returned {size}")
+        return self.out.raw[:min(size, RESPONSE_BUFFER_SIZE)]
+
+    def run_testcase(self, messages):
+        """按网络路径的连接语义重放一个测试用例，返回每条消息的响应"""
+        limit = self.spec['messages_per_connection']
+        if limit is not None:
+            messages = messages[:limit]
+        if self._connect:
+            self._connect()
+        try:
+            return [self.process(msg) for msg in messages]
+        finally:
+            if self._disconnect:
+                self._disconnect()
+
+    def flush_coverage(self):
+        if self._flush:
+            self._flush()
+
+
+def run_forked(harness, messages):
+    """在子进程中执行，目标崩溃时不影响驱动本身；返回 (响应列表, 终止信号)"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        responses = harness.run_testcase(messages)
+        # os._exit 不经过 atexit，.gcda 必须在此显式写出
+        harness.flush_coverage()
+        payload = json.dumps([r.hex() for r in responses]).encode()
+        os.write(write_fd, payload)
+        os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+
+    if os.WIFSIGNALED(status):
+        return [], os.WTERMSIG(status)
+    responses = [bytes.fromhex(h) for h in json.loads(b''.join(chunks) or b'[]')]
+    return responses, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay queue directories through in-process ENIP harnesses")
+    parser.add_argument('target', choices=sorted(HARNESS_SPECS))
+    parser.add_argument('library', help='harness shared library (.so)')
+    parser.add_argument('inputs', nargs='+', help='results dir, queue dir or single testcase files')
+    parser.add_argument('--fork', action='store_true', help='run each testcase in a forked child (for crash triage)')
+    parser.add_argument('--responses', help='write per-testcase responses as JSONL')
+    args = parser.parse_args()
+
+    testcases = []
+    for path in args.inputs:
+        if os.path.isfile(path):
+            testcases.append(path)
+        elif os.path.isdir(os.path.join(path, 'queue')) or os.path.isdir(os.path.join(path, 'replayable-queue')):
+            testcases.extend(list_testcases(find_queue_dir(path)))
+        else:
+            testcases.extend(list_testcases(path))
+
+    harness = InProcessHarness(args.target, args.library)
+    out = open(args.responses, 'w') if args.responses else None
+
+    message_count = 0
+    crash_count = 0
+    start = time.perf_counter()
+    try:
+        for path, messages in iter_testcases(testcases):
+            message_count += len(messages)
+            if args.fork:
+                responses, signum = run_forked(harness, messages)
+            else:
+                responses, signum = harness.run_testcase(messages), 0
+            if signum:
+                crash_count += 1
+                print(f"✗ {path}: terminated by signal {signum}")
+            if out:
+                out.write(json.dumps({
+                    'testcase': path,
+                    'signal': signum,
+                    'responses': [r.hex() for r in responses],
+                }) + '\n')
+    finally:
+        if out:
+            out.close()
+        harness.flush_coverage()
+
+    elapsed = time.perf_counter() - start
+    rate = len(testcases) / elapsed if elapsed > 0 else 0.0
+    print("========================================")
+    print(f"Target:      {args.target}")
+    print(f"Test cases:  {len(testcases)}")
+    print(f"Messages:    {message_count}")
+    print(f"Crashes:     {crash_count}")
+    print(f"Elapsed:     {elapsed:.3f}s ({rate:.1f} testcases/s)")
+    print("========================================")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+LLM 交互记录归档（紧凑、带索引），用于确定性回放
+文件布局:
+  MAGIC
+  记录*:  u32 长度 + zlib(JSON{key, path, status, body, latency})
+  索引:   zlib(JSON{key: [记录偏移, ...]})
+  尾部:   u64 索引偏移 + u32 索引长度 + INDEX_MAGIC
+录制中途被中断（没有尾部）时，读取方会顺序扫描记录重建索引。
+
+使用方法:
+  python3 tools/llm_archive.py info results/llm-opener-a3-1.llmarc
+  python3 tools/llm_archive.py dump results/llm-opener-a3-1.llmarc
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import zlib
+
+MAGIC = b'LLMARC1\n'
+INDEX_MAGIC = b'LLMIDX1\n'
+RECORD_HEADER = struct.Struct('<I')
+TRAILER = struct.Struct('<QI8s')
+
+
+class ArchiveWriter:
+    """追加写入交互记录，close() 时写入索引和尾部"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.index = {}
+        self.count = 0
+        self.f = open(path, 'wb')
+        self.f.write(MAGIC)
+
+    def append(self, key, path, status, body, latency=0.0):
+        record = json.dumps({'key': key, 'path': path, 'status': status,
+                             'body': body, 'latency': round(latency, 6)},
+                            separators=(',', ':')).encode()
+        blob = zlib.compress(record, 6)
+        with self.lock:
+            offset = self.f.tell()
+            self.f.write(RECORD_HEADER.pack(len(blob)))
+            self.f.write(blob)
+            self.f.flush()
+            self.index.setdefault(key, []).append(offset)
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self.f.closed:
+                return
+            index_offset = self.f.tell()
+            blob = zlib.compress(json.dumps(self.index, separators=(',', ':')).encode(), 6)
+            self.f.write(blob)
+            self.f.write(TRAILER.pack(index_offset, len(blob), INDEX_MAGIC))
+            self.f.close()
+
+
+class ArchiveReader:
+    """按 (key, 第几次出现) 读取记录"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        if not self.data.startswith(MAGIC):
+            raise ValueError(f"{path}: not an LLM archive")
+        self.index = self._read_index()
+
+    def _read_index(self):
+        if len(self.data) >= len(MAGIC) + TRAILER.size:
+            index_offset, length, magic = TRAILER.unpack_from(self.data, len(self.data) - TRAILER.size)
+            if magic == INDEX_MAGIC:
+                return json.loads(zlib.decompress(self.data[index_offset:index_offset + length]))
+        # 没有尾部：顺序扫描重建
+        index = {}
+        offset = len(MAGIC)
+        while offset + RECORD_HEADER.size <= len(self.data):
+            (length,) = RECORD_HEADER.unpack_from(self.data, offset)
+            if offset + RECORD_HEADER.size + length > len(self.data):
+                break
+            try:
+                record = self._record_at(offset)
+            except (zlib.error, ValueError):
+                break
+            index.setdefault(record['key'], []).append(offset)
+            offset += RECORD_HEADER.size + length
+        return index
+
+    def _record_at(self, offset):
+        (length,) = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size
+        return json.loads(zlib.decompress(self.data[start:start + length]))
+
+    def lookup(self, key, occurrence=0):
+        """返回该 key 第 occurrence 次出现的记录；超出次数时返回最后一次"""
+        offsets = self.index.get(key)
+        if not offsets:
+            return None
+        return self._record_at(offsets[min(occurrence, len(offsets) - 1)])
+
+    def records(self):
+        offsets = sorted(o for group in self.index.values() for o in group)
+        for offset in offsets:
+            yield self._record_at(offset)
+
+    def __len__(self):
+        return sum(len(group) for group in self.index.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect LLM record/replay archives")
+    parser.add_argument('command', choices=['info', 'dump'])
+    parser.add_argument('archive')
+    args = parser.parse_args()
+
+    reader = ArchiveReader(args.archive)
+    if args.command == 'info':
+        print(f"Archive:   {args.archive} ({os.path.getsize(args.archive)} bytes)")
+        print(f"Records:   {len(reader)}")
+        print(f"Prompts:   {len(reader.index)}")
+        repeated = sum(1 for group in reader.index.values() if len(group) > 1)
+        print(f"Repeated:  {repeated}")
+    else:
+        for record in reader.records():
+            print(json.dumps(record, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+LLM 请求缓存 / 合并 / 批处理本地代理（供 chatafl、a2、a3 容器使用）
+对外提供 OpenAI 兼容的 HTTP 接口，按请求内容哈希缓存响应（LRU 淘汰，可落盘），
+并发的相同请求只向上游发送一次；参数相同的 /v1/completions 请求在短窗口内
+合并为一次批量调用。流式请求（"stream": true）不支持，返回 400，客户端需使用非流式接口。
+
+使用方法:
+  # 转发到真实上游（API Key 取请求头或 LLM_API_KEY）
+  python3 tools/llm_proxy.py --upstream https://api.openai.com --cache-file llm-cache.jsonl
+  # 离线测试：使用本地桩后端
+  python3 tools/llm_proxy.py --upstream stub --stub-latency 0.5
+  # 录制本次实验的全部交互，之后离线确定性回放
+  python3 tools/llm_proxy.py --record results/llm-opener-a3-1.llmarc
+  python3 tools/llm_proxy.py --replay results/llm-opener-a3-1.llmarc
+  # 统计信息
+  curl http://127.0.0.1:8765/stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_archive import ArchiveReader, ArchiveWriter
+
+# 不影响模型输出的字段，不参与缓存键计算
+NON_SEMANTIC_FIELDS = ('user', 'stream_options')
+BATCHABLE_PATH = '/v1/completions'
+DEFAULT_TIMEOUT = 120.0
+
+
+def wait_timeout(backend):
+    """等待其他线程的上游调用的上限: 批处理窗口 + 上游调用本身，留出一倍余量"""
+    return 2 * getattr(backend, 'timeout', DEFAULT_TIMEOUT) + 1.0
+
+
+def request_key(path, payload):
+    """按路径 + 规范化 JSON 计算缓存键"""
+    canonical = {k: v for k, v in payload.items() if k not in NON_SEMANTIC_FIELDS}
+    blob = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(path.encode() + b'\0' + blob.encode()).hexdigest()
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存，可选追加写入磁盘，启动时加载并压缩"""
+
+    def __init__(self, max_entries=10000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.log = None
+        if path:
+            self._load()
+            self.log = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[record['key']] = (record['status'], record['body'])
+                self.entries.move_to_end(record['key'])
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        # 压缩：只保留仍在缓存中的条目
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, (status, body) in self.entries.items():
+                f.write(json.dumps({'key': key, 'status': status, 'body': body}) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, status, body):
+        with self.lock:
+            self.entries[key] = (status, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.log:
+                self.log.write(json.dumps({'key': key, 'status': status, 'body': body}) + '\n')
+                self.log.flush()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class HTTPBackend:
+    """转发到 OpenAI 兼容的上游服务"""
+
+    def __init__(self, base_url, api_key=None, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def send(self, path, payload, headers):
+        req_headers = {'Content-Type': 'application/json'}
+        auth = headers.get('Authorization') or (f"Bearer {self.api_key}" if self.api_key else None)
+        if auth:
+            req_headers['Authorization'] = auth
+        data = json.dumps(payload).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, headers=req_headers, method='POST')
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+
+class StubBackend:
+    """离线桩后端：按请求内容生成确定性的响应，模拟固定延迟"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def send(self, path, payload, headers):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        digest = request_key(path, payload)[:16]
+        model = payload.get('model', 'stub')
+        if path == BATCHABLE_PATH:
+            prompts = payload.get('prompt', '')
+            if not isinstance(prompts, list):
+                prompts = [prompts]
+            n = payload.get('n', 1)
+            choices = []
+            for i, prompt in enumerate(prompts):
+                text_digest = hashlib.sha256(str(prompt).encode()).hexdigest()[:16]
+                for j in range(n):
+                    choices.append({'index': i * n + j, 'text': f"stub-{text_digest}-{j}",
+                                    'finish_reason': 'stop'})
+            body = {'id': f"cmpl-{digest}", 'object': 'text_completion', 'model': model,
+                    'choices': choices}
+        else:
+            body = {'id': f"chatcmpl-{digest}", 'object': 'chat.completion', 'model': model,
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': f"stub-{digest}"}}]}
+        return 200, json.dumps(body)
+
+
+class _Pending:
+    """一次上游调用的结果占位，供并发的相同请求等待"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+    def set(self, result):
+        self.result = result
+        self.event.set()
+
+    def wait(self, timeout=None):
+        """超时仍未得到结果（上游调用线程异常退出等）时返回 504，而不是永久阻塞"""
+        if not self.event.wait(timeout):
+            return 504, json.dumps({'error': 'timed out waiting for the upstream call'})
+        return self.result
+
+
+class CompletionBatcher:
+    """把短窗口内参数相同的 /v1/completions 请求合并为一次 prompt 列表调用"""
+
+    def __init__(self, backend, window=0.02, max_batch=16):
+        self.backend = backend
+        self.window = window
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.batched_calls = 0
+        self.timeout = wait_timeout(backend)
+
+    def submit(self, payload, headers):
+        params = {k: v for k, v in payload.items() if k != 'prompt'}
+        group_key = json.dumps(params, sort_keys=True)
+        pending = _Pending()
+        with self.lock:
+            group = self.groups.get(group_key)
+            if group is None:
+                group = {'params': params, 'headers': headers, 'items': []}
+                self.groups[group_key] = group
+                threading.Timer(self.window, self._flush, args=(group_key, group)).start()
+            group['items'].append((payload.get('prompt', ''), pending))
+            full = len(group['items']) >= self.max_batch
+        if full:
+            self._flush(group_key)
+        return pending.wait(self.timeout)
+
+    def _flush(self, group_key, expected=None):
+        with self.lock:
+            group = self.groups.get(group_key)
+            # 定时器触发时该组可能已因满额提前发送，新组由它自己的定时器负责
+            if group is None or (expected is not None and group is not expected):
+                return
+            del self.groups[group_key]
+        items = group['items']
+        if len(items) == 1:
+            payload = dict(group['params'], prompt=items[0][0])
+        else:
+            self.batched_calls += 1
+            payload = dict(group['params'], prompt=[prompt for prompt, _ in items])
+        try:
+            status, body = self.backend.send(BATCHABLE_PATH, payload, group['headers'])
+        except Exception as e:
+            status, body = 502, json.dumps({'error': str(e)})
+        if len(items) == 1:
+            items[0][1].set((status, body))
+            return
+        if status != 200:
+            for _, pending in items:
+                pending.set((status, body))
+            return
+
+        # 按 choice.index 拆回每个 prompt 各自的响应；上游响应格式不对时所有等待者都得到 502
+        try:
+            response = json.loads(body)
+            n = group['params'].get('n', 1)
+            split = []
+            for i in range(len(items)):
+                choices = [dict(c, index=c['index'] - i * n) for c in response.get('choices', [])
+                           if i * n <= c['index'] < (i + 1) * n]
+                split.append((200, json.dumps(dict(response, choices=choices))))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            error = (502, json.dumps({'error': f"malformed batched upstream response: {type(e).__name__}: {e}"}))
+            split = [error] * len(items)
+        for (_, pending), result in zip(items, split):
+            pending.set(result)
+
+
+class LLMProxy:
+    def __init__(self, backend, cache, batch_window=0.0, max_batch=16, recorder=None):
+        self.backend = backend
+        self.cache = cache
+        self.recorder = recorder
+        self.batcher = CompletionBatcher(backend, batch_window, max_batch) if batch_window > 0 else None
+        self.timeout = wait_timeout(backend)
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'upstream_errors': 0}
+
+    def handle(self, path, payload, headers):
+        """返回 (status, body)；开启录制时记录客户端实际收到的响应"""
+        start = time.perf_counter()
+        status, body = self._handle(path, payload, headers)
+        if self.recorder is not None:
+            self.recorder.append(request_key(path, payload), path, status, body,
+                                 time.perf_counter() - start)
+        return status, body
+
+    def _handle(self, path, payload, headers):
+        with self.lock:
+            self.stats['requests'] += 1
+
+        key = request_key(path, payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self.lock:
+                self.stats['hits'] += 1
+            return cached
+
+        with self.lock:
+            pending = self.inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = _Pending()
+                self.inflight[key] = pending
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return pending.wait(self.timeout)
+
+        try:
+            status, body = self._call_upstream(path, payload, headers)
+            if status == 200:
+                self.cache.put(key, status, body)
+            else:
+                with self.lock:
+                    self.stats['upstream_errors'] += 1
+        except Exception as e:
+            status, body = 502, json.dumps({'error': str(e)})
+            with self.lock:
+                self.stats['upstream_errors'] += 1
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+        pending.set((status, body))
+        return status, body
+
+    def _call_upstream(self, path, payload, headers):
+        if self.batcher and path == BATCHABLE_PATH and not isinstance(payload.get('prompt'), list):
+            return self.batcher.submit(payload, headers)
+        return self.backend.send(path, payload, headers)
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['cache_entries'] = len(self.cache)
+        stats['batched_calls'] = self.batcher.batched_calls if self.batcher else 0
+        return stats
+
+
+class ReplayProxy:
+    """回放模式：按 (请求哈希, 第几次出现) 返回录制的响应，不访问网络"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.occurrences = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'replayed': 0, 'missing': 0}
+
+    def handle(self, path, payload, headers):
+        key = request_key(path, payload)
+        with self.lock:
+            occurrence = self.occurrences.get(key, 0)
+            self.occurrences[key] = occurrence + 1
+            self.stats['requests'] += 1
+        record = self.reader.lookup(key, occurrence)
+        with self.lock:
+            self.stats['replayed' if record else 'missing'] += 1
+        if record is None:
+            return 404, json.dumps({'error': f"no recorded response for request {key[:16]}"})
+        return record['status'], record['body']
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['archive_records'] = len(self.reader)
+        return stats
+
+
+def make_handler(proxy):
+    class ProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status, body):
+            data = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, json.dumps(proxy.snapshot()))
+            else:
+                self._reply(404, json.dumps({'error': 'not found'}))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._reply(400, json.dumps({'error': 'invalid JSON body'}))
+                return
+            # 响应按完整 JSON 缓存和返回，无法转成 SSE 流
+            if payload.get('stream'):
+                self._reply(400, json.dumps({'error': 'streaming is not supported by the proxy; set "stream": false'}))
+                return
+            status, body = proxy.handle(self.path, payload, dict(self.headers))
+            self._reply(status, body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return ProxyHandler
+
+
+def build_backend(args):
+    if args.upstream == 'stub':
+        return StubBackend(args.stub_latency)
+    return HTTPBackend(args.upstream, os.environ.get('LLM_API_KEY'), args.timeout)
+
+
+def add_backend_arguments(parser):
+    parser.add_argument('--listen', default='127.0.0.1:8765', help='host:port to listen on')
+    parser.add_argument('--upstream', default='https://api.openai.com',
+                        help="upstream base URL, or 'stub' for the offline stub backend")
+    parser.add_argument('--stub-latency', type=float, default=0.0, help='stub backend latency in seconds')
+    parser.add_argument('--timeout', type=float, default=120.0, help='upstream request timeout')
+
+
+def serve(proxy, listen):
+    host, _, port = listen.rpartition(':')
+    server = ThreadingHTTPServer((host or '0.0.0.0', int(port)), make_handler(proxy))
+    print(f"[llm-proxy] listening on {listen}", flush=True)
+
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    # docker stop 发送 SIGTERM，同样走正常关闭流程（写入归档索引）
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[llm-proxy] {json.dumps(proxy.snapshot())}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching / coalescing / batching proxy for LLM calls")
+    add_backend_arguments(parser)
+    parser.add_argument('--cache-size', type=int, default=10000, help='max cached responses (LRU)')
+    parser.add_argument('--cache-file', help='persist cache to this JSONL file across runs')
+    parser.add_argument('--batch-window', type=float, default=0.02,
+                        help='seconds to collect /v1/completions requests into one batch (0 disables)')
+    parser.add_argument('--max-batch', type=int, default=16)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='ARCHIVE', help='record every exchange into this archive')
+    mode.add_argument('--replay', metavar='ARCHIVE', help='serve recorded responses only (no network)')
+    args = parser.parse_args()
+
+    if args.replay:
+        serve(ReplayProxy(ArchiveReader(args.replay)), args.listen)
+        return 0
+
+    recorder = ArchiveWriter(args.record) if args.record else None
+    proxy = LLMProxy(build_backend(args), LRUCache(args.cache_size, args.cache_file),
+                     args.batch_window, args.max_batch, recorder)
+    try:
+        serve(proxy, args.listen)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
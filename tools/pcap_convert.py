@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+pcap / pcapng 与 AFLNet replayable 测试用例互转
+import: 流式读取抓包文件（支持 .gz），重组 TCP 流，用 framers.py 按协议长度字段切分客户端消息，
+        每个会话写成一个 replayable 文件，外加 sessions.jsonl 索引
+export: 把 replayable 测试用例（可附带服务器响应，见 replay.py --pcap）写回 pcap，便于 Wireshark 分析
+
+内存有上界: 同时跟踪的流数、每个方向的乱序缓存、每个会话的消息数、去重摘要数都有上限，
+超过上限时提前落盘（长期轮询的 SCADA 会话会被切成多个测试用例），不会把整个抓包读入内存。
+
+使用方法:
+  python3 tools/pcap_convert.py import capture.pcapng --protocol MODBUS -o seeds/modbus-pcap
+  python3 tools/pcap_convert.py import plant.pcap.gz --target iec104 --port 2404 -o seeds/iec104-pcap
+  python3 tools/pcap_convert.py export results/opener-a3-1/replayable-crashes --target opener -o crashes.pcap
+"""
+
+import argparse
+import collections
+import gzip
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+
+from corpus import iter_testcases
+from framers import FRAMERS, split_messages
+from replayable import list_testcases, write_messages
+from targets import get_target
+
+# 真实现场抓包中各协议的常用端口（目标容器使用的端口见 targets.py，可用 --port 追加）
+WELL_KNOWN_PORTS = {
+    'MODBUS': [502],
+    'ETHERNETIP': [44818],
+    'IEC104': [2404],
+    'SLMPB': [5000, 5001, 5002],
+    'SLMPA': [5000, 5001, 5002],
+}
+
+MAX_FLOWS = 10000              # 同时跟踪的 TCP 流上限，超过时淘汰最久未活动的流
+MAX_OOO_BYTES = 256 * 1024     # 每个方向缓存的乱序数据上限，超过时跳过缺口
+MAX_MESSAGES = 1000            # 每个测试用例的消息数上限
+MAX_SEEN = 500000              # 去重摘要上限（LRU，约 75MB），被淘汰的旧会话重复出现时会再次写出
+IDLE_TIMEOUT = 300.0           # 抓包时间轴上空闲超过该秒数的流落盘
+SWEEP_INTERVAL = 10000         # 每处理这么多个包检查一次空闲流
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+TCP_FIN, TCP_SYN, TCP_RST = 0x01, 0x02, 0x04
+
+
+# ---------------------------------------------------------------------------
+# 抓包文件读取
+# ---------------------------------------------------------------------------
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb', buffering=1 << 20)
+
+
+def _read_pcap(f, header):
+    """经典 pcap，header 为已读出的 24 字节文件头"""
+    magic = struct.unpack('<I', header[:4])[0]
+    if magic in (0xa1b2c3d4, 0xa1b23c4d):
+        endian = '<'
+    else:
+        endian = '>'
+        magic = struct.unpack('>I', header[:4])[0]
+    scale = 1e-9 if magic == 0xa1b23c4d else 1e-6
+    linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0fffffff
+    record = struct.Struct(endian + 'IIII')
+    while True:
+        head = f.read(record.size)
+        if len(head) < record.size:
+            return
+        sec, frac, caplen, _ = record.unpack(head)
+        data = f.read(caplen)
+        if len(data) < caplen:
+            return
+        yield sec + frac * scale, linktype, data
+
+
+def _tsresol(options, endian):
+    """从 IDB 选项中取 if_tsresol（默认微秒）"""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = options[offset + 4]
+            return 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+        offset += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+def _read_pcapng(f, first):
+    """pcapng，first 为已读出的前 8 字节（SHB 的类型和长度）"""
+    pending = first
+    endian = '<'
+    interfaces = []
+    while True:
+        head = pending or f.read(8)
+        pending = None
+        if len(head) < 8:
+            return
+        block_type = struct.unpack('<I', head[:4])[0]
+        if block_type == 0x0A0D0D0A:
+            # SHB: 先读字节序标记再解释长度
+            bom = f.read(4)
+            endian = '<' if struct.unpack('<I', bom)[0] == 0x1A2B3C4D else '>'
+            length = struct.unpack(endian + 'I', head[4:8])[0]
+            f.read(length - 12)
+            interfaces = []
+            continue
+        block_type, length = struct.unpack(endian + 'II', head)
+        if length < 12:
+            return
+        body = f.read(length - 8)
+        if len(body) < length - 8:
+            return
+        body = body[:-4]
+        if block_type == 0x00000001:  # IDB
+            linktype = struct.unpack_from(endian + 'H', body, 0)[0]
+            interfaces.append((linktype, _tsresol(body[8:], endian)))
+        elif block_type == 0x00000006:  # EPB
+            iface, ts_high, ts_low, caplen, _ = struct.unpack_from(endian + 'IIIII', body, 0)
+            if iface < len(interfaces):
+                linktype, resol = interfaces[iface]
+                yield ((ts_high << 32) | ts_low) * resol, linktype, body[20:20 + caplen]
+        elif block_type == 0x00000003 and interfaces:  # SPB
+            linktype, _ = interfaces[0]
+            orig_len = struct.unpack_from(endian + 'I', body, 0)[0]
+            yield None, linktype, body[4:4 + orig_len]
+
+
+def read_packets(path):
+    """流式产出 (时间戳, 链路类型, 帧数据)，自动识别 pcap / pcapng"""
+    with _open(path) as f:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        if struct.unpack('<I', head[:4])[0] == 0x0A0D0D0A:
+            yield from _read_pcapng(f, head)
+        else:
+            yield from _read_pcap(f, head + f.read(16))
+
+
+# ---------------------------------------------------------------------------
+# 链路层 / IP / TCP 解析
+# ---------------------------------------------------------------------------
+
+def _network_layer(linktype, frame):
+    """剥离链路层，返回 (以太网类型, IP 数据)；不支持的帧返回 (None, None)"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None, None
+        offset, ethertype = 14, (frame[12] << 8) | frame[13]
+        while ethertype in (0x8100, 0x88a8) and len(frame) >= offset + 4:
+            ethertype = (frame[offset + 2] << 8) | frame[offset + 3]
+            offset += 4
+        return ethertype, frame[offset:]
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not frame:
+            return None, None
+        return (0x0800 if frame[0] >> 4 == 4 else 0x86dd), frame
+    if linktype == LINKTYPE_LINUX_SLL and len(frame) >= 16:
+        return (frame[14] << 8) | frame[15], frame[16:]
+    if linktype == LINKTYPE_LINUX_SLL2 and len(frame) >= 20:
+        return (frame[0] << 8) | frame[1], frame[20:]
+    if linktype == LINKTYPE_NULL and len(frame) >= 4:
+        family = struct.unpack('<I', frame[:4])[0]
+        if family > 0xffff:
+            family = struct.unpack('>I', frame[:4])[0]
+        return (0x0800 if family == 2 else 0x86dd), frame[4:]
+    return None, None
+
+
+def parse_tcp(linktype, frame):
+    """返回 (src, sport, dst, dport, seq, flags, payload)；非 TCP 或分片返回 None"""
+    ethertype, ip = _network_layer(linktype, frame)
+    if ethertype == 0x0800 and len(ip) >= 20:
+        ihl = (ip[0] & 0x0f) * 4
+        total = (ip[2] << 8) | ip[3]
+        if ip[9] != 6 or (ip[6] & 0x3f) or ip[7]:  # 非 TCP，或 MF / 片偏移非零
+            return None
+        src, dst = bytes(ip[12:16]), bytes(ip[16:20])
+        segment = ip[ihl:total] if total >= ihl else ip[ihl:]
+    elif ethertype == 0x86dd and len(ip) >= 40:
+        next_header, offset = ip[6], 40
+        payload_end = 40 + ((ip[4] << 8) | ip[5])
+        while next_header in (0, 43, 60) and len(ip) >= offset + 8:
+            next_header, offset = ip[offset], offset + (ip[offset + 1] + 1) * 8
+        if next_header != 6:
+            return None
+        src, dst = bytes(ip[8:24]), bytes(ip[24:40])
+        segment = ip[offset:payload_end]
+    else:
+        return None
+    if len(segment) < 20:
+        return None
+    sport, dport, seq = struct.unpack_from('>HHI', segment, 0)
+    data_offset = (segment[12] >> 4) * 4
+    return src, sport, dst, dport, seq, segment[13], bytes(segment[data_offset:])
+
+
+def format_endpoint(addr, port):
+    if len(addr) == 4:
+        return f"{'.'.join(str(b) for b in addr)}:{port}"
+    return f"[{addr.hex()}]:{port}"
+
+
+# ---------------------------------------------------------------------------
+# TCP 重组与分帧
+# ---------------------------------------------------------------------------
+
+class _Direction:
+    """单方向的字节流重组状态"""
+
+    def __init__(self):
+        self.next_seq = None
+        self.fin_seq = None
+        self.out_of_order = {}
+        self.ooo_bytes = 0
+        self.gaps = 0
+
+    @property
+    def finished(self):
+        """FIN 之前的数据已全部按序收到"""
+        return self.fin_seq is not None and self.next_seq == self.fin_seq
+
+    def feed(self, seq, flags, payload):
+        """返回按序可用的新数据（可能为空）"""
+        if flags & TCP_SYN:
+            if self.next_seq is None:
+                self.next_seq = (seq + 1) & 0xffffffff
+            return b''
+        if flags & TCP_FIN:
+            self.fin_seq = (seq + len(payload)) & 0xffffffff
+        if not payload:
+            return b''
+        if self.next_seq is None:
+            # 抓包从会话中途开始，以第一个数据段为起点
+            self.next_seq = seq
+        diff = (seq - self.next_seq) & 0xffffffff
+        if diff >= 0x80000000:
+            # 重传（可能与新数据部分重叠），只保留尚未收到的尾部
+            overlap = (self.next_seq - seq) & 0xffffffff
+            if overlap >= len(payload):
+                return b''
+            payload, diff = payload[overlap:], 0
+        if diff > 0:
+            if seq not in self.out_of_order:
+                self.out_of_order[seq] = payload
+                self.ooo_bytes += len(payload)
+            if self.ooo_bytes <= MAX_OOO_BYTES:
+                return b''
+            # 乱序缓存超限: 认为缺口数据丢失，跳到最早的缓存段继续
+            self.gaps += 1
+            self.next_seq = min(self.out_of_order, key=lambda s: (s - self.next_seq) & 0xffffffff)
+            return self._drain()
+        self.next_seq = (self.next_seq + len(payload)) & 0xffffffff
+        return payload + self._drain()
+
+    def _drain(self):
+        parts = []
+        while self.next_seq in self.out_of_order:
+            data = self.out_of_order.pop(self.next_seq)
+            self.ooo_bytes -= len(data)
+            parts.append(data)
+            self.next_seq = (self.next_seq + len(data)) & 0xffffffff
+        return b''.join(parts)
+
+
+class _Flow:
+    def __init__(self, client, server, ts):
+        self.client = client
+        self.server = server
+        self.first_ts = ts
+        self.last_ts = ts
+        self.upstream = _Direction()
+        self.buffer = b''
+        self.messages = []
+        self.part = 0
+
+
+class PcapImporter:
+    """
+    把 TCP 流转换为 replayable 测试用例
+    feed_packet() 逐包处理，finish() 把剩余的流全部落盘
+    """
+
+    def __init__(self, protocol, ports, output_dir, dedup=True, max_messages=MAX_MESSAGES,
+                 max_flows=MAX_FLOWS, idle_timeout=IDLE_TIMEOUT, max_seen=MAX_SEEN, source='pcap'):
+        self.protocol = protocol
+        self.ports = set(ports)
+        self.output_dir = output_dir
+        self.dedup = dedup
+        self.max_messages = max_messages
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.max_seen = max_seen
+        self.source = source
+        self.flows = collections.OrderedDict()
+        self.seen = collections.OrderedDict()
+        self.next_id = 0
+        self.now = 0.0
+        self.stats = collections.Counter()
+        os.makedirs(output_dir, exist_ok=True)
+        existing = list_testcases(output_dir)
+        if existing:
+            self.next_id = int(os.path.basename(existing[-1])[3:9]) + 1
+        self.index = open(os.path.join(output_dir, 'sessions.jsonl'), 'a')
+
+    def feed_packet(self, ts, linktype, frame):
+        self.stats['packets'] += 1
+        parsed = parse_tcp(linktype, frame)
+        if parsed is None:
+            return
+        src, sport, dst, dport, seq, flags, payload = parsed
+        if dport in self.ports:
+            key, client, server = (src, sport, dst, dport), (src, sport), (dst, dport)
+        elif sport in self.ports:
+            # 服务器 -> 客户端方向只用于检测连接被重置（服务器 FIN 后客户端仍可能发送数据）
+            key = (dst, dport, src, sport)
+            if flags & TCP_RST and key in self.flows:
+                self._close(key)
+            return
+        else:
+            return
+        self.stats['tcp_segments'] += 1
+        if ts is not None:
+            self.now = ts
+
+        flow = self.flows.get(key)
+        if flow is None:
+            if not payload and not flags & TCP_SYN:
+                return  # 已关闭会话的尾部 ACK / FIN
+            if len(self.flows) >= self.max_flows:
+                self.stats['evicted'] += 1
+                self._close(next(iter(self.flows)))
+            flow = self.flows[key] = _Flow(client, server, self.now)
+        else:
+            self.flows.move_to_end(key)
+        flow.last_ts = self.now
+
+        data = flow.upstream.feed(seq, flags, payload)
+        if data:
+            self._frame(flow, data)
+        # FIN 可能先于最后的数据段到达（乱序），等数据补齐后再结束会话
+        if flags & TCP_RST or flow.upstream.finished:
+            self._close(key)
+        if self.stats['packets'] % SWEEP_INTERVAL == 0:
+            self._sweep()
+
+    def _frame(self, flow, data):
+        messages, rest = split_messages(self.protocol, flow.buffer + data)
+        flow.messages.extend(bytes(m) for m in messages)
+        flow.buffer = bytes(rest)
+        while len(flow.messages) >= self.max_messages:
+            chunk, flow.messages = flow.messages[:self.max_messages], flow.messages[self.max_messages:]
+            self._write(flow, chunk)
+
+    def _sweep(self):
+        """落盘空闲超时的流（OrderedDict 按最近活动排序，只需检查开头）"""
+        while self.flows:
+            key, flow = next(iter(self.flows.items()))
+            if self.now - flow.last_ts < self.idle_timeout:
+                break
+            self.stats['idle'] += 1
+            self._close(key)
+
+    def _close(self, key):
+        flow = self.flows.pop(key)
+        if flow.buffer:
+            self.stats['truncated_tail'] += 1
+        self.stats['gaps'] += flow.upstream.gaps
+        if flow.messages:
+            self._write(flow, flow.messages)
+        self.stats['flows'] += 1
+
+    def _write(self, flow, messages):
+        if self.dedup:
+            digest = hashlib.blake2b(b''.join(struct.pack('<I', len(m)) + m for m in messages),
+                                     digest_size=16).digest()
+            if digest in self.seen:
+                self.seen.move_to_end(digest)
+                self.stats['duplicates'] += 1
+                return
+            self.seen[digest] = None
+            if len(self.seen) > self.max_seen:
+                self.seen.popitem(last=False)
+        name = f"id:{self.next_id:06d},src:{self.source}"
+        write_messages(os.path.join(self.output_dir, name), messages)
+        self.index.write(json.dumps({
+            'id': self.next_id,
+            'file': name,
+            'client': format_endpoint(*flow.client),
+            'server': format_endpoint(*flow.server),
+            'first_ts': flow.first_ts,
+            'part': flow.part,
+            'messages': len(messages),
+            'bytes': sum(len(m) for m in messages),
+        }) + '\n')
+        flow.part += 1
+        self.next_id += 1
+        self.stats['testcases'] += 1
+
+    def finish(self):
+        while self.flows:
+            self._close(next(iter(self.flows)))
+        self.index.close()
+        return dict(self.stats)
+
+
+# ---------------------------------------------------------------------------
+# 导出为 pcap
+# ---------------------------------------------------------------------------
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+class PcapWriter:
+    """
+    写出 LINKTYPE_RAW（IPv4）的经典 pcap
+    每个会话使用独立的客户端端口，包含三次握手、双向数据和 FIN，Wireshark 可直接 Follow TCP Stream
+    """
+
+    CLIENT = bytes([10, 0, 0, 1])
+    SERVER = bytes([10, 0, 0, 2])
+    MSS = 1460
+
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+        self.f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_RAW))
+        self.next_port = 40000
+        self.ts = time.time()
+
+    def _packet(self, src, dst, sport, dport, seq, ack, flags, payload=b''):
+        tcp = struct.pack('!HHIIBBHHH', sport, dport, seq, ack, 5 << 4, flags, 65535, 0, 0) + payload
+        pseudo = src + dst + struct.pack('!BBH', 0, 6, len(tcp))
+        tcp = tcp[:16] + struct.pack('!H', _checksum(pseudo + tcp)) + tcp[18:]
+        ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0x4000, 64, 6, 0, src, dst)
+        ip = ip[:10] + struct.pack('!H', _checksum(ip)) + ip[12:]
+        frame = ip + tcp
+        self.ts += 0.000001
+        sec = int(self.ts)
+        self.f.write(struct.pack('<IIII', sec, int((self.ts - sec) * 1e6), len(frame), len(frame)) + frame)
+
+    def _send(self, from_client, seqs, sport, dport, data):
+        """按 MSS 分段发送一个方向的数据，seqs = [客户端 seq, 服务器 seq]"""
+        src, dst = (self.CLIENT, self.SERVER) if from_client else (self.SERVER, self.CLIENT)
+        ports = (sport, dport) if from_client else (dport, sport)
+        me, peer = (0, 1) if from_client else (1, 0)
+        for offset in range(0, len(data), self.MSS):
+            chunk = data[offset:offset + self.MSS]
+            self._packet(src, dst, ports[0], ports[1], seqs[me], seqs[peer], 0x18, chunk)
+            seqs[me] = (seqs[me] + len(chunk)) & 0xffffffff
+
+    def write_session(self, messages, responses=None, port=502, ts=None):
+        """写出一个会话；responses 与 messages 一一对应（没有响应的位置为 b''）"""
+        if ts is not None:
+            self.ts = ts
+        sport = self.next_port
+        self.next_port = 40000 + (self.next_port - 39999) % 20000
+        seqs = [1000, 5000]
+        self._packet(self.CLIENT, self.SERVER, sport, port, seqs[0], 0, 0x02)
+        self._packet(self.SERVER, self.CLIENT, port, sport, seqs[1], seqs[0] + 1, 0x12)
+        seqs = [seqs[0] + 1, seqs[1] + 1]
+        self._packet(self.CLIENT, self.SERVER, sport, port, seqs[0], seqs[1], 0x10)
+        for i, msg in enumerate(messages):
+            self._send(True, seqs, sport, port, bytes(msg))
+            response = responses[i] if responses and i < len(responses) else b''
+            if response:
+                self._send(False, seqs, sport, port, bytes(response))
+        self._packet(self.CLIENT, self.SERVER, sport, port, seqs[0], seqs[1], 0x11)
+        self._packet(self.SERVER, self.CLIENT, port, sport, seqs[1], seqs[0] + 1, 0x11)
+        self._packet(self.CLIENT, self.SERVER, sport, port, seqs[0] + 1, seqs[1] + 1, 0x10)
+
+    def close(self):
+        self.f.close()
+
+
+# ---------------------------------------------------------------------------
+# 命令行
+# ---------------------------------------------------------------------------
+
+def _protocol_and_ports(args):
+    protocol, ports = args.protocol, list(args.port or [])
+    if args.target:
+        spec = get_target(args.target)
+        protocol = protocol or spec['protocol']
+        if not args.port:
+            ports.append(spec['port'])
+    if protocol not in FRAMERS:
+        raise SystemExit(f"Error: --protocol or --target is required (one of {', '.join(FRAMERS)})")
+    return protocol, ports
+
+
+def cmd_import(args):
+    protocol, ports = _protocol_and_ports(args)
+    ports = sorted(set(ports) | set(WELL_KNOWN_PORTS[protocol]))
+    importer = PcapImporter(protocol, ports, args.output, dedup=not args.no_dedup,
+                            max_messages=args.max_messages, max_flows=args.max_flows,
+                            idle_timeout=args.idle_timeout, max_seen=args.max_seen)
+    start = time.perf_counter()
+    try:
+        for path in args.captures:
+            for ts, linktype, frame in read_packets(path):
+                importer.feed_packet(ts, linktype, frame)
+    finally:
+        stats = importer.finish()
+    elapsed = time.perf_counter() - start
+    print("========================================")
+    print(f"Protocol: {protocol}  server ports: {', '.join(map(str, ports))}")
+    print(f"Packets: {stats.get('packets', 0)}  TCP segments: {stats.get('tcp_segments', 0)}  "
+          f"({elapsed:.1f}s)")
+    print(f"Flows: {stats.get('flows', 0)}  testcases written: {stats.get('testcases', 0)}  "
+          f"duplicates: {stats.get('duplicates', 0)}")
+    print(f"Evicted: {stats.get('evicted', 0)}  idle: {stats.get('idle', 0)}  "
+          f"sequence gaps: {stats.get('gaps', 0)}  truncated tails: {stats.get('truncated_tail', 0)}")
+    print(f"Output: {args.output}")
+    print("========================================")
+    return 0
+
+
+def cmd_export(args):
+    protocol, ports = _protocol_and_ports(args)
+    port = ports[0] if ports else WELL_KNOWN_PORTS[protocol][0]
+    writer = PcapWriter(args.output)
+    count = 0
+    try:
+        for item in args.inputs:
+            for _, messages in iter_testcases(list_testcases(item) if os.path.isdir(item) else [item]):
+                writer.write_session(messages, port=port)
+                count += 1
+    finally:
+        writer.close()
+    print(f"Wrote {count} session(s) to {args.output} (server port {port})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert between pcap/pcapng captures and AFLNet replayable testcases")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import', help='reassemble TCP flows from captures into replayable testcases')
+    imp.add_argument('captures', nargs='+', help='.pcap / .pcapng files (optionally .gz)')
+    imp.add_argument('-o', '--output', required=True, help='output directory')
+    imp.add_argument('--protocol', choices=sorted(FRAMERS))
+    imp.add_argument('--target', help='take the protocol (and port) from tools/targets.py')
+    imp.add_argument('--port', type=int, action='append', help='server port (repeatable)')
+    imp.add_argument('--no-dedup', action='store_true', help='keep sessions with identical messages')
+    imp.add_argument('--max-messages', type=int, default=MAX_MESSAGES)
+    imp.add_argument('--max-flows', type=int, default=MAX_FLOWS)
+    imp.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT)
+    imp.add_argument('--max-seen', type=int, default=MAX_SEEN, help='dedup digests kept in memory (LRU)')
+
+    exp = sub.add_parser('export', help='write replayable testcases as TCP sessions into a pcap')
+    exp.add_argument('inputs', nargs='+', help='testcase files or directories')
+    exp.add_argument('-o', '--output', required=True, help='output .pcap')
+    exp.add_argument('--protocol', choices=sorted(FRAMERS))
+    exp.add_argument('--target')
+    exp.add_argument('--port', type=int, action='append', help='server port in the written sessions')
+
+    args = parser.parse_args()
+    return cmd_import(args) if args.command == 'import' else cmd_export(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+同一目标的多个模糊测试容器之间的 queue 同步守护进程（可选）
+监视每个容器输出目录下的 queue/，按内容哈希（以及可选的覆盖率位图）去重，
+只把新颖的输入导入到各目标容器的导入目录:
+  results/sync-<target>-<run>/<dst>/queue/id:NNNNNN,sync:<src>,src:<id>
+容器以 QUEUE_SYNC=1 启动时，启动脚本以 AFL 的 -S <fuzzer> 模式运行，sync_dir 为容器内的
+/opt/fuzzing/sync：<fuzzer> 链接到原结果目录，queue-sync 链接到上面的导入目录，
+AFL 按自己的同步间隔把其中的条目当作对端 queue 导入。
+
+哈希索引全部保存在内存中（16 字节摘要 -> 持有该内容的容器位掩码，外加 64K 的 virgin 位图），
+重启时通过重新扫描各 queue 重建。
+
+使用方法:
+  python3 tools/queue_sync.py --target libmodbus --run 1
+  python3 tools/queue_sync.py --target opener --run 2 --fuzzers aflnet chatafl \\
+      --showmap "afl-showmap -q -o {out} -- /opt/fuzzing/OpENer/build-server/src/ports/POSIX/OpENer lo"
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+FUZZERS = ['afl-ics', 'aflnet', 'chatafl', 'a2', 'a3']
+MAP_SIZE = 1 << 16
+ID_RE = re.compile(r'^id:(\d+)')
+
+
+def count_class_bit(value):
+    """afl-showmap 默认输出 1..8 的命中分桶编号，映射为 virgin 位图中的一位"""
+    return 1 << (min(max(value, 1), 8) - 1)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class CoverageOracle:
+    """通过 afl-showmap 获取输入的边覆盖，维护全局 virgin 位图"""
+
+    def __init__(self, command_template, timeout=10):
+        self.command_template = command_template
+        self.timeout = timeout
+        self.virgin = bytearray(MAP_SIZE)
+        self.bitmap_hashes = set()
+
+    def edges(self, path):
+        with tempfile.NamedTemporaryFile(suffix='.map') as out:
+            cmd = self.command_template.replace('{out}', out.name).replace('@@', path)
+            try:
+                with open(path, 'rb') as stdin:
+                    subprocess.run(shlex.split(cmd), stdin=stdin, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                return []
+            edges = []
+            for line in open(out.name):
+                edge, _, hits = line.strip().partition(':')
+                if edge and hits:
+                    edges.append((int(edge) % MAP_SIZE, count_class_bit(int(hits))))
+            return edges
+
+    def is_novel(self, path):
+        """有新的 (边, 分桶) 或位图从未出现过时才认为新颖，并更新 virgin 位图"""
+        edges = self.edges(path)
+        digest = content_hash(repr(sorted(edges)).encode())
+        if digest in self.bitmap_hashes:
+            return False
+        self.bitmap_hashes.add(digest)
+
+        novel = False
+        for edge, bucket in edges:
+            if not self.virgin[edge] & bucket:
+                self.virgin[edge] |= bucket
+                novel = True
+        return novel
+
+
+class QueueSync:
+    def __init__(self, results_dir, target, run, fuzzers, oracle=None):
+        self.results_dir = results_dir
+        self.target = target
+        self.run = run
+        self.fuzzers = fuzzers
+        self.oracle = oracle
+        self.holders = {}
+        self.last_id = {f: -1 for f in fuzzers}
+        self.next_sync_id = {}
+        self.imported = 0
+
+    def output_dir(self, fuzzer):
+        return os.path.join(self.results_dir, f"{self.target}-{fuzzer}-{self.run}")
+
+    def sync_dir(self, dst):
+        """dst 容器的导入目录（容器内 /opt/fuzzing/sync/queue-sync/queue）"""
+        return os.path.join(self.results_dir, f"sync-{self.target}-{self.run}", dst, 'queue')
+
+    def new_entries(self, fuzzer):
+        """返回自上次扫描以来新出现的 queue 条目（AFL id 单调递增）"""
+        queue_dir = os.path.join(self.output_dir(fuzzer), 'queue')
+        if not os.path.isdir(queue_dir):
+            return []
+        entries = []
+        with os.scandir(queue_dir) as it:
+            for entry in it:
+                match = ID_RE.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                case_id = int(match.group(1))
+                if case_id > self.last_id[fuzzer]:
+                    entries.append((case_id, entry.name, entry.path))
+        entries.sort()
+        if entries:
+            self.last_id[fuzzer] = entries[-1][0]
+        return entries
+
+    def fuzzer_bit(self, fuzzer):
+        return 1 << self.fuzzers.index(fuzzer)
+
+    def import_entry(self, src, case_id, data, holders):
+        """导入到尚未持有该内容的容器，返回 (新的持有者位掩码, 是否写出)"""
+        written = False
+        for dst in self.fuzzers:
+            if holders & self.fuzzer_bit(dst) or not os.path.isdir(self.output_dir(dst)):
+                continue
+            directory = self.sync_dir(dst)
+            if dst not in self.next_sync_id:
+                os.makedirs(directory, exist_ok=True)
+                ids = [int(m.group(1)) for m in map(ID_RE.match, os.listdir(directory)) if m]
+                self.next_sync_id[dst] = max(ids, default=-1) + 1
+            # AFL 只同步 id 不小于上次记录值的条目，id 必须单调递增
+            name = f"id:{self.next_sync_id[dst]:06d},sync:{src},src:{case_id:06d}"
+            self.next_sync_id[dst] += 1
+            tmp_path = os.path.join(directory, '.' + name)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_path, os.path.join(directory, name))
+            holders |= self.fuzzer_bit(dst)
+            written = True
+        if written:
+            self.imported += 1
+        return holders, written
+
+    def index_synced(self):
+        """把之前已导入到同步目录的内容加入索引，守护进程重启后不会重复导入"""
+        for dst in self.fuzzers:
+            directory = self.sync_dir(dst)
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith('id:') and entry.is_file():
+                        with open(entry.path, 'rb') as f:
+                            digest = content_hash(f.read())
+                        self.holders[digest] = self.holders.get(digest, 0) | self.fuzzer_bit(dst)
+
+    def poll(self, import_new=True):
+        """扫描所有 queue 一次，返回本轮导入的条目数"""
+        # 第一遍：登记本轮所有新条目的持有者，同时出现在多个容器的内容不会互相导入
+        candidates = []
+        for src in self.fuzzers:
+            for case_id, name, path in self.new_entries(src):
+                # 其他容器同步进来的条目不再回传
+                if ',sync:' in name:
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = content_hash(data)
+                if digest not in self.holders:
+                    candidates.append((digest, src, case_id, path, data))
+                self.holders[digest] = self.holders.get(digest, 0) | self.fuzzer_bit(src)
+
+        # 第二遍：只有此前从未见过的内容才可能导入
+        imported = 0
+        for digest, src, case_id, path, data in candidates:
+            if self.oracle is not None and not self.oracle.is_novel(path):
+                continue
+            if import_new:
+                self.holders[digest], written = self.import_entry(src, case_id, data, self.holders[digest])
+                imported += written
+        return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicating queue sync between fuzzer containers")
+    parser.add_argument('--results', default='./results', help='shared results directory')
+    parser.add_argument('--target', required=True, help='target name, e.g. libmodbus, opener')
+    parser.add_argument('--run', default='1', help='run number')
+    parser.add_argument('--fuzzers', nargs='+', default=FUZZERS)
+    parser.add_argument('--interval', type=float, default=30.0, help='seconds between scans')
+    parser.add_argument('--showmap', help='afl-showmap command template ({out} = map file, @@ = input)')
+    parser.add_argument('--once', action='store_true', help='scan once and exit')
+    parser.add_argument('--no-backfill', action='store_true',
+                        help='index existing entries at startup without importing them')
+    args = parser.parse_args()
+
+    oracle = CoverageOracle(args.showmap) if args.showmap else None
+    sync = QueueSync(args.results, args.target, args.run, args.fuzzers, oracle)
+
+    print(f"[sync] {args.target} run #{args.run}: {', '.join(args.fuzzers)}", flush=True)
+    sync.index_synced()
+    first = sync.poll(import_new=not args.no_backfill)
+    print(f"[sync] initial scan: {len(sync.holders)} unique entries, {first} imported", flush=True)
+    if args.once:
+        return 0
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            count = sync.poll()
+            if count:
+                print(f"[sync] imported {count} novel entries "
+                      f"(total {sync.imported}, index {len(sync.holders)})", flush=True)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
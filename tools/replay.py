@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Python 版测试用例重放引擎（与 aflnet-replay 的发送/接收语义一致）
+每个测试用例建立一次 TCP 连接，按顺序发送消息，用协议分帧器判断响应是否完整。
+
+--profile 模式记录每条消息的 connect / 首字节 / 完整响应耗时，
+可选用 perf 对服务器进程采样，汇总整个 queue 重放期间的热点函数，
+判断吞吐瓶颈在目标代码还是 harness（accept 循环、fork、sleep 等）。
+--server 由 supervisor.py 启动覆盖率版服务器，端口可连接即开始重放（不发送握手探测，
+探测报文不会计入覆盖率），服务器退出时自动重启。
+--telemetry 在每个测试用例前后采样服务器的 /proc 资源（见 telemetry.py），标记资源耗尽候选。
+--adaptive 使用按协议学习的 p99 * k 截止时间（见 timeout_model.py），挂起的测试用例另存到 replay-hangs。
+
+使用方法:
+  python3 tools/replay.py opener aflnet 1
+  python3 tools/replay.py libslmp2 a3 1 --profile --perf --report profile-libslmp2-a3-1.json
+  python3 tools/replay.py libmodbus aflnet 1 --input /path/to/replayable-crashes
+  python3 tools/replay.py libplctag a2 1 --server
+  python3 tools/replay.py iec104 aflnet 1 --telemetry --report telemetry-iec104-aflnet-1.json
+  python3 tools/replay.py opener a3 1 --adaptive --timeout 5
+  python3 tools/replay.py libmodbus aflnet 1 --limit 50 --pcap libmodbus-aflnet-1.pcap
+  python3 tools/replay.py opener a3 1 --input campaign.cpk     # corpus.py pack 生成的打包文件
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from corpus import CorpusArchive, is_archive, iter_testcases
+from framers import is_complete
+from pcap_convert import PcapWriter
+from replayable import find_queue_dir, list_testcases
+from supervisor import ServerSupervisor, port_open
+from targets import BASE_DIR, get_target, results_dir
+from telemetry import TelemetryRecorder, print_report
+from timeout_model import DEFAULT_K, HANG_RUN, SEVERITY, TimeoutModel, classify_testcase
+
+RECV_SIZE = 4096
+
+
+def replay_testcase(host, port, protocol, messages, response_timeout=1.0, connect_timeout=2.0,
+                    grace=0.0, max_silent=None):
+    """
+    重放一个测试用例，返回:
+      {'connect': 秒, 'messages': [{'size', 'first_byte', 'full', 'response', 'complete', 'status'}], 'error'}
+    first_byte / full 为从发送完成到收到首字节 / 完整响应的耗时，没有响应时为 None
+    grace > 0 时截止时间后继续等待 grace 秒以区分迟到响应和挂起，status 取值见 timeout_model.py；
+    max_silent 条消息连续没有任何响应时视为挂起，不再发送剩余消息，保证单个测试用例的耗时有上界
+    """
+    result = {'connect': None, 'messages': [], 'error': None}
+    start = time.perf_counter()
+    try:
+        sock = socket.create_connection((host, port), timeout=connect_timeout)
+    except OSError as e:
+        result['error'] = f"connect: {e}"
+        return result
+    result['connect'] = time.perf_counter() - start
+
+    silent_run = 0
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for msg in messages:
+            entry = {'size': len(msg), 'first_byte': None, 'full': None,
+                     'response': b'', 'complete': False, 'status': 'silent'}
+            result['messages'].append(entry)
+            try:
+                sock.sendall(msg)
+            except OSError as e:
+                result['error'] = f"send: {e}"
+                break
+            sent = time.perf_counter()
+            deadline = sent + response_timeout + grace
+            chunks = []
+            received = b''
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    chunk = sock.recv(RECV_SIZE)
+                except socket.timeout:
+                    break
+                except OSError as e:
+                    result['error'] = f"recv: {e}"
+                    entry['status'] = 'reset'
+                    break
+                if not chunk:
+                    result['error'] = 'closed'
+                    entry['status'] = 'reset'
+                    break
+                if entry['first_byte'] is None:
+                    entry['first_byte'] = time.perf_counter() - sent
+                chunks.append(chunk)
+                received = b''.join(chunks)
+                if is_complete(protocol, received):
+                    entry['complete'] = True
+                    break
+            if chunks:
+                entry['full'] = time.perf_counter() - sent
+                entry['response'] = received
+            if entry['complete']:
+                entry['status'] = 'ok' if entry['full'] <= response_timeout else 'late'
+            elif chunks and entry['status'] != 'reset':
+                entry['status'] = 'partial'
+            silent_run = silent_run + 1 if entry['status'] == 'silent' else 0
+            if result['error'] or (max_silent and silent_run >= max_silent):
+                break
+    finally:
+        sock.close()
+    return result
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(values):
+    """返回 count / mean / p50 / p95 / p99 / max（毫秒）"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {'count': 0}
+    ms = [v * 1000.0 for v in values]
+    return {
+        'count': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'max_ms': round(ms[-1], 3),
+    }
+
+
+def find_listener_pid(port):
+    """通过 /proc/net/tcp{,6} 找到监听指定端口的进程 PID"""
+    inodes = set()
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    local_port = int(fields[1].rsplit(':', 1)[1], 16)
+                    if local_port == port and fields[3] == '0A':  # TCP_LISTEN
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    if not inodes:
+        return None
+    targets = {f"socket:[{inode}]" for inode in inodes}
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            for fd in os.listdir(fd_dir):
+                if os.readlink(os.path.join(fd_dir, fd)) in targets:
+                    return int(pid)
+        except OSError:
+            continue
+    return None
+
+
+# perf 热点分类：harness 开销 vs 目标代码
+# 先按 DSO / [k] 标志确定样本来源（内核、libc、libgcov），再在该来源内按符号名精确匹配；
+# 目标二进制自身的符号一律算 target，不会因为名字里含 send/poll 之类子串被算成开销
+KERNEL_OVERHEAD = [
+    ('sleep', re.compile(r'^(__x64_sys_|__se_sys_|do_)?(nanosleep|clock_nanosleep|hrtimer_\w+|schedule_timeout\w*)$')),
+    ('accept/poll', re.compile(r'^(__x64_sys_|__se_sys_|__sys_|do_)?(accept4?|poll|ppoll|select|pselect6|epoll_wait|sys_poll)$'
+                               r'|^(inet_csk_accept|inet_csk_wait_for_connect|ep_poll|do_select|do_sys_poll)$')),
+    ('fork/exec', re.compile(r'^(__x64_sys_|__se_sys_|__do_sys_)?(fork|vfork|clone3?|execve|wait4|kernel_clone)$'
+                             r'|^(copy_process|do_wait|exit_mmap|copy_page_range|dup_mm|do_exit|begin_new_exec)$')),
+    ('socket I/O', re.compile(r'^_*(tcp|sock|inet|ip|skb|netif|loopback)_\w*$|^__sys_(recv|send)\w*$')),
+]
+LIBC_OVERHEAD = [
+    ('sleep', re.compile(r'^(__)?(nanosleep|clock_nanosleep|usleep|sleep)(@\S+)?$')),
+    ('accept/poll', re.compile(r'^(__)?(accept4?|poll|ppoll|select|pselect|epoll_wait)(@\S+)?$')),
+    ('fork/exec', re.compile(r'^(__)?(_Fork|fork|vfork|clone3?|execve|waitpid|wait4)(@\S+)?$')),
+    ('socket I/O', re.compile(r'^(__)?(recv|recvfrom|recvmsg|send|sendto|sendmsg|read|write|__libc_(recv|send|read|write)\w*)(@\S+)?$')),
+]
+OVERHEAD_CATEGORIES = ['sleep', 'accept/poll', 'fork/exec', 'socket I/O', 'coverage flush']
+GCOV_SYMBOL = re.compile(r'^(__gcov_|gcov_|__llvm_profile_|__llvm_gcov_|llvm_gcda_)')
+LIBC_DSO = re.compile(r'^(libc|libpthread|ld-linux[\w-]*|ld)(-[\d.]+)?\.so')
+PERF_LINE = re.compile(r'^\s*([\d.]+)%\s+(\S+)\s+\[(.)\]\s+(.+?)\s*$')
+
+
+def classify_sample(dso, kind, symbol):
+    """按 DSO、[k] 标志和符号名给一个 perf 热点归类"""
+    name = os.path.basename(dso)
+    if kind == 'k' or name.startswith('[kernel'):
+        return next((cat for cat, pattern in KERNEL_OVERHEAD if pattern.match(symbol)), 'kernel other')
+    if name.startswith('libgcov') or GCOV_SYMBOL.match(symbol):
+        # gcov 运行时通常静态链接进目标二进制，只能按保留前缀识别
+        return 'coverage flush'
+    if LIBC_DSO.match(name):
+        return next((cat for cat, pattern in LIBC_OVERHEAD if pattern.match(symbol)), 'libc other')
+    return 'target'
+
+
+class PerfSampler:
+    """对服务器进程做 perf record 采样，结束后按函数汇总"""
+
+    def __init__(self, pid, frequency=999):
+        self.pid = pid
+        self.frequency = frequency
+        self.data_file = tempfile.NamedTemporaryFile(prefix='replay-perf-', suffix='.data', delete=False).name
+        self.proc = None
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            ['perf', 'record', '-F', str(self.frequency), '-g', '-p', str(self.pid), '-o', self.data_file],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGINT)
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def hotspots(self, limit=30):
+        out = subprocess.run(
+            ['perf', 'report', '-i', self.data_file, '--stdio', '--no-children',
+             '-g', 'none', '--sort', 'dso,symbol', '--percent-limit', '0.1'],
+            capture_output=True, text=True).stdout
+        functions = []
+        categories = {name: 0.0 for name in OVERHEAD_CATEGORIES + ['kernel other', 'libc other', 'target']}
+        for line in out.splitlines():
+            match = PERF_LINE.match(line)
+            if not match:
+                continue
+            pct, dso, kind, symbol = float(match.group(1)), match.group(2), match.group(3), match.group(4)
+            category = classify_sample(dso, kind, symbol)
+            categories[category] += pct
+            functions.append({'percent': pct, 'dso': dso, 'symbol': symbol, 'category': category})
+        functions.sort(key=lambda f: -f['percent'])
+        return {'categories': {k: round(v, 2) for k, v in categories.items()},
+                'functions': functions[:limit]}
+
+    def cleanup(self):
+        try:
+            os.unlink(self.data_file)
+        except OSError:
+            pass
+
+
+def build_profile(target, results, elapsed, perf_report=None):
+    """把每个测试用例的计时汇总为 profile 报告"""
+    spec = get_target(target)
+    connect = [r['connect'] for r in results]
+    first_byte = [m['first_byte'] for r in results for m in r['messages']]
+    full = [m['full'] for r in results for m in r['messages']]
+    silent = sum(1 for r in results for m in r['messages'] if m['first_byte'] is None)
+    report = {
+        'target': target,
+        'harness': spec['harness'],
+        'testcases': len(results),
+        'messages': sum(len(r['messages']) for r in results),
+        'silent_messages': silent,
+        'elapsed_s': round(elapsed, 3),
+        'testcases_per_s': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        'connect': summarize(connect),
+        'first_byte': summarize(first_byte),
+        'full_response': summarize(full),
+    }
+    if perf_report is not None:
+        categories = perf_report['categories']
+        overhead = sum(categories[k] for k in OVERHEAD_CATEGORIES)
+        report['perf'] = perf_report
+        report['harness_overhead_pct'] = round(overhead, 2)
+        report['verdict'] = (f"harness-bound: optimise {spec['harness']}"
+                             if overhead > categories['target'] else 'target-bound')
+    return report
+
+
+def print_profile(report):
+    print("========================================")
+    print(f"Profile: {report['target']} ({report['harness']})")
+    print(f"  Test cases: {report['testcases']}  Messages: {report['messages']}  "
+          f"Silent: {report['silent_messages']}")
+    print(f"  Elapsed:    {report['elapsed_s']}s ({report['testcases_per_s']} testcases/s)")
+    for phase in ('connect', 'first_byte', 'full_response'):
+        stats = report[phase]
+        if stats['count']:
+            print(f"  {phase:<14} mean={stats['mean_ms']}ms p50={stats['p50_ms']}ms "
+                  f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+    if 'perf' in report:
+        print("  perf categories (% of samples):")
+        for name, pct in sorted(report['perf']['categories'].items(), key=lambda kv: -kv[1]):
+            print(f"    {name:<16} {pct:6.2f}%")
+        print("  top functions:")
+        for func in report['perf']['functions'][:10]:
+            print(f"    {func['percent']:6.2f}%  {func['symbol']}  ({func['dso']}, {func['category']})")
+        print(f"  Verdict: {report['verdict']} (harness overhead {report['harness_overhead_pct']}%)")
+    print("========================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay AFLNet replayable testcases against a running server")
+    parser.add_argument('target')
+    parser.add_argument('fuzzer', nargs='?', default='aflnet')
+    parser.add_argument('run', nargs='?', default='1')
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    parser.add_argument('--input', help='testcase directory or .cpk archive '
+                                        '(default: results/<target>-<fuzzer>-<run>/replayable-queue)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--timeout', type=float, default=1.0, help='per-message response timeout (s)')
+    parser.add_argument('--limit', type=int, help='replay at most N testcases')
+    parser.add_argument('--profile', action='store_true', help='print per-phase timing profile')
+    parser.add_argument('--perf', action='store_true', help='sample the server process with perf during replay')
+    parser.add_argument('--server-pid', type=int, help='server PID for --perf (default: listener on --port)')
+    parser.add_argument('--report', help='write the JSON report to this file')
+    parser.add_argument('--server', action='store_true',
+                        help='start the coverage server, wait on a protocol handshake and restart it if it exits')
+    parser.add_argument('--server-cmd', help='override server command for --server')
+    parser.add_argument('--server-cwd', help='override server working directory for --server')
+    parser.add_argument('--ready-timeout', type=float, default=30.0, help='server readiness timeout (s)')
+    parser.add_argument('--telemetry', action='store_true',
+                        help='sample server RSS / CPU / fds / threads from /proc around every testcase')
+    parser.add_argument('--rss-threshold', type=int, help='flag testcases growing RSS by at least N KB')
+    parser.add_argument('--cpu-threshold', type=float, help='flag testcases using at least N ms of server CPU')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='per-message deadline = p99 * k learned per protocol (--timeout is the initial value and cap)')
+    parser.add_argument('--timeout-k', type=float, default=DEFAULT_K)
+    parser.add_argument('--timeout-model', help='learned model file (default: <base-dir>/benchmarks/timeout-model.json)')
+    parser.add_argument('--pcap', help='write every replayed session (requests and responses) to this pcap')
+    parser.add_argument('--hang-dir', help='copy hanging testcases here (default: replay-hangs next to the input queue)')
+    args = parser.parse_args()
+
+    spec = get_target(args.target)
+    port = args.port or spec['port']
+    input_dir = args.input or find_queue_dir(results_dir(args.target, args.fuzzer, args.run, args.base_dir))
+    archive = None
+    if args.input and is_archive(args.input):
+        # 打包文件: 包含多个 run 时取 <target>-<fuzzer>-<run>/ 下的 queue，否则取根下的 queue
+        archive = CorpusArchive(args.input)
+        run_name = f"{args.target}-{args.fuzzer}-{args.run}"
+        queue = archive.find_queue_dir(run_name if archive.names(run_name + '/') else '')
+        input_dir = f"{args.input}:{queue or '/'}"
+        testcases = archive.list_testcases(queue)
+    elif not os.path.isdir(input_dir):
+        print(f"Error: Input directory {input_dir} does not exist!")
+        return 1
+    else:
+        testcases = list_testcases(input_dir)
+    if args.limit:
+        testcases = testcases[:args.limit]
+
+    print("========================================")
+    print(f"Input directory: {input_dir}")
+    print(f"Total test cases found: {len(testcases)}")
+    print(f"Target port: {port}")
+    print("========================================")
+
+    supervisor = None
+    if args.server:
+        supervisor = ServerSupervisor(args.target, port, args.host, args.server_cmd, args.server_cwd,
+                                      args.base_dir, args.ready_timeout, connect_only=True)
+        try:
+            elapsed = supervisor.start()
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return 1
+        print(f"Server ready (PID {supervisor.pid}) after {elapsed * 1000:.1f}ms")
+
+    sampler = None
+    if args.perf:
+        if shutil.which('perf') is None:
+            print("Error: perf is not installed or not in PATH")
+            return 1
+        pid = args.server_pid or (supervisor and supervisor.pid) or find_listener_pid(port)
+        if pid is None:
+            print(f"Error: no process is listening on port {port} (use --server-pid)")
+            if supervisor:
+                supervisor.close()
+            return 1
+        sampler = PerfSampler(pid)
+        sampler.start()
+
+    recorder = None
+    if args.telemetry:
+        thresholds = {}
+        if args.rss_threshold is not None:
+            thresholds['rss_kb'] = args.rss_threshold
+        if args.cpu_threshold is not None:
+            thresholds['cpu_ms'] = args.cpu_threshold
+        recorder = TelemetryRecorder(thresholds)
+
+    model = None
+    verdicts = {name: 0 for name in SEVERITY}
+    hangs = []
+    if args.adaptive:
+        model = TimeoutModel(args.timeout, args.timeout_k, path=args.timeout_model or
+                             os.path.join(args.base_dir, 'benchmarks', 'timeout-model.json'))
+        hang_dir = args.hang_dir or os.path.join(os.path.dirname(os.path.abspath(args.input if archive else input_dir)),
+                                                 'replay-hangs')
+
+    pcap = PcapWriter(args.pcap) if args.pcap else None
+
+    def server_pid():
+        if supervisor:
+            return supervisor.pid
+        return args.server_pid or find_listener_pid(port)
+
+    results = []
+    failed = 0
+    start = time.perf_counter()
+    try:
+        for path, messages in (archive.iter_testcases(testcases) if archive else iter_testcases(testcases)):
+            if supervisor and supervisor.ensure_running():
+                print(f"Server restarted before {os.path.basename(path)} (restart #{supervisor.restarts})")
+            if recorder:
+                recorder.begin(server_pid())
+            if model:
+                deadline = model.deadline(spec['protocol'])
+                result = replay_testcase(args.host, port, spec['protocol'], messages, deadline,
+                                         grace=deadline, max_silent=HANG_RUN)
+                for m in result['messages']:
+                    if m['complete']:
+                        model.observe(spec['protocol'], m['full'])
+                result['verdict'] = classify_testcase(result, lambda: port_open(args.host, port))
+                verdicts[result['verdict']] += 1
+                if result['verdict'] == 'hang':
+                    os.makedirs(hang_dir, exist_ok=True)
+                    if archive:
+                        with open(os.path.join(hang_dir, os.path.basename(path)), 'wb') as f:
+                            f.write(archive.read(path))
+                    else:
+                        shutil.copy2(path, hang_dir)
+                    hangs.append(path)
+            else:
+                result = replay_testcase(args.host, port, spec['protocol'], messages, args.timeout)
+            result['testcase'] = path
+            if pcap:
+                pcap.write_session(messages[:len(result['messages'])], [m['response'] for m in result['messages']],
+                                   port, time.time())
+            if recorder:
+                recorder.end(server_pid(), path)
+            if result['connect'] is None:
+                failed += 1
+            results.append(result)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+    finally:
+        elapsed = time.perf_counter() - start
+        if sampler:
+            sampler.stop()
+        if supervisor:
+            supervisor.close()
+        if pcap:
+            pcap.close()
+        if archive:
+            archive.close()
+
+    perf_report = None
+    if sampler:
+        perf_report = sampler.hotspots()
+        sampler.cleanup()
+
+    print(f"Replayed {len(results)} test cases in {elapsed:.2f}s, {failed} failed to connect")
+    report = None
+    if model:
+        model.save()
+        print(f"Adaptive deadline: {model.deadline(spec['protocol']) * 1000:.1f}ms "
+              f"(k={args.timeout_k}, model {model.path})")
+        print("  " + "  ".join(f"{name}={count}" for name, count in verdicts.items()))
+        if hangs:
+            print(f"  {len(hangs)} hanging testcase(s) copied to {hang_dir}")
+    if args.profile or args.perf:
+        report = build_profile(args.target, results, elapsed, perf_report)
+        print_profile(report)
+        report['per_testcase'] = [{
+            'testcase': r['testcase'],
+            'connect': r['connect'],
+            'first_byte': [m['first_byte'] for m in r['messages']],
+            'full': [m['full'] for m in r['messages']],
+            'status': [m['status'] for m in r['messages']],
+            'verdict': r.get('verdict'),
+            'error': r['error'],
+        } for r in results]
+    if model:
+        report = report or {'target': args.target, 'testcases': len(results)}
+        report['timeouts'] = {
+            'deadline_ms': round(model.deadline(spec['protocol']) * 1000, 3),
+            'k': args.timeout_k,
+            'verdicts': verdicts,
+            'hangs': hangs,
+        }
+    if recorder:
+        report = report or {'target': args.target, 'testcases': len(results)}
+        report['telemetry'] = recorder.report()
+        print_report(report['telemetry'])
+    if report is not None and args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+AFLNet replayable 测试用例格式读写
+格式: 每条消息为 4 字节小端长度 + 消息内容，依次拼接
+（与 aflnet-replay 读取 replayable-queue / replayable-crashes 的方式一致）
+"""
+
+import os
+import struct
+
+LENGTH_PREFIX = struct.Struct('<I')
+
+
+def parse_messages(data):
+    """把 replayable 字节流拆成消息列表（尾部不完整的消息会被截断保留）"""
+    messages = []
+    offset = 0
+    total = len(data)
+    while offset + LENGTH_PREFIX.size <= total:
+        (size,) = LENGTH_PREFIX.unpack_from(data, offset)
+        offset += LENGTH_PREFIX.size
+        messages.append(data[offset:offset + size])
+        offset += size
+    return messages
+
+
+def read_messages(path):
+    """读取一个 replayable 文件，返回消息列表"""
+    with open(path, 'rb') as f:
+        return parse_messages(f.read())
+
+
+def encode_messages(messages):
+    """把消息列表编码为 replayable 字节流"""
+    parts = []
+    for msg in messages:
+        parts.append(LENGTH_PREFIX.pack(len(msg)))
+        parts.append(bytes(msg))
+    return b''.join(parts)
+
+
+def write_messages(path, messages):
+    """把消息列表写成 replayable 文件"""
+    with open(path, 'wb') as f:
+        f.write(encode_messages(messages))
+
+
+def list_testcases(directory):
+    """列出目录下所有 AFL 风格的测试用例（id:* 文件），按文件名排序"""
+    names = [n for n in os.listdir(directory) if n.startswith('id:')]
+    names.sort()
+    return [os.path.join(directory, n) for n in names
+            if os.path.isfile(os.path.join(directory, n))]
+
+
+def find_queue_dir(output_dir):
+    """优先使用 replayable-queue，不存在时回退到 queue（与 replay-*.sh 一致）"""
+    replayable = os.path.join(output_dir, 'replayable-queue')
+    if os.path.isdir(replayable):
+        return replayable
+    return os.path.join(output_dir, 'queue')
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+模糊测试结果的列式索引
+一次扫描 results/<target>-<fuzzer>-<run>/ 下的 queue、crashes、hangs（及 replayable-* / replay-hangs），
+把 AFL 文件名中的 id / src / time / op / pos / rep / sig / +cov / orig 解析为 numpy 列，
+连同文件大小、mtime、内容哈希（blake2b-128）保存为一个 .npz 文件（默认 results/.results-index.npz）。
+
+  - 增量: 每个目录记录 mtime 和已索引的最大 id，重新扫描时只读取新条目（AFL 的 id 单调递增）
+  - time: 文件名带 time:（AFL++ 风格，毫秒）时直接使用；AFLNet 的文件名没有 time 字段，
+          用 mtime 减去 fuzzer_stats 的 start_time 得到
+  - 覆盖率位图: <run>/bitmaps/<内容哈希>.map（afl-showmap 文本格式）存在时记录边数和位图哈希；
+          --showmap 指定 afl-showmap 命令模板时为缺少位图的条目生成（新条目和已索引但没有位图的条目）
+查询直接在列上做布尔掩码，不再遍历目录。
+
+使用方法:
+  python3 tools/results_index.py scan
+  python3 tools/results_index.py scan --targets opener --showmap "afl-showmap -q -o {out} -- ./OpENer lo"
+  python3 tools/results_index.py query --target opener --fuzzer a3 --cov --after-hours 12
+  python3 tools/results_index.py query --target libmodbus --kind crashes --paths
+  python3 tools/results_index.py stats
+"""
+
+import argparse
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from queue_sync import content_hash
+from targets import BASE_DIR, FUZZERS, TARGETS
+
+ID_RE = re.compile(r'^id:(\d+)')
+KINDS = ['queue', 'crashes', 'hangs', 'replayable-queue', 'replayable-crashes', 'replayable-hangs', 'replay-hangs']
+NO_HASH = bytes(16)
+
+# 每个条目一行的列及其 dtype
+COLUMNS = {
+    'run': np.int16, 'kind': np.uint8, 'id': np.int32, 'src': np.int32, 'time_ms': np.int64,
+    'op': np.int16, 'pos': np.int32, 'rep': np.int32, 'sig': np.int16, 'cov': np.bool_, 'orig': np.bool_,
+    'size': np.int64, 'mtime': np.float64, 'bitmap_edges': np.int32,
+}
+
+
+def parse_run_dir(name):
+    """'freyrscada-iec104-afl-ics-2' -> ('freyrscada-iec104', 'afl-ics', 2)；不是结果目录返回 None"""
+    for target in sorted(TARGETS, key=len, reverse=True):
+        if not name.startswith(target + '-'):
+            continue
+        fuzzer, _, run = name[len(target) + 1:].rpartition('-')
+        if fuzzer in FUZZERS and run.isdigit():
+            return target, fuzzer, int(run)
+    return None
+
+
+def parse_name(name):
+    """解析 AFL 测试用例文件名，缺失的数值字段为 -1"""
+    fields = {'id': -1, 'src': -1, 'time': -1, 'op': '', 'pos': -1, 'rep': -1, 'sig': -1,
+              'cov': False, 'orig': False}
+    for token in name.split(','):
+        if token == '+cov':
+            fields['cov'] = True
+            continue
+        key, _, value = token.partition(':')
+        if key == 'orig':
+            fields['orig'] = True
+        elif key == 'op':
+            fields['op'] = value
+        elif key in ('id', 'src', 'time', 'pos', 'rep', 'sig'):
+            # src:000001+000002（拼接）只取第一个来源
+            digits = re.match(r'\d+', value)
+            if digits:
+                fields[key] = int(digits.group(0))
+    return fields
+
+
+def read_start_time(run_dir):
+    try:
+        with open(os.path.join(run_dir, 'fuzzer_stats')) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() == 'start_time':
+                    return float(value.strip())
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_bitmap(path):
+    """afl-showmap 文本输出 -> (边数, 位图哈希)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    lines = sorted(line for line in data.split(b'\n') if line)
+    return len(lines), content_hash(b'\n'.join(lines))
+
+
+class ResultsIndex:
+    def __init__(self, path):
+        self.path = path
+        self.columns = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.hash = np.zeros((0, 16), dtype=np.uint8)
+        self.bitmap = np.zeros((0, 16), dtype=np.uint8)
+        self.name = np.zeros(0, dtype='S1')
+        self.runs = []      # (target, fuzzer, run, 目录, start_time)
+        self.ops = []
+        self.dirs = {}      # (run 下标, kind 下标) -> (mtime, 最大 id)
+        if os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            for name in COLUMNS:
+                self.columns[name] = data[name]
+            self.hash = data['hash']
+            self.bitmap = data['bitmap']
+            self.name = data['name']
+            self.runs = [(t, f, int(r), d, float(s) if s == s else None) for t, f, r, d, s in zip(
+                data['run_target'].tolist(), data['run_fuzzer'].tolist(), data['run_num'].tolist(),
+                data['run_dir'].tolist(), data['run_start'].tolist())]
+            self.ops = data['ops'].tolist()
+            self.dirs = {(int(r), int(k)): (float(m), int(i)) for r, k, m, i in zip(
+                data['dir_run'], data['dir_kind'], data['dir_mtime'], data['dir_maxid'])}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        dirs = sorted(self.dirs.items())
+        tmp = self.path + '.tmp.npz'
+        np.savez(tmp, hash=self.hash, bitmap=self.bitmap, name=self.name,
+                 run_target=np.array([r[0] for r in self.runs], dtype='U'),
+                 run_fuzzer=np.array([r[1] for r in self.runs], dtype='U'),
+                 run_num=np.array([r[2] for r in self.runs], dtype=np.int32),
+                 run_dir=np.array([r[3] for r in self.runs], dtype='U'),
+                 run_start=np.array([r[4] if r[4] is not None else np.nan for r in self.runs], dtype=np.float64),
+                 ops=np.array(self.ops, dtype='U'),
+                 dir_run=np.array([k[0] for k, _ in dirs], dtype=np.int16),
+                 dir_kind=np.array([k[1] for k, _ in dirs], dtype=np.uint8),
+                 dir_mtime=np.array([v[0] for _, v in dirs], dtype=np.float64),
+                 dir_maxid=np.array([v[1] for _, v in dirs], dtype=np.int32),
+                 **self.columns)
+        os.replace(tmp, self.path)
+
+    def _run_index(self, target, fuzzer, run, run_dir):
+        for i, (t, f, r, _, _) in enumerate(self.runs):
+            if (t, f, r) == (target, fuzzer, run):
+                start = read_start_time(run_dir)
+                if start is not None and self.runs[i][4] is None:
+                    self.runs[i] = (t, f, r, run_dir, start)
+                return i
+        self.runs.append((target, fuzzer, run, run_dir, read_start_time(run_dir)))
+        return len(self.runs) - 1
+
+    def _op_index(self, op):
+        if not op:
+            return -1
+        if op not in self.ops:
+            self.ops.append(op)
+        return self.ops.index(op)
+
+    def scan(self, results_dir, targets=None, hashes=True, showmap=None, showmap_timeout=10):
+        """扫描结果目录，追加新条目，返回新增条目数"""
+        rows = {name: [] for name in COLUMNS}
+        new_hashes, new_bitmaps, new_names = [], [], []
+        for run_name in sorted(os.listdir(results_dir)):
+            parsed = parse_run_dir(run_name)
+            if not parsed or (targets and parsed[0] not in targets):
+                continue
+            run_dir = os.path.join(results_dir, run_name)
+            run = self._run_index(*parsed, run_dir)
+            start = self.runs[run][4]
+            bitmap_dir = os.path.join(run_dir, 'bitmaps')
+            for kind, kind_name in enumerate(KINDS):
+                directory = os.path.join(run_dir, kind_name)
+                if not os.path.isdir(directory):
+                    continue
+                mtime = os.stat(directory).st_mtime
+                last_mtime, max_id = self.dirs.get((run, kind), (None, -1))
+                if last_mtime == mtime:
+                    continue
+                entries = []
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        match = ID_RE.match(entry.name)
+                        if match and int(match.group(1)) > max_id and entry.is_file():
+                            entries.append((int(match.group(1)), entry))
+                entries.sort(key=lambda item: item[0])
+                for case_id, entry in entries:
+                    stat = entry.stat()
+                    fields = parse_name(entry.name)
+                    if fields['time'] >= 0:
+                        time_ms = fields['time']
+                    elif start is not None:
+                        time_ms = max(int((stat.st_mtime - start) * 1000), 0)
+                    else:
+                        time_ms = -1
+                    digest = NO_HASH
+                    if hashes:
+                        with open(entry.path, 'rb') as f:
+                            digest = content_hash(f.read())
+                    edges, bitmap = self._bitmap(bitmap_dir, digest, entry.path, showmap, showmap_timeout)
+                    for key, value in (('run', run), ('kind', kind), ('id', case_id), ('src', fields['src']),
+                                       ('time_ms', time_ms), ('op', self._op_index(fields['op'])),
+                                       ('pos', fields['pos']), ('rep', fields['rep']), ('sig', fields['sig']),
+                                       ('cov', fields['cov']), ('orig', fields['orig']), ('size', stat.st_size),
+                                       ('mtime', stat.st_mtime), ('bitmap_edges', edges)):
+                        rows[key].append(value)
+                    new_hashes.append(digest)
+                    new_bitmaps.append(bitmap)
+                    new_names.append(entry.name.encode())
+                    max_id = case_id
+                self.dirs[(run, kind)] = (mtime, max_id)
+
+        if new_names:
+            for name, dtype in COLUMNS.items():
+                self.columns[name] = np.concatenate([self.columns[name], np.array(rows[name], dtype=dtype)])
+            self.hash = np.vstack([self.hash, np.frombuffer(b''.join(new_hashes), dtype=np.uint8).reshape(-1, 16)])
+            self.bitmap = np.vstack([self.bitmap, np.frombuffer(b''.join(new_bitmaps), dtype=np.uint8).reshape(-1, 16)])
+            self.name = np.concatenate([self.name.astype('S'), np.array(new_names, dtype='S')])
+        return len(new_names)
+
+    def fill_bitmaps(self, targets=None, showmap=None, timeout=10):
+        """为已索引但没有位图的条目查找 / 生成位图（scan 只访问新条目），返回补上的条目数"""
+        missing = (self.columns['bitmap_edges'] < 0) & self.hash.any(axis=1)
+        if targets:
+            wanted = [i for i, run in enumerate(self.runs) if run[0] in targets]
+            missing &= np.isin(self.columns['run'], wanted)
+        filled = 0
+        for row in np.nonzero(missing)[0]:
+            path = self.path_of(row)
+            if not os.path.exists(path):
+                continue
+            bitmap_dir = os.path.join(self.runs[self.columns['run'][row]][3], 'bitmaps')
+            edges, bitmap = self._bitmap(bitmap_dir, self.hash[row].tobytes(), path, showmap, timeout)
+            if edges >= 0:
+                self.columns['bitmap_edges'][row] = edges
+                self.bitmap[row] = np.frombuffer(bitmap, dtype=np.uint8)
+                filled += 1
+        return filled
+
+    def _bitmap(self, bitmap_dir, digest, path, showmap, timeout):
+        """返回 (边数, 位图哈希)；没有位图时为 (-1, 全零)"""
+        if digest == NO_HASH:
+            return -1, NO_HASH
+        map_path = os.path.join(bitmap_dir, digest.hex() + '.map')
+        if not os.path.exists(map_path) and showmap:
+            os.makedirs(bitmap_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=bitmap_dir, suffix='.tmp', delete=False) as out:
+                tmp = out.name
+            cmd = showmap.replace('{out}', tmp).replace('@@', path)
+            try:
+                with open(path, 'rb') as stdin:
+                    subprocess.run(shlex.split(cmd), stdin=stdin, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=timeout)
+                os.replace(tmp, map_path)
+            except (OSError, subprocess.TimeoutExpired):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        if not os.path.exists(map_path):
+            return -1, NO_HASH
+        return read_bitmap(map_path)
+
+    def select(self, target=None, fuzzer=None, run=None, kind=None, cov=None, op=None,
+               after_ms=None, before_ms=None):
+        """返回满足条件的行的布尔掩码"""
+        mask = np.ones(len(self), dtype=bool)
+        if target or fuzzer or run is not None:
+            wanted = [i for i, (t, f, r, _, _) in enumerate(self.runs)
+                      if (not target or t == target) and (not fuzzer or f == fuzzer) and (run is None or r == run)]
+            mask &= np.isin(self.columns['run'], wanted)
+        if kind:
+            mask &= self.columns['kind'] == KINDS.index(kind)
+        if cov is not None:
+            mask &= self.columns['cov'] == cov
+        if op:
+            mask &= self.columns['op'] == (self.ops.index(op) if op in self.ops else -2)
+        if after_ms is not None:
+            mask &= self.columns['time_ms'] >= after_ms
+        if before_ms is not None:
+            mask &= (self.columns['time_ms'] >= 0) & (self.columns['time_ms'] < before_ms)
+        return mask
+
+    def path_of(self, row):
+        run = self.runs[self.columns['run'][row]]
+        return os.path.join(run[3], KINDS[self.columns['kind'][row]], self.name[row].decode())
+
+
+def print_stats(index):
+    print("========================================")
+    print(f"Results index: {len(index)} entries, {len(index.runs)} runs")
+    print(f"  {'run':<32} {'queue':>7} {'+cov':>7} {'crashes':>8} {'hangs':>6} {'unique':>7} {'bitmaps':>8}")
+    run_col, kind_col = index.columns['run'], index.columns['kind']
+    for i, (target, fuzzer, run, _, _) in enumerate(index.runs):
+        rows = run_col == i
+        queue = rows & (kind_col == KINDS.index('queue'))
+        hashes = index.hash[rows]
+        unique = len(np.unique(hashes, axis=0)) if len(hashes) else 0
+        print(f"  {f'{target}-{fuzzer}-{run}':<32} {int(queue.sum()):>7} {int((queue & index.columns['cov']).sum()):>7} "
+              f"{int((rows & (kind_col == KINDS.index('crashes'))).sum()):>8} "
+              f"{int((rows & (kind_col == KINDS.index('hangs'))).sum()):>6} {unique:>7} "
+              f"{int((rows & (index.columns['bitmap_edges'] >= 0)).sum()):>8}")
+    print("========================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar index of queue / crash / hang metadata across result directories")
+    parser.add_argument('--results', default=os.path.join(BASE_DIR, 'results'))
+    parser.add_argument('--index', help='index file (default: <results>/.results-index.npz)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    scan = sub.add_parser('scan', help='index new entries (incremental)')
+    scan.add_argument('--targets', nargs='+', help='only these targets')
+    scan.add_argument('--no-hash', action='store_true', help='skip content hashing (faster, no dedup / bitmap links)')
+    scan.add_argument('--showmap', help='afl-showmap command template ({out} = map file, @@ = input) for missing bitmaps')
+    scan.add_argument('--rebuild', action='store_true', help='discard the existing index first')
+
+    query = sub.add_parser('query', help='filter entries')
+    query.add_argument('--target')
+    query.add_argument('--fuzzer')
+    query.add_argument('--run', type=int)
+    query.add_argument('--kind', choices=KINDS)
+    query.add_argument('--cov', action='store_true', help='only +cov entries')
+    query.add_argument('--op', help='mutation operator, e.g. havoc')
+    query.add_argument('--after-hours', type=float)
+    query.add_argument('--before-hours', type=float)
+    query.add_argument('--paths', action='store_true', help='print matching file paths')
+    query.add_argument('--unique', action='store_true', help='count distinct contents only')
+
+    sub.add_parser('stats', help='per-run summary')
+    args = parser.parse_args()
+
+    path = args.index or os.path.join(args.results, '.results-index.npz')
+    if args.command == 'scan':
+        if not os.path.isdir(args.results):
+            print(f"Error: {args.results} does not exist")
+            return 1
+        if args.rebuild and os.path.exists(path):
+            os.remove(path)
+        index = ResultsIndex(path)
+        start = time.perf_counter()
+        filled = index.fill_bitmaps(args.targets, args.showmap) if args.showmap else 0
+        added = index.scan(args.results, args.targets, not args.no_hash, args.showmap)
+        index.save()
+        print(f"Indexed {added} new entries in {time.perf_counter() - start:.2f}s "
+              f"({len(index)} total) -> {path}")
+        if filled:
+            print(f"Added bitmaps for {filled} previously indexed entries")
+        return 0
+
+    if not os.path.exists(path):
+        print(f"Error: {path} not found (run 'scan' first)")
+        return 1
+    start = time.perf_counter()
+    index = ResultsIndex(path)
+    if args.command == 'stats':
+        print_stats(index)
+        return 0
+
+    kind = args.kind or ('queue' if args.cov else None)
+    mask = index.select(args.target, args.fuzzer, args.run, kind, True if args.cov else None, args.op,
+                        args.after_hours * 3600000 if args.after_hours is not None else None,
+                        args.before_hours * 3600000 if args.before_hours is not None else None)
+    rows = np.nonzero(mask)[0]
+    count = len(np.unique(index.hash[rows], axis=0)) if args.unique and len(rows) else len(rows)
+    elapsed = (time.perf_counter() - start) * 1000
+    if args.paths:
+        for row in rows:
+            print(index.path_of(row))
+    print(f"{count} matching {'unique ' if args.unique else ''}entries ({elapsed:.1f} ms including index load)",
+          file=sys.stderr if args.paths else sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+从重放轨迹推断协议状态机
+重放各模糊器的 queue，按协议解析每条响应得到状态标识（与 AFLNet 用响应码作为状态的思路一致）:
+  MODBUS      功能码，异常响应为 fcXX:exYY
+  ETHERNETIP  封装命令 / 状态，如 0065/0
+  IEC104      帧类型: I:<类型标识>:<传送原因> / S / STARTDT_CON 等 U 帧
+  SLMPB/A     结束代码，如 end:0000
+每个测试用例得到一条 INIT -> s1 -> s2 ... 的路径，累加到状态图的转移计数中；
+没有响应的消息不产生状态，连接被关闭记为 RESET。
+
+模型按目标保存为 JSON（默认 <base-dir>/benchmarks/state-model-<target>.json），可跨多次运行增量更新:
+每个 queue 只重放上次之后新增的测试用例（按 id 记录进度）。
+状态名按出现顺序编号，转移以 (src << 32 | dst) 为键计数，每个模糊器到达的状态保存为位掩码，
+便于比较哪个模糊器探索了哪些状态。
+
+使用方法:
+  python3 tools/state_model.py update libmodbus --run 1                      # 重放所有模糊器的 queue（服务器需已启动）
+  python3 tools/state_model.py update opener --run 2 --fuzzers aflnet a3 --server
+  python3 tools/state_model.py update libslmp2 --input seeds/slmp --label seeds
+  python3 tools/state_model.py sessions libmodbus /tmp/modbus-session.json --label manual
+  python3 tools/state_model.py show /home/ecs-user/LLM_fuzz_experiment/benchmarks/state-model-libmodbus.json
+  python3 tools/state_model.py dot state-model-opener.json -o opener-states.dot
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from corpus import open_testcase
+from framers import split_messages
+from replay import replay_testcase
+from replayable import find_queue_dir, list_testcases
+from supervisor import ServerSupervisor
+from targets import BASE_DIR, FUZZERS, get_target, results_dir
+
+ID_RE = re.compile(r'^id:(\d+)')
+INIT = 'INIT'
+RESET = 'RESET'
+
+IEC104_U_FRAMES = {
+    0x07: 'STARTDT_ACT', 0x0b: 'STARTDT_CON',
+    0x13: 'STOPDT_ACT', 0x23: 'STOPDT_CON',
+    0x43: 'TESTFR_ACT', 0x83: 'TESTFR_CON',
+}
+
+
+def modbus_state(frame):
+    if len(frame) < 8:
+        return 'short'
+    fc = frame[7]
+    if fc & 0x80 and len(frame) >= 9:
+        return f"fc{fc & 0x7f:02x}:ex{frame[8]:02x}"
+    return f"fc{fc:02x}"
+
+
+def ethernetip_state(frame):
+    if len(frame) < 12:
+        return 'short'
+    command = frame[0] | (frame[1] << 8)
+    status = int.from_bytes(frame[8:12], 'little')
+    return f"{command:04x}/{status:x}"
+
+
+def iec104_state(frame):
+    if len(frame) < 6 or frame[0] != 0x68:
+        return 'invalid'
+    control = frame[2]
+    if control & 0x01 == 0:
+        if len(frame) >= 9:
+            return f"I:{frame[6]}:{frame[8] & 0x3f}"
+        return 'I'
+    if control & 0x03 == 0x01:
+        return 'S'
+    return IEC104_U_FRAMES.get(control, f"U:{control:02x}")
+
+
+def slmp_state(frame):
+    if len(frame) < 11:
+        return 'short'
+    return f"end:{frame[9] | (frame[10] << 8):04x}"
+
+
+def slmp_ascii_state(frame):
+    try:
+        return slmp_state(bytes.fromhex(bytes(frame).decode('ascii')))
+    except ValueError:
+        return 'invalid'
+
+
+EXTRACTORS = {
+    'MODBUS': modbus_state,
+    'ETHERNETIP': ethernetip_state,
+    'IEC104': iec104_state,
+    'SLMPB': slmp_state,
+    'SLMPA': slmp_ascii_state,
+}
+
+
+def response_states(protocol, response):
+    """一条消息的响应（可能包含多帧）-> 状态名列表"""
+    if not response:
+        return []
+    frames, rest = split_messages(protocol, response)
+    states = [EXTRACTORS[protocol](bytes(f)) for f in frames]
+    if len(rest):
+        states.append('partial')
+    return states
+
+
+def trace_states(protocol, result):
+    """replay_testcase 的结果 -> 状态路径（不含 INIT）"""
+    path = []
+    for message in result['messages']:
+        path.extend(response_states(protocol, message['response']))
+        if message['status'] == 'reset':
+            path.append(RESET)
+    return path
+
+
+def testcase_id(path):
+    match = ID_RE.match(os.path.basename(path))
+    return int(match.group(1)) if match else -1
+
+
+class StateModel:
+    """
+    states: 状态名列表（下标即状态编号，0 为 INIT）
+    edges:  (src << 32 | dst) -> 次数
+    fuzzers: 名称 -> {'states': 位掩码, 'edges': 转移键集合, 'testcases': 数量}
+    witness: 状态编号 -> 第一个到达该状态的测试用例
+    progress: queue 目录 -> 已处理的最大测试用例 id
+    """
+
+    def __init__(self, target, path=None):
+        self.target = target
+        self.path = path
+        self.states = [INIT]
+        self.index = {INIT: 0}
+        self.edges = {}
+        self.fuzzers = {}
+        self.witness = {}
+        self.progress = {}
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def state_id(self, name):
+        sid = self.index.get(name)
+        if sid is None:
+            sid = self.index[name] = len(self.states)
+            self.states.append(name)
+        return sid
+
+    def add_trace(self, fuzzer, names, testcase=None):
+        info = self.fuzzers.setdefault(fuzzer, {'states': 1, 'edges': set(), 'testcases': 0})
+        info['testcases'] += 1
+        src = 0
+        for name in names:
+            dst = self.state_id(name)
+            key = (src << 32) | dst
+            self.edges[key] = self.edges.get(key, 0) + 1
+            info['states'] |= 1 << dst
+            info['edges'].add(key)
+            if dst not in self.witness and testcase:
+                self.witness[dst] = testcase
+            src = dst
+
+    def visits(self):
+        """每个状态被进入的次数"""
+        counts = [0] * len(self.states)
+        for key, count in self.edges.items():
+            counts[key & 0xFFFFFFFF] += count
+        return counts
+
+    def exclusive(self):
+        """模糊器 -> 只有它到达的状态编号列表"""
+        result = {}
+        for name, info in self.fuzzers.items():
+            others = 0
+            for other, other_info in self.fuzzers.items():
+                if other != name:
+                    others |= other_info['states']
+            mask = info['states'] & ~others
+            result[name] = [sid for sid in range(len(self.states)) if mask >> sid & 1]
+        return result
+
+    def load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        self.states = data['states']
+        self.index = {name: i for i, name in enumerate(self.states)}
+        self.edges = {(src << 32) | dst: count for src, dst, count in data['edges']}
+        self.fuzzers = {name: {'states': int(info['states'], 16), 'edges': set(info['edges']),
+                               'testcases': info['testcases']}
+                        for name, info in data['fuzzers'].items()}
+        self.witness = {int(sid): path for sid, path in data.get('witness', {}).items()}
+        self.progress = data.get('progress', {})
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        data = {
+            'target': self.target,
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'states': self.states,
+            'edges': sorted([key >> 32, key & 0xFFFFFFFF, count] for key, count in self.edges.items()),
+            'fuzzers': {name: {'states': f"{info['states']:x}", 'edges': sorted(info['edges']),
+                               'testcases': info['testcases']}
+                        for name, info in sorted(self.fuzzers.items())},
+            'witness': {str(sid): path for sid, path in sorted(self.witness.items())},
+            'progress': self.progress,
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+def replay_queue(model, label, queue_dir, protocol, host, port, timeout, jobs=1, limit=None, supervisor=None):
+    """重放 queue 中上次之后新增的测试用例并加入模型，返回处理的数量"""
+    key = os.path.abspath(queue_dir)
+    last = model.progress.get(key, -1)
+    testcases = [p for p in list_testcases(queue_dir) if testcase_id(p) > last]
+    if limit:
+        testcases = testcases[:limit]
+    if not testcases:
+        return 0
+
+    def run(path):
+        if supervisor:
+            supervisor.ensure_running()
+        with open_testcase(path) as messages:
+            return path, replay_testcase(host, port, protocol, messages, timeout)
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        # map 保持提交顺序，进度记录始终对应连续处理完的前缀
+        for path, result in pool.map(run, testcases):
+            if result['connect'] is None:
+                print(f"Warning: cannot connect for {os.path.basename(path)}: {result['error']}")
+                break
+            model.add_trace(label, trace_states(protocol, result), path)
+            model.progress[key] = max(model.progress.get(key, -1), testcase_id(path))
+            done += 1
+    return done
+
+
+def load_session(path):
+    """session_recorder.py 的 JSON 旁路文件 -> 每个请求的响应字节"""
+    with open(path) as f:
+        data = json.load(f)
+    return [b''.join(bytes.fromhex(r['hex']) for r in request['responses']) for request in data['requests']]
+
+
+def print_model(model, top=20):
+    visits = model.visits()
+    names = sorted(model.fuzzers)
+    print("========================================")
+    print(f"State model: {model.target} ({len(model.states)} states, {len(model.edges)} transitions)")
+    for name in names:
+        info = model.fuzzers[name]
+        print(f"  {name:<10} testcases={info['testcases']:<7} states={bin(info['states']).count('1'):<4} "
+              f"transitions={len(info['edges'])}")
+    print()
+    header = f"  {'id':>4}  {'state':<20} {'visits':>9}  " + ' '.join(f"{n[:8]:>8}" for n in names)
+    print(header)
+    for sid, state in enumerate(model.states):
+        marks = ' '.join(f"{'x' if model.fuzzers[n]['states'] >> sid & 1 else '.':>8}" for n in names)
+        print(f"  {sid:>4}  {state:<20} {visits[sid]:>9}  {marks}")
+    exclusive = model.exclusive()
+    if len(names) > 1 and any(exclusive.values()):
+        print()
+        print("  Reached by only one fuzzer:")
+        for name, sids in exclusive.items():
+            if sids:
+                print(f"    {name}: " + ', '.join(model.states[s] for s in sids))
+    print()
+    print(f"  Top {top} transitions:")
+    ranked = sorted(model.edges.items(), key=lambda item: -item[1])[:top]
+    for key, count in ranked:
+        print(f"    {model.states[key >> 32]:<20} -> {model.states[key & 0xFFFFFFFF]:<20} {count}")
+    print("========================================")
+
+
+def write_dot(model, path, min_count=1):
+    visits = model.visits()
+    with open(path, 'w') as f:
+        f.write(f'digraph "{model.target}" {{\n  rankdir=LR;\n  node [shape=ellipse];\n')
+        for sid, state in enumerate(model.states):
+            owners = [n for n in sorted(model.fuzzers) if model.fuzzers[n]['states'] >> sid & 1]
+            label = f"{state}\\n{visits[sid]}\\n{','.join(owners)}"
+            f.write(f'  s{sid} [label="{label}"];\n')
+        for key, count in sorted(model.edges.items()):
+            if count >= min_count:
+                f.write(f'  s{key >> 32} -> s{key & 0xFFFFFFFF} [label="{count}"];\n')
+        f.write('}\n')
+
+
+def default_model_path(base_dir, target):
+    return os.path.join(base_dir, 'benchmarks', f'state-model-{target}.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Infer a protocol state machine from replayed fuzzer queues")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    update = sub.add_parser('update', help='replay new queue entries and add their state paths to the model')
+    update.add_argument('target')
+    update.add_argument('--run', default='1')
+    update.add_argument('--fuzzers', nargs='+', default=FUZZERS)
+    update.add_argument('--input', help='replay this directory instead of the fuzzer queues')
+    update.add_argument('--label', help='name recorded for --input (default: directory name)')
+    update.add_argument('--base-dir', default=BASE_DIR)
+    update.add_argument('--model', help='model file (default: <base-dir>/benchmarks/state-model-<target>.json)')
+    update.add_argument('--host', default='127.0.0.1')
+    update.add_argument('--port', type=int)
+    update.add_argument('--timeout', type=float, default=0.5, help='per-message response timeout (s)')
+    update.add_argument('--jobs', type=int, default=1, help='concurrent connections (only for servers that accept them)')
+    update.add_argument('--limit', type=int, help='replay at most N new testcases per queue')
+    update.add_argument('--server', action='store_true', help='start and supervise the coverage server')
+    update.add_argument('--ready-timeout', type=float, default=30.0)
+
+    sessions = sub.add_parser('sessions', help='add recorded interactive sessions (--record JSON sidecars)')
+    sessions.add_argument('target')
+    sessions.add_argument('files', nargs='+')
+    sessions.add_argument('--label', default='manual')
+    sessions.add_argument('--base-dir', default=BASE_DIR)
+    sessions.add_argument('--model')
+
+    show = sub.add_parser('show', help='print states, per-fuzzer coverage and top transitions')
+    show.add_argument('model')
+    show.add_argument('--top', type=int, default=20)
+
+    dot = sub.add_parser('dot', help='export the state graph in Graphviz format')
+    dot.add_argument('model')
+    dot.add_argument('-o', '--output', required=True)
+    dot.add_argument('--min-count', type=int, default=1, help='hide transitions seen fewer times')
+    args = parser.parse_args()
+
+    if args.command in ('show', 'dot'):
+        if not os.path.exists(args.model):
+            print(f"Error: {args.model} not found")
+            return 1
+        with open(args.model) as f:
+            target = json.load(f).get('target', '?')
+        model = StateModel(target, args.model)
+        if args.command == 'show':
+            print_model(model, args.top)
+        else:
+            write_dot(model, args.output, args.min_count)
+            print(f"Graph written to {args.output}")
+        return 0
+
+    try:
+        spec = get_target(args.target)
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+        return 1
+    protocol = spec['protocol']
+    model = StateModel(args.target, args.model or default_model_path(args.base_dir, args.target))
+
+    if args.command == 'sessions':
+        for path in args.files:
+            try:
+                responses = load_session(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: skipping {path}: {e}")
+                continue
+            names = [state for response in responses for state in response_states(protocol, response)]
+            model.add_trace(args.label, names, path)
+        model.save()
+        print(f"Added {len(args.files)} session(s) as '{args.label}' -> {model.path}")
+        print_model(model)
+        return 0
+
+    port = args.port or spec['port']
+    if args.input:
+        queues = [(args.label or os.path.basename(os.path.normpath(args.input)), args.input)]
+    else:
+        queues = [(fuzzer, find_queue_dir(results_dir(args.target, fuzzer, args.run, args.base_dir)))
+                  for fuzzer in args.fuzzers]
+
+    supervisor = None
+    if args.server:
+        supervisor = ServerSupervisor(args.target, port, args.host, base_dir=args.base_dir,
+                                      ready_timeout=args.ready_timeout, connect_only=True)
+        try:
+            supervisor.start()
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return 1
+
+    start = time.perf_counter()
+    total = 0
+    try:
+        for label, queue_dir in queues:
+            if not os.path.isdir(queue_dir):
+                print(f"Warning: {queue_dir} does not exist, skipping {label}")
+                continue
+            count = replay_queue(model, label, queue_dir, protocol, args.host, port, args.timeout,
+                                 args.jobs, args.limit, supervisor)
+            print(f"{label}: {count} new testcase(s) from {queue_dir}")
+            total += count
+    except KeyboardInterrupt:
+        print("Interrupted, saving progress")
+    finally:
+        if supervisor:
+            supervisor.close()
+        model.save()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {total} testcase(s) in {elapsed:.2f}s -> {model.path}")
+    print_model(model)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+目标服务器守护进程
+启动目标服务器并等待就绪，取代脚本中的 `sleep 2` 和 `nc -z` 轮询；服务器退出后按指数退避自动重启，
+并向回放工具提供 start / stop 钩子（例如停止前保存 .gcda、重启时记录日志）。
+两种就绪判定:
+  握手           发送真实的协议探测报文（交互式客户端构造），收到完整响应才算就绪；只用于非覆盖率构建
+  --connect-only 只建立 TCP 连接、不发送任何报文；覆盖率版服务器一律使用，探测报文不会计入覆盖率
+run 默认启动覆盖率版服务器，因此默认只做连接检查（--handshake 改为握手，用于 --cmd 指定的非覆盖率构建）。
+
+使用方法:
+  python3 tools/supervisor.py wait libmodbus --port 1502 --timeout 30
+  python3 tools/supervisor.py wait libmodbus --port 1502 --timeout 30 --connect-only
+  python3 tools/supervisor.py run libplctag
+  python3 tools/supervisor.py run opener --cmd "./OpENer lo" --cwd /opt/OpENer/bin --handshake
+"""
+
+import argparse
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from framers import is_complete
+from targets import BASE_DIR, get_target, probe_message, server_command
+
+PROBE_INTERVAL = 0.01
+BACKOFF_INITIAL = 0.1
+BACKOFF_MAX = 5.0
+
+
+def read_response(sock, protocol, timeout):
+    """读取直到收到一条完整的协议消息，超时或连接关闭返回 None"""
+    deadline = time.perf_counter() + timeout
+    received = b''
+    while time.perf_counter() < deadline:
+        sock.settimeout(max(deadline - time.perf_counter(), 0.001))
+        try:
+            chunk = sock.recv(4096)
+        except socket.timeout:
+            break
+        if not chunk:
+            break
+        received += chunk
+        if is_complete(protocol, received):
+            return received
+    return None
+
+
+def handshake(host, port, protocol, probe, timeout=1.0):
+    """连接并发送探测报文，收到完整响应即认为服务器就绪"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(probe)
+            return read_response(sock, protocol, timeout) is not None
+    except OSError:
+        return False
+
+
+def port_open(host, port, timeout=1.0):
+    """只建立 TCP 连接、不发送报文，端口可连接即返回 True"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_ready(host, port, protocol, probe, timeout, proc=None):
+    """
+    反复握手直到成功，返回等待耗时；超时或进程提前退出返回 None
+    proc 为 None 时只探测端口上已有的服务器（例如由 shell 脚本或监控循环启动）
+    probe 为 None 时只检查端口可连接，不向服务器发送任何请求
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        if proc is not None and proc.poll() is not None:
+            return None
+        remaining = min(1.0, max(deadline - time.perf_counter(), 0.01))
+        if probe is None:
+            ready = port_open(host, port, remaining)
+        else:
+            ready = handshake(host, port, protocol, probe, remaining)
+        if ready:
+            return time.perf_counter() - start
+        time.sleep(PROBE_INTERVAL)
+    return None
+
+
+def terminate(proc, timeout):
+    """SIGTERM 后等待退出（让 gcov 写出 .gcda），返回 (耗时, 是否需要 SIGKILL)"""
+    start = time.perf_counter()
+    if proc.poll() is not None:
+        return 0.0, False
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=timeout)
+        return time.perf_counter() - start, False
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        return time.perf_counter() - start, True
+
+
+class ServerSupervisor:
+    """
+    管理单个目标服务器进程的生命周期
+      start()           启动并等待握手成功（connect_only=True 时只等待端口可连接）
+      ensure_running()  进程已退出时按退避重启（每个测试用例回放前调用）
+      stop()            SIGTERM -> 等待 -> SIGKILL
+    钩子: add_hook('start' | 'stop', fn)，fn(supervisor) 在每次启动就绪后 / 停止后调用
+    覆盖率版服务器必须使用 connect_only=True，避免每次（重）启动的探测报文混入覆盖率
+    """
+
+    def __init__(self, target, port=None, host='127.0.0.1', cmd=None, cwd=None, base_dir=None,
+                 ready_timeout=30.0, stop_timeout=10.0, max_restarts=100, log_path=None, env=None,
+                 connect_only=False):
+        spec = get_target(target)
+        self.target = target
+        self.protocol = spec['protocol']
+        self.host = host
+        self.port = port or spec['port']
+        default_cwd, default_cmd = server_command(target, self.port, base_dir)
+        self.cmd = cmd or default_cmd
+        self.cwd = cwd or default_cwd
+        self.ready_timeout = ready_timeout
+        self.stop_timeout = stop_timeout
+        self.max_restarts = max_restarts
+        self.log_path = log_path
+        # 额外的环境变量（例如 GCOV_PREFIX，让多个 worker 的 .gcda 互不覆盖）
+        self.env = dict(os.environ, **env) if env else None
+        self.probe = None if connect_only else probe_message(target)
+        self.proc = None
+        self.restarts = 0
+        self.backoff = BACKOFF_INITIAL
+        self.hooks = {'start': [], 'stop': []}
+        self._log = None
+
+    def add_hook(self, event, fn):
+        self.hooks[event].append(fn)
+
+    def _run_hooks(self, event):
+        for fn in self.hooks[event]:
+            fn(self)
+
+    @property
+    def pid(self):
+        return self.proc.pid if self.proc else None
+
+    def running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        """启动服务器并等待就绪，返回启动耗时；失败抛出 RuntimeError"""
+        if self.log_path and self._log is None:
+            self._log = open(self.log_path, 'ab')
+        output = self._log or subprocess.DEVNULL
+        self.proc = subprocess.Popen(shlex.split(self.cmd), cwd=self.cwd, stdout=output, stderr=output,
+                                     env=self.env)
+        elapsed = wait_ready(self.host, self.port, self.protocol, self.probe, self.ready_timeout, self.proc)
+        if elapsed is None:
+            code = self.proc.poll()
+            if code is None:
+                terminate(self.proc, self.stop_timeout)
+                what = 'connection' if self.probe is None else 'handshake'
+                raise RuntimeError(f"{self.target}: no {what} on port {self.port} "
+                                   f"after {self.ready_timeout}s")
+            raise RuntimeError(f"{self.target}: server exited with code {code} before becoming ready")
+        self._run_hooks('start')
+        return elapsed
+
+    def ensure_running(self):
+        """
+        进程还在则直接返回 False；已退出则按指数退避重启并返回 True
+        启动失败会继续退避重试，超过 max_restarts 抛出 RuntimeError
+        """
+        if self.running():
+            self.backoff = BACKOFF_INITIAL
+            return False
+        while True:
+            if self.restarts >= self.max_restarts:
+                raise RuntimeError(f"{self.target}: maximum restart attempts ({self.max_restarts}) reached")
+            self.restarts += 1
+            time.sleep(self.backoff)
+            self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+            try:
+                self.start()
+                return True
+            except RuntimeError as e:
+                print(f"[supervisor] restart {self.restarts} failed: {e}", file=sys.stderr)
+
+    def stop(self):
+        """停止服务器，返回 (耗时, 是否需要 SIGKILL)"""
+        if self.proc is None:
+            return 0.0, False
+        result = terminate(self.proc, self.stop_timeout)
+        self.proc = None
+        self._run_hooks('stop')
+        return result
+
+    def close(self):
+        self.stop()
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def cmd_wait(args):
+    spec = get_target(args.target)
+    port = args.port or spec['port']
+    probe = None if args.connect_only else probe_message(args.target)
+    elapsed = wait_ready(args.host, port, spec['protocol'], probe, args.timeout)
+    if elapsed is None:
+        what = 'accept connections' if probe is None else 'answer the handshake'
+        print(f"Warning: {args.target} on port {port} did not {what} within {args.timeout}s")
+        return 1
+    if args.verbose:
+        print(f"{args.target} ready on port {port} after {elapsed * 1000:.1f}ms")
+    return 0
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def cmd_run(args):
+    supervisor = ServerSupervisor(args.target, args.port, args.host, args.cmd, args.cwd, args.base_dir,
+                                  args.timeout, max_restarts=args.max_restarts, log_path=args.log,
+                                  connect_only=not args.handshake)
+    supervisor.add_hook('start', lambda s: print(f"[supervisor] {s.target} ready, PID {s.pid}"))
+    # docker stop / kill 发送 SIGTERM 时同样停止服务器，保证 .gcda 写出
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        elapsed = supervisor.start()
+        print(f"[supervisor] startup took {elapsed * 1000:.1f}ms")
+        while True:
+            if supervisor.ensure_running():
+                print(f"[supervisor] restarted {supervisor.restarts} time(s)")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        supervisor.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start / supervise target servers with protocol-handshake readiness")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    wait = sub.add_parser('wait', help='wait until a running server answers the handshake')
+    wait.add_argument('target')
+    wait.add_argument('--host', default='127.0.0.1')
+    wait.add_argument('--port', type=int)
+    wait.add_argument('--timeout', type=float, default=30.0)
+    wait.add_argument('--connect-only', action='store_true',
+                      help='only check that the port accepts connections (no probe request, no coverage)')
+    wait.add_argument('-v', '--verbose', action='store_true')
+
+    run = sub.add_parser('run', help='start the server and restart it with backoff when it exits')
+    run.add_argument('target')
+    run.add_argument('--host', default='127.0.0.1')
+    run.add_argument('--port', type=int)
+    run.add_argument('--cmd', help='override server command')
+    run.add_argument('--cwd', help='override server working directory')
+    run.add_argument('--base-dir', default=BASE_DIR)
+    run.add_argument('--timeout', type=float, default=30.0, help='readiness timeout per start (s)')
+    run.add_argument('--interval', type=float, default=0.2, help='liveness check interval (s)')
+    run.add_argument('--max-restarts', type=int, default=100)
+    run.add_argument('--log', help='append server stdout/stderr to this file')
+    run.add_argument('--handshake', action='store_true',
+                     help='wait for a protocol handshake instead of a connection (non-coverage builds only)')
+
+    args = parser.parse_args()
+    return cmd_wait(args) if args.command == 'wait' else cmd_run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+各模糊测试目标的统一配置（协议、端口、结果目录前缀、覆盖率服务器、harness 源文件）
+路径与 coverage-analysis/*.sh 保持一致，BASE_DIR 可通过环境变量 LLM_FUZZ_BASE_DIR 覆盖。
+"""
+
+import importlib
+import os
+import sys
+
+CLIENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client-interactive')
+
+BASE_DIR = os.environ.get('LLM_FUZZ_BASE_DIR', '/home/ecs-user/LLM_fuzz_experiment')
+FUZZERS = ['afl-ics', 'aflnet', 'chatafl', 'a2', 'a3']
+
+# server: 覆盖率版服务器的工作目录（相对 BASE_DIR）和启动命令，{port} 会被替换
+# harness_cwd / harness_cmd: 模糊测试容器中 afl-fuzz 启动的插桩 harness（Dockerfile 的构建目录，
+# 布局与容器内 /opt/fuzzing 相同），harness_bench.py 默认测量它们
+TARGETS = {
+    'libmodbus': {
+        'protocol': 'MODBUS',
+        'port': 1502,
+        'server_cwd': 'libmodbus/tests',
+        'server_cmd': './server-coverage {port}',
+        'harness': 'libmodbus tests/random-test-server.c',
+        'harness_cwd': 'libmodbus/tests',
+        'harness_cmd': './server {port}',
+    },
+    'libplctag': {
+        'protocol': 'MODBUS',
+        'port': 5502,
+        'server_cwd': 'libplctag/build-coverage',
+        'server_cmd': './bin_dist/modbus_server --listen 127.0.0.1:{port}',
+        'harness': 'libplctag src/tests/modbus_server/modbus_server.c',
+        'harness_cwd': 'libplctag/build/bin_dist',
+        'harness_cmd': './modbus_server --listen 127.0.0.1:{port}',
+    },
+    'iec104': {
+        'protocol': 'IEC104',
+        'port': 2404,
+        'server_cwd': 'IEC104/test',
+        'server_cmd': './iec104_monitor {port}',
+        'harness': 'dockerfiles-iec104/iec104-fuzzing.patch',
+        'harness_cwd': 'IEC104/test',
+        'harness_cmd': './iec104_monitor {port}',
+    },
+    'freyrscada-iec104': {
+        'protocol': 'IEC104',
+        'port': 2404,
+        'server_cwd': 'freyrscada-iec104/IEC104-Linux-SDK/LinuxSDK/x86_64/output',
+        'server_cmd': './iec104servertest {port}',
+        'harness': 'dockerfiles-freyrscada-iec104/freyrscada-iec104-fuzzing.patch',
+        'harness_cwd': 'freyrscada-iec104/IEC104-Linux-SDK/LinuxSDK/x86_64/output',
+        'harness_cmd': './iec104servertest {port}',
+    },
+    'opener': {
+        'protocol': 'ETHERNETIP',
+        'port': 44818,
+        'server_cwd': 'OpENer/build-server/src/ports/POSIX',
+        'server_cmd': './OpENer lo',
+        'harness': 'dockerfiles-opener/OpENerNetworkHarness.c',
+        # 容器中 afl-fuzz 直接启动插桩的 OpENer（监听 lo 上的固定端口 44818）
+        'harness_cwd': 'OpENer/build-server/src/ports/POSIX',
+        'harness_cmd': './OpENer lo',
+    },
+    'eipscanner': {
+        'protocol': 'ETHERNETIP',
+        'port': 44818,
+        'server_cwd': 'eipscanner/build/examples',
+        'server_cmd': './eip_server_harness {port}',
+        'harness': 'dockerfiles-eipscanner/EIPServerHarness.cpp',
+        'harness_cwd': 'eipscanner/build/examples',
+        'harness_cmd': './eip_server_harness {port}',
+    },
+    'libslmp2': {
+        'protocol': 'SLMPB',
+        'port': 8888,
+        'server_cwd': 'libslmp2/build-coverage',
+        'server_cmd': './samples/svrskel/svrskel_afl_coverage {port}',
+        'harness': 'dockerfiles-libslmp2/svrskel_afl.c',
+        'harness_cwd': 'libslmp2/build/samples/svrskel',
+        'harness_cmd': './svrskel_afl {port}',
+    },
+    'libslmp2-ascii': {
+        'protocol': 'SLMPA',
+        'port': 8888,
+        'server_cwd': 'libslmp2-ascii/build-coverage',
+        'server_cmd': './samples/svrskel/svrskel_afl_coverage {port}',
+        'harness': 'dockerfiles-libslmp2-ascii/svrskel_afl.c',
+        'harness_cwd': 'libslmp2/build/samples/svrskel',  # ASCII 容器同样克隆到 libslmp2/
+        'harness_cmd': './svrskel_afl {port}',
+    },
+}
+
+
+def get_target(name):
+    if name not in TARGETS:
+        raise KeyError(f"Unknown target '{name}', expected one of: {', '.join(sorted(TARGETS))}")
+    return TARGETS[name]
+
+
+def results_dir(target, fuzzer, run, base_dir=None):
+    """results/<target>-<fuzzer>-<run>"""
+    return os.path.join(base_dir or BASE_DIR, 'results', f"{target}-{fuzzer}-{run}")
+
+
+def server_command(target, port=None, base_dir=None):
+    """返回 (工作目录, 命令字符串)"""
+    spec = get_target(target)
+    cmd = spec['server_cmd'].format(port=port or spec['port'])
+    return os.path.join(base_dir or BASE_DIR, spec['server_cwd']), cmd
+
+
+def harness_command(target, port=None, base_dir=None):
+    """返回模糊测试 harness 的 (工作目录, 命令字符串)"""
+    spec = get_target(target)
+    cmd = spec['harness_cmd'].format(port=port or spec['port'])
+    return os.path.join(base_dir or BASE_DIR, spec['harness_cwd']), cmd
+
+
+def _client_module(name):
+    """加载 client-interactive/ 下的交互式客户端模块，复用其报文构造函数"""
+    if CLIENT_DIR not in sys.path:
+        sys.path.insert(0, CLIENT_DIR)
+    return importlib.import_module(name)
+
+
+def probe_message(target):
+    """
+    返回用于探测服务器是否就绪的请求报文（期望服务器给出完整响应）
+    报文由交互式客户端的构造函数 / 预设命令生成
+    """
+    protocol = get_target(target)['protocol']
+    if protocol == 'MODBUS':
+        client = _client_module('modbus_interactive').ModbusInteractiveClient()
+        return client.build_modbus_request(0x03, 0, 1)
+    if protocol == 'ETHERNETIP':
+        client = _client_module('ethernetip_interactive').EtherNetIPClient()
+        return client.build_list_identity()
+    if protocol == 'IEC104':
+        # STARTDT act（iec104_interactive_realtime.py 的 startdt 预设）
+        return bytes.fromhex('680407000000')
+    # SLMP 自环测试（slmp_interactive.py 连接时发送的心跳帧）
+    loopback = bytes.fromhex('50000000ff00000900100019060000010000')
+    if protocol == 'SLMPA':
+        return loopback.hex().upper().encode()
+    return loopback
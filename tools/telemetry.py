@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+重放期间的服务器资源遥测
+在每个测试用例前后读取服务器进程（及其子进程）的 /proc 信息:
+  RSS / VmHWM（峰值 RSS）、用户态 + 内核态 CPU 时间、打开的 fd 数、线程数
+把差值归因到该测试用例，并标记资源耗尽候选（内存增长、CPU 尖峰、fd / 线程泄漏、服务器退出）。
+报告按类别建立索引（类别 -> 按严重程度排序的测试用例序号），便于定位慢路径和 DoS 输入。
+
+使用方法（通过 replay.py）:
+  python3 tools/replay.py iec104 aflnet 1 --telemetry --report telemetry-iec104-aflnet-1.json
+  python3 tools/telemetry.py telemetry-iec104-aflnet-1.json --top 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+
+# 默认阈值（可由 replay.py 的参数覆盖）
+THRESHOLDS = {
+    'rss_kb': 1024,       # 单个测试用例后常驻内存增长超过 1 MiB
+    'hwm_kb': 4096,       # 峰值 RSS 上升超过 4 MiB（即使随后释放）
+    'cpu_ms': 50.0,       # 单个测试用例消耗 CPU 超过 50ms
+    'fds': 1,             # 测试用例结束后 fd 数增加
+    'threads': 1,         # 测试用例结束后线程数增加（如 Iec104_Task 未退出）
+}
+
+# 连接关闭后服务器回收 fd / 线程需要一点时间，计数上升时等待后复查一次，避免误报
+SETTLE_DELAY = 0.05
+
+CATEGORIES = {
+    'memory_growth': 'rss_kb',
+    'peak_memory': 'hwm_kb',
+    'cpu_spike': 'cpu_ms',
+    'fd_leak': 'fds',
+    'thread_leak': 'threads',
+}
+
+
+def _children(pid):
+    """/proc/<pid>/task/*/children 列出的所有后代进程（需要 CONFIG_PROC_CHILDREN）"""
+    found = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            tasks = os.listdir(f'/proc/{current}/task')
+        except OSError:
+            continue
+        for tid in tasks:
+            try:
+                with open(f'/proc/{current}/task/{tid}/children') as f:
+                    kids = [int(c) for c in f.read().split()]
+            except OSError:
+                continue
+            found.extend(kids)
+            stack.extend(kids)
+    return found
+
+
+def _read_process(pid):
+    """读取单个进程的 rss / hwm（KB）、CPU（tick）、线程数、fd 数；进程不存在返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/status') as f:
+            status = f.read()
+    except OSError:
+        return None
+    fields = stat[stat.rindex(')') + 2:].split()
+    # fields[0] 为 state（第 3 列），utime/stime/cutime/cstime 为第 14-17 列，num_threads 为第 20 列
+    cpu = int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14])
+    sample = {'rss_kb': int(fields[21]) * PAGE_KB, 'hwm_kb': 0, 'cpu_ticks': cpu,
+              'threads': int(fields[17]), 'fds': 0}
+    for line in status.splitlines():
+        if line.startswith('VmHWM:'):
+            sample['hwm_kb'] = int(line.split()[1])
+            break
+    try:
+        sample['fds'] = len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        pass
+    return sample
+
+
+def snapshot(pid):
+    """服务器进程及其所有子进程的资源汇总；服务器进程不存在返回 None"""
+    root = _read_process(pid)
+    if root is None:
+        return None
+    total = dict(root)
+    for child in _children(pid):
+        sample = _read_process(child)
+        if sample is None:
+            continue
+        for key in total:
+            total[key] += sample[key]
+    total['cpu_ms'] = total.pop('cpu_ticks') * 1000.0 / CLK_TCK
+    total['pid'] = pid
+    return total
+
+
+def delta(before, after):
+    """两次快照的差值；服务器在测试用例期间退出或被重启时返回 {'exited': True}"""
+    if before is None or after is None or before['pid'] != after['pid']:
+        return {'exited': True}
+    return {key: round(after[key] - before[key], 3)
+            for key in ('rss_kb', 'hwm_kb', 'cpu_ms', 'fds', 'threads')}
+
+
+class TelemetryRecorder:
+    """
+    按测试用例记录资源差值
+      begin(pid) -> 回放测试用例 -> end(pid, testcase)
+    pid 由调用方提供，服务器被 supervisor 重启后 pid 改变也能正确归因
+    """
+
+    def __init__(self, thresholds=None, settle=SETTLE_DELAY):
+        self.thresholds = dict(THRESHOLDS, **(thresholds or {}))
+        self.settle = settle
+        self.records = []
+        self.baseline = None
+        self._before = None
+
+    def begin(self, pid):
+        self._before = snapshot(pid) if pid else None
+        if self.baseline is None:
+            self.baseline = self._before
+
+    def end(self, pid, testcase):
+        after = snapshot(pid) if pid else None
+        before = self._before
+        if (self.settle and before and after and before['pid'] == after['pid']
+                and (after['fds'] > before['fds'] or after['threads'] > before['threads'])):
+            time.sleep(self.settle)
+            after = snapshot(pid) or after
+        record = {'testcase': testcase, 'delta': delta(self._before, after), 'after': after}
+        record['flags'] = self.classify(record['delta'])
+        self.records.append(record)
+        self._before = after
+        return record
+
+    def classify(self, diff):
+        if diff.get('exited'):
+            return ['server_exit']
+        return [name for name, key in CATEGORIES.items() if diff[key] >= self.thresholds[key]]
+
+    def report(self):
+        """
+        返回 {'thresholds', 'baseline', 'final', 'index', 'per_testcase'}
+        index: 类别 -> 按该指标从大到小排序的 per_testcase 下标
+        """
+        index = {name: [] for name in CATEGORIES}
+        index['server_exit'] = []
+        for i, record in enumerate(self.records):
+            for flag in record['flags']:
+                index[flag].append(i)
+        for name, key in CATEGORIES.items():
+            index[name].sort(key=lambda i: -self.records[i]['delta'][key])
+        final = next((r['after'] for r in reversed(self.records) if r['after']), None)
+        return {
+            'thresholds': self.thresholds,
+            'baseline': self.baseline,
+            'final': final,
+            'index': index,
+            'per_testcase': [{'testcase': r['testcase'], **r['delta'], 'flags': r['flags']}
+                             for r in self.records],
+        }
+
+
+def print_report(report, top=10):
+    print("========================================")
+    print("Resource telemetry")
+    baseline, final = report['baseline'], report['final']
+    if baseline and final:
+        print(f"  RSS: {baseline['rss_kb']} KB -> {final['rss_kb']} KB (peak {final['hwm_kb']} KB)")
+        print(f"  CPU: {final['cpu_ms'] - baseline['cpu_ms']:.1f} ms  "
+              f"fds: {baseline['fds']} -> {final['fds']}  threads: {baseline['threads']} -> {final['threads']}")
+    entries = report['per_testcase']
+    for name, indices in report['index'].items():
+        if not indices:
+            continue
+        print(f"  {name}: {len(indices)} testcase(s)")
+        for i in indices[:top]:
+            entry = entries[i]
+            key = CATEGORIES.get(name)
+            value = f" (+{entry[key]})" if key else ''
+            print(f"    [{i}] {os.path.basename(entry['testcase'])}{value}")
+    print("========================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the resource-exhaustion index of a replay telemetry report")
+    parser.add_argument('report', help='JSON report written by replay.py --telemetry --report')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    with open(args.report) as f:
+        report = json.load(f)
+    if 'telemetry' not in report:
+        print(f"Error: {args.report} has no telemetry section")
+        return 1
+    print_report(report['telemetry'], args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+自适应响应超时模型与挂起分类
+按协议学习响应时间分布，每条消息的截止时间为 clamp(p99 * k, floor, ceiling)，
+超过截止时间后再给一个等长的宽限窗口，据此区分:
+  ok       截止时间内收到完整响应
+  late     宽限窗口内才收到完整响应
+  partial  收到部分字节但直到宽限结束仍不完整
+  silent   连接保持但没有任何响应
+  reset    连接被重置 / 对端关闭
+测试用例级别的判定:
+  hang     末尾连续 HANG_RUN 条消息无响应；或只有一条消息且无响应；
+           或最后一条消息无响应且之后服务器端口无法连接（仅建立连接，不发送报文）
+  silent   有消息无响应（可能是协议本身不应答，如 IEC104 S 帧），但服务器仍可连接
+  其余取所有消息中最严重的状态
+最坏情况每条消息耗时 2 * deadline，慢 corpus 的重放时间有上界，不再依赖固定 sleep + 重试。
+模型以 JSON 持久化（协议 -> 最近的响应时间样本），跨多次重放持续学习。
+
+使用方法（通过 replay.py）:
+  python3 tools/replay.py opener a3 1 --adaptive --hang-dir results/opener-a3-1/replay-hangs
+  python3 tools/timeout_model.py show timeout-model.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+MAX_SAMPLES = 10000   # 每个协议保留的最近样本数
+WARMUP = 50           # 样本不足时使用初始超时
+DEFAULT_K = 3.0
+DEFAULT_FLOOR = 0.02  # 秒，避免本机回环上 p99 极小导致误判
+
+HANG_RUN = 2          # 连续无响应的消息数达到该值视为挂起
+
+# 测试用例级别的判定，按严重程度排序（取所有消息中最严重的一个）
+SEVERITY = ['ok', 'late', 'silent', 'partial', 'reset', 'hang', 'connect_fail']
+
+
+class TimeoutModel:
+    def __init__(self, initial=1.0, k=DEFAULT_K, floor=DEFAULT_FLOOR, ceiling=None, path=None):
+        self.initial = initial
+        self.k = k
+        self.floor = floor
+        self.ceiling = ceiling or initial
+        self.path = path
+        self.samples = {}
+        self._cache = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.samples = {proto: values[-MAX_SAMPLES:] for proto, values in data.get('samples', {}).items()}
+
+    def observe(self, protocol, seconds):
+        values = self.samples.setdefault(protocol, [])
+        values.append(seconds)
+        if len(values) > MAX_SAMPLES * 2:
+            del values[:-MAX_SAMPLES]
+        self._cache.pop(protocol, None)
+
+    def p99(self, protocol):
+        values = self.samples.get(protocol, [])
+        if len(values) < WARMUP:
+            return None
+        values = sorted(values[-MAX_SAMPLES:])
+        return values[min(len(values) - 1, int(round(0.99 * (len(values) - 1))))]
+
+    def deadline(self, protocol):
+        """当前协议的每消息截止时间（秒）；重新排序的开销按样本变化缓存"""
+        if protocol not in self._cache:
+            p99 = self.p99(protocol)
+            if p99 is None:
+                value = self.initial
+            else:
+                value = min(max(p99 * self.k, self.floor), self.ceiling)
+            self._cache[protocol] = value
+        return self._cache[protocol]
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'k': self.k, 'samples': {p: v[-MAX_SAMPLES:] for p, v in self.samples.items()}}, f)
+        os.replace(tmp, self.path)
+
+    def describe(self):
+        info = {}
+        for protocol, values in sorted(self.samples.items()):
+            info[protocol] = {
+                'samples': len(values),
+                'p99_ms': round(self.p99(protocol) * 1000, 3) if self.p99(protocol) is not None else None,
+                'deadline_ms': round(self.deadline(protocol) * 1000, 3),
+            }
+        return info
+
+
+def classify_testcase(result, alive=None):
+    """
+    根据每条消息的 status 给出测试用例的整体判定（SEVERITY 中的一项）
+    alive: 无参函数，返回服务器端口是否仍可连接；只在最后一条消息无响应时调用
+    """
+    if result['connect'] is None:
+        return 'connect_fail'
+    statuses = [m['status'] for m in result['messages']]
+    trailing = 0
+    for status in reversed(statuses):
+        if status != 'silent':
+            break
+        trailing += 1
+    if trailing >= HANG_RUN or (trailing and len(statuses) == 1):
+        return 'hang'
+    if trailing and alive is not None and not alive():
+        return 'hang'
+    return max(statuses, key=SEVERITY.index, default='ok')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a learned replay timeout model")
+    sub = parser.add_subparsers(dest='command', required=True)
+    show = sub.add_parser('show', help='print per-protocol sample counts, p99 and deadline')
+    show.add_argument('model')
+    show.add_argument('--k', type=float, default=DEFAULT_K)
+    show.add_argument('--ceiling', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: {args.model} not found")
+        return 1
+    model = TimeoutModel(initial=args.ceiling, k=args.k, ceiling=args.ceiling, path=args.model)
+    for protocol, info in model.describe().items():
+        print(f"{protocol:<12} samples={info['samples']:<6} p99={info['p99_ms']}ms deadline={info['deadline_ms']}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())